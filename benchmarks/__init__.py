@@ -0,0 +1,11 @@
+"""
+Benchmarks for the website app.
+
+Each module is a script, run from the project root, e.g.::
+
+    python -m benchmarks.availability
+
+Benchmarks run against their own throwaway SQLite database, or against
+BENCH_DATABASE_URL if it is set (e.g. a local PostgreSQL). They never use
+DATABASE_URL, so they cannot touch the production database.
+"""
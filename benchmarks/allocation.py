@@ -0,0 +1,114 @@
+"""
+Best-fit table assignment against first-choice assignment.
+
+Replays a synthetic night of booking requests against the same floor
+plan twice: once with the first-choice behaviour of the booking form
+(the guest takes the first free table, in table order, that seats the
+party) and once with TableAllocator. Reports parties and covers seated,
+seat utilization of the tables handed out, and assignment latency.
+
+Runs entirely in memory; no database is needed beyond Django setup.
+
+Usage::
+
+    python -m benchmarks.allocation [--tables 40] [--requests 400] [--nights 20]
+"""
+import argparse
+import random
+import time
+from datetime import date
+
+from benchmarks import utils
+
+PARTY_SIZES = (2,) * 45 + (3,) * 10 + (4,) * 25 + (5,) * 6 + (6,) * 6 + (7,) * 3 + (8,) * 3 + (10,) * 2
+
+
+def floor_plan(tables, rng):
+    """
+    Returns table capacities and adjoining pairs: mostly two- and
+    four-tops, with runs of four-tops that can be pushed together.
+    """
+    capacities = {number: rng.choice((2, 2, 2, 4, 4, 4, 4, 6, 8)) for number in range(1, tables + 1)}
+    adjacency = {number: set() for number in capacities}
+    for number in capacities:
+        neighbour = number + 1
+        if capacities[number] == 4 and capacities.get(neighbour) == 4:
+            adjacency[number].add(neighbour)
+            adjacency[neighbour].add(number)
+    return capacities, adjacency
+
+
+def replay(policy, capacities, requests):
+    from website.availability import OccupancyIndex
+
+    night = date(2030, 3, 1)
+    index = OccupancyIndex(capacities.items())
+    index.load([night], [])
+    seated = covers = seats = 0
+    latencies = []
+    for party_size, slot in requests:
+        start = time.perf_counter()
+        group = policy(party_size, lambda table_id: index.is_free(table_id, night, slot))
+        latencies.append((time.perf_counter() - start) * 1e6)
+        if group:
+            for table_id in group:
+                index.add(table_id, night, slot)
+            seated += 1
+            covers += party_size
+            seats += sum(capacities[t] for t in group)
+    return seated, covers, seats, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tables', type=int, default=40)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--nights', type=int, default=20)
+    args = parser.parse_args()
+
+    utils.setup()
+    from website.allocation import TableAllocator
+    from website.slots import SLOT_TIMES
+
+    rng = random.Random(7)
+    capacities, adjacency = floor_plan(args.tables, rng)
+    ordered = sorted(capacities)
+    allocator = TableAllocator(capacities.items(), adjacency)
+
+    def first_choice(party_size, is_free):
+        for table_id in ordered:
+            if capacities[table_id] >= party_size and is_free(table_id):
+                return (table_id,)
+        return None
+
+    evening = SLOT_TIMES[8:]
+    totals = {'first choice': [0, 0, 0, []], 'best fit': [0, 0, 0, []]}
+    for _ in range(args.nights):
+        requests = [(rng.choice(PARTY_SIZES), rng.choice(evening)) for _ in range(args.requests)]
+        for name, policy in (('first choice', first_choice), ('best fit', allocator.assign)):
+            seated, covers, seats, latencies = replay(policy, capacities, requests)
+            total = totals[name]
+            total[0] += seated
+            total[1] += covers
+            total[2] += seats
+            total[3].extend(latencies)
+
+    capacity = sum(capacities.values()) * len(evening) * args.nights
+    rows = []
+    for name, (seated, covers, seats, latencies) in totals.items():
+        rows.append({
+            'policy': name,
+            'parties seated': seated,
+            'turned away': args.requests * args.nights - seated,
+            'covers': covers,
+            'seat use %': round(100 * covers / seats, 1),
+            'fill %': round(100 * covers / capacity, 1),
+            'p50 us': round(utils.percentile(latencies, 50), 2),
+            'p99 us': round(utils.percentile(latencies, 99), 2),
+        })
+    print(f'{args.tables} tables, {args.requests} requests a night over {len(evening)} slots, {args.nights} nights')
+    utils.print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
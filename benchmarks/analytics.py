@@ -0,0 +1,87 @@
+"""
+Utilization analytics: NumPy columns against a naive ORM loop.
+
+Seeds --bookings bookings, then computes the weekday x slot x table
+utilization, lead time and party size reports twice: with a Python loop
+over Booking model instances, as the reports used to be written, and
+with website.analytics, which streams the rows into NumPy arrays and
+aggregates them in bulk. Checks that both give the same counts and
+reports the time each took, in seconds.
+
+Usage::
+
+    python -m benchmarks.analytics [--bookings 1000000] [--tables 50]
+"""
+import argparse
+import time
+from collections import Counter
+
+from benchmarks import utils
+
+
+def naive_reports(Booking):
+    """
+    Returns the utilization counts, lead time buckets and party sizes
+    from one model instance at a time.
+    """
+    from website.analytics import LEAD_BUCKETS
+
+    heat = Counter()
+    leads = Counter()
+    sizes = Counter()
+    for booking in Booking.objects.select_related('table').iterator():
+        heat[booking.date.weekday(), booking.time, booking.table.number] += 1
+        if booking.num_guests:
+            sizes[booking.num_guests] += 1
+            start = booking.created_at.replace(
+                year=booking.date.year, month=booking.date.month, day=booking.date.day,
+                hour=booking.time.hour, minute=booking.time.minute, second=0, microsecond=0,
+            )
+            days = max((start - booking.created_at).total_seconds() / 86400, 0)
+            leads[next(label for label, bound in LEAD_BUCKETS if days < bound)] += 1
+    return heat, leads, sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--bookings', type=int, default=1000000)
+    parser.add_argument('--tables', type=int, default=50)
+    args = parser.parse_args()
+
+    utils.setup()
+    from website import analytics
+    from website.models import Booking
+    from website.slots import SLOT_TIMES
+
+    utils.seed(args.tables, args.bookings, users=100)
+
+    start = time.perf_counter()
+    heat, leads, sizes = naive_reports(Booking)
+    naive = time.perf_counter() - start
+
+    start = time.perf_counter()
+    columns = analytics.load()
+    loaded = time.perf_counter() - start
+    numbers, bookings, share = analytics.utilization(columns)
+    lead_times = analytics.lead_times(columns)
+    party_sizes = analytics.party_sizes(columns)
+    computed = time.perf_counter() - start - loaded
+
+    vectorized = Counter({
+        (day, SLOT_TIMES[slot], int(number)): int(bookings[day, slot, position])
+        for day in range(7) for slot in range(len(SLOT_TIMES)) for position, number in enumerate(numbers)
+        if bookings[day, slot, position]
+    })
+    assert vectorized == heat, 'utilization differs'
+    assert lead_times['buckets'] == {label: leads[label] for label, bound in analytics.LEAD_BUCKETS}, 'lead times differ'
+    assert party_sizes == dict(sizes), 'party sizes differ'
+
+    print(f'{args.bookings} bookings on {args.tables} tables (seconds)')
+    utils.print_table([
+        {'method': 'ORM loop', 'load': '-', 'compute': '-', 'total': round(naive, 2)},
+        {'method': 'NumPy', 'load': round(loaded, 2), 'compute': round(computed, 3), 'total': round(loaded + computed, 2)},
+    ])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Live booking query latency and table size before and after archiving.
+
+Seeds --years of history up to --future days ahead, then times the live
+queries that every visit pays for, archives everything older than
+ARCHIVE_AFTER_DAYS with the archive_bookings command, and times them
+again:
+
+* booking list: a user's upcoming bookings page;
+* past bookings: the first page of a user's past bookings;
+* ownership check: the owner lookup of the update and delete views;
+* availability: loading the next two weeks into the availability index.
+
+Also reports the size of the booking table with its indexes, and how
+long archiving took.
+
+Usage::
+
+    python -m benchmarks.archive [--tables 20] [--years 5] [--future 60] [--repeat 50]
+"""
+import argparse
+import time
+from datetime import timedelta
+
+from benchmarks import utils
+
+
+def booking_table_size(connection):
+    """
+    Returns the bytes used by the booking table and its indexes.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT pg_total_relation_size('website_booking')")
+        else:
+            cursor.execute(
+                "SELECT SUM(pgsize) FROM dbstat WHERE name IN "
+                "(SELECT name FROM sqlite_master WHERE tbl_name = 'website_booking')"
+            )
+        return cursor.fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tables', type=int, default=20)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--future', type=int, default=60, help="days of bookings ahead of today")
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    utils.setup()
+    from io import StringIO
+
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test import Client
+    from django.urls import reverse
+    from django.utils import timezone
+
+    from website import availability, occupancy
+    from website.models import Booking
+    from website.slots import SLOT_TIMES
+
+    today = timezone.localdate()
+    start = today - timedelta(days=365 * args.years)
+    days = (today - start).days + args.future
+    bookings = days * (args.tables * len(SLOT_TIMES) * 2 // 3)
+    utils.seed(args.tables, bookings, users=50, start=start)
+    occupancy.rebuild()
+
+    user = User.objects.filter(username__startswith='bench-').first()
+    client = Client()
+    client.force_login(user)
+    booking_list = reverse('booking-list')
+    owned = Booking.objects.filter(user=user, date__gte=today).values_list('pk', flat=True).first()
+    fortnight = today + timedelta(days=13)
+    cases = (
+        ('booking list', lambda: client.get(booking_list).content),
+        ('past bookings', lambda: client.get(booking_list, {'when': 'past'}).content),
+        ('ownership check', lambda: Booking.objects.filter(pk=owned, user=user).exists()),
+        ('availability', lambda: availability.load_dates(today, fortnight, fresh=True)),
+    )
+
+    def measure(stage):
+        row = {'stage': stage, 'live bookings': Booking.objects.count(), 'MB': round(booking_table_size(connection) / 2 ** 20, 1)}
+        for label, case in cases:
+            case()
+            row[f'{label} ms'] = round(utils.summary(utils.measure(case, args.repeat))['p50'] / 1000, 2)
+        return row
+
+    rows = [measure('before')]
+    began = time.perf_counter()
+    call_command('archive_bookings', stdout=StringIO())
+    took = time.perf_counter() - began
+    rows.append(measure('archived'))
+    with connection.cursor() as cursor:
+        cursor.execute('VACUUM' if connection.vendor == 'sqlite' else 'VACUUM FULL website_booking')
+    rows.append(measure('vacuumed'))
+    archived = rows[0]['live bookings'] - rows[1]['live bookings']
+    print(f'{args.years} years of history on {args.tables} tables; '
+          f'archived {archived} bookings in {took:.1f} s ({archived / took:.0f}/s); p50 latency')
+    utils.print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""
+Concurrent-connection load test: sync WSGI workers against ASGI workers.
+
+Starts the project under gunicorn twice with the same number of worker
+processes, first with the Procfile's sync workers (tonyspizza.wsgi),
+then with the uvicorn workers of gunicorn_asgi.conf.py, and holds
+increasing numbers of concurrent keep-alive connections against the
+booking list and the availability API. The ASGI server is tested on
+the async views (/async/...). Reports requests per second, latency
+percentiles in milliseconds and failed requests.
+
+Real database round trips are simulated with --db-latency, which sleeps
+before every query (see benchmarks/slowdb.py): that wait is what ties up
+a sync worker.
+
+Usage::
+
+    python -m benchmarks.asgi_load [--workers 2] [--connections 1 10 50 100] [--seconds 5] [--db-latency 20]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import utils
+
+SERVERS = {
+    'wsgi': (['tonyspizza.wsgi'], {'booking list': '/bookings/', 'availability': '/api/availability/'}),
+    'asgi': (
+        ['-c', 'gunicorn_asgi.conf.py'],
+        {'booking list': '/async/bookings/', 'availability': '/async/api/availability/'},
+    ),
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args, workers, port, env):
+    command = [sys.executable, '-m', 'gunicorn', *args, '-w', str(workers), '-b', f'127.0.0.1:{port}', '--log-level', 'warning']
+    server = subprocess.Popen(command, env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f'Server did not start: {" ".join(command)}')
+
+
+async def request(port, request_bytes, conn):
+    """
+    Sends one request on conn (a [reader, writer] pair, reconnecting if
+    it is empty) and returns the status code.
+    """
+    if conn[0] is None:
+        conn[:] = await asyncio.open_connection('127.0.0.1', port)
+    reader, writer = conn
+    writer.write(request_bytes)
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = dict(line.split(': ', 1) for line in lines[1:] if ': ' in line)
+    headers = {name.lower(): value for name, value in headers.items()}
+    await reader.readexactly(int(headers.get('content-length', 0)))
+    if headers.get('connection', '').lower() == 'close':
+        writer.close()
+        conn[:] = [None, None]
+    return status
+
+
+async def load(port, path, cookie, connections, seconds, timeout):
+    """
+    Holds the given number of connections busy for the given time.
+    Returns (latencies in ms, failed requests).
+    """
+    request_bytes = (
+        f'GET {path} HTTP/1.1\r\nHost: localhost\r\nCookie: {cookie}\r\nConnection: keep-alive\r\n\r\n'
+    ).encode()
+    latencies = []
+    failed = 0
+    deadline = time.monotonic() + seconds
+
+    async def client():
+        nonlocal failed
+        conn = [None, None]
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                status = await asyncio.wait_for(request(port, request_bytes, conn), timeout)
+                ok = status == 200
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                ok = False
+                if conn[1] is not None:
+                    conn[1].close()
+                conn[:] = [None, None]
+            if ok:
+                latencies.append((time.perf_counter() - start) * 1e3)
+            else:
+                failed += 1
+        if conn[1] is not None:
+            conn[1].close()
+
+    await asyncio.gather(*(client() for _ in range(connections)))
+    return latencies, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--connections', type=int, nargs='+', default=[1, 10, 50, 100])
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--timeout', type=float, default=10, help='seconds before a request counts as failed')
+    parser.add_argument('--db-latency', type=float, default=20, help='milliseconds added to every query')
+    args = parser.parse_args()
+
+    # The servers run in their own processes, so they need a database
+    # they can all find.
+    os.environ.setdefault(
+        'BENCH_DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='tonyspizza-bench-'), 'bench.sqlite3'),
+    )
+    utils.setup()
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.test import Client
+
+    last_day = utils.seed(10, 20000, users=20)
+    client = Client()
+    client.force_login(User.objects.filter(username__startswith='bench-').first())
+    cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+    query = f'?date={last_day.isoformat()}'
+
+    env = dict(
+        os.environ,
+        DJANGO_SETTINGS_MODULE='benchmarks.settings',
+        BENCH_DB_LATENCY_MS=str(args.db_latency),
+        REQUEST_PROFILING_SAMPLE_RATE='0',
+    )
+    rows = []
+    for name, (server_args, paths) in SERVERS.items():
+        port = free_port()
+        server = start_server(server_args, args.workers, port, env)
+        try:
+            for endpoint, path in paths.items():
+                if endpoint == 'availability':
+                    path += query
+                for connections in args.connections:
+                    latencies, failed = asyncio.run(
+                        load(port, path, cookie, connections, args.seconds, args.timeout),
+                    )
+                    rows.append({
+                        'server': name,
+                        'endpoint': endpoint,
+                        'connections': connections,
+                        'req/s': round(len(latencies) / args.seconds, 1),
+                        'p50': round(utils.percentile(latencies, 50), 1) if latencies else '-',
+                        'p95': round(utils.percentile(latencies, 95), 1) if latencies else '-',
+                        'p99': round(utils.percentile(latencies, 99), 1) if latencies else '-',
+                        'failed': failed,
+                    })
+        finally:
+            server.terminate()
+            server.wait()
+    print(f'{args.workers} workers per server, {args.db_latency} ms per query (latency in ms)')
+    utils.print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
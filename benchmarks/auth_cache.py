@@ -0,0 +1,92 @@
+"""
+Authenticated page throughput with and without the session and user cache.
+
+Requests the booking list and the reservation page as a logged-in user:
+
+* before: Django's database session engine and AuthenticationMiddleware,
+  which load the session and the user on every request;
+* local cache: the project's settings, with the default local-memory
+  cache, where the session and the user still come from the database
+  (see website/auth.py and website/sessions.py);
+* shared cache: the same with a file-based cache, which the processes of
+  a host share, so the session and the user come from the cache.
+
+--db-latency adds that many milliseconds to every query, as a remote
+database would (see benchmarks/slowdb.py). Reports requests per second
+and the queries each request runs, in total and for the session and user.
+
+Usage::
+
+    python -m benchmarks.auth_cache [--requests 2000] [--db-latency 0 1]
+"""
+import argparse
+import tempfile
+import time
+
+from benchmarks import utils
+
+PAGES = {'booking list': '/bookings/', 'reservation': '/bookings/reservation/'}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--db-latency', type=float, nargs='+', default=[0, 1], help='milliseconds added to every query')
+    args = parser.parse_args()
+
+    utils.setup()
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test import Client, override_settings
+    from django.test.utils import CaptureQueriesContext
+
+    utils.seed(10, 20000, users=20)
+    user = User.objects.filter(username__startswith='bench-').first()
+    before_middleware = [
+        'django.contrib.auth.middleware.AuthenticationMiddleware'
+        if path == 'website.middleware.CachedAuthenticationMiddleware' else path
+        for path in settings.MIDDLEWARE
+    ]
+    configurations = (
+        ('before', {'SESSION_ENGINE': 'django.contrib.sessions.backends.db', 'MIDDLEWARE': before_middleware}),
+        ('local cache', {}),
+        ('shared cache', {'CACHES': {'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': tempfile.mkdtemp(prefix='tonyspizza-bench-cache-'),
+        }}}),
+    )
+    rows = []
+    for latency in args.db_latency:
+        for label, overrides in configurations:
+            middleware = overrides.get('MIDDLEWARE', settings.MIDDLEWARE)
+            if latency:
+                middleware = ['benchmarks.slowdb.SlowDatabaseMiddleware', *middleware]
+            with override_settings(**{**overrides, 'MIDDLEWARE': middleware, 'BENCH_DB_LATENCY_MS': latency}):
+                client = Client()
+                client.force_login(user)
+                for page, path in PAGES.items():
+                    assert client.get(path).status_code == 200
+                    with CaptureQueriesContext(connection) as queries:
+                        client.get(path)
+                    auth_queries = sum(
+                        'django_session' in query['sql'] or 'auth_user' in query['sql'] for query in queries
+                    )
+                    total_queries = len(queries)
+                    start = time.perf_counter()
+                    for _ in range(args.requests):
+                        client.get(path)
+                    rows.append({
+                        'db latency': latency,
+                        'settings': label,
+                        'page': page,
+                        'req/s': round(args.requests / (time.perf_counter() - start), 1),
+                        'queries': total_queries,
+                        'auth queries': auth_queries,
+                    })
+    print(f'{args.requests} requests per page, logged in')
+    utils.print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
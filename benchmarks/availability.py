@@ -0,0 +1,78 @@
+"""
+Availability lookup latency as the number of tables and bookings grows.
+
+For each combination it reports, in microseconds:
+
+* cold: loading one date from the database (one query) and answering a
+  free-tables query for it;
+* warm: the same query answered from the already loaded index;
+* slots: free slots for a party of four on a loaded date;
+* week: loading and answering a seven day range.
+
+Usage::
+
+    python -m benchmarks.availability [--tables 10 100 500] [--bookings 1000 100000 1000000]
+"""
+import argparse
+import random
+
+from benchmarks import utils
+
+
+def run(tables, bookings, repeat):
+    from website import availability
+    from website.slots import SLOT_TIMES
+
+    last_day = utils.seed(tables, bookings)
+    availability.reset_index()
+    rng = random.Random(1)
+    first_day = last_day.replace(day=1) if last_day.day > 7 else last_day
+    days = list(availability.date_range(first_day, last_day))
+    slot = SLOT_TIMES[10]
+
+    def cold():
+        availability.reset_index()
+        availability.free_tables(rng.choice(days), slot)
+
+    def warm():
+        availability.free_tables(rng.choice(days), slot)
+
+    def slots():
+        availability.free_slots(rng.choice(days), party_size=4)
+
+    def week():
+        availability.reset_index()
+        availability.availability(days[0], days[min(6, len(days) - 1)])
+
+    cold_samples = utils.measure(cold, repeat)
+    availability.load_dates(days[0], days[-1])
+    return {
+        'tables': tables,
+        'bookings': bookings,
+        'cold p50': utils.summary(cold_samples)['p50'],
+        'warm p50': utils.summary(utils.measure(warm, repeat * 10))['p50'],
+        'warm p99': utils.summary(utils.measure(warm, repeat * 10))['p99'],
+        'slots p50': utils.summary(utils.measure(slots, repeat * 10))['p50'],
+        'week p50': utils.summary(utils.measure(week, repeat))['p50'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tables', type=int, nargs='+', default=[10, 50, 100, 500])
+    parser.add_argument('--bookings', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    utils.setup()
+    rows = [
+        run(tables, bookings, args.repeat)
+        for bookings in args.bookings
+        for tables in args.tables
+    ]
+    print('latency in microseconds')
+    utils.print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
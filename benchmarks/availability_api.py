@@ -0,0 +1,74 @@
+"""
+Requests per second for the JSON availability API.
+
+Compares three paths through /api/availability/ for a single date and
+for a week:
+
+* cold: the date's cache entries are missing and are rebuilt from the
+  database;
+* warm: the entries are cached and the JSON body is rendered from them;
+* 304: the client's If-None-Match still matches, so the response is
+  built from the cache without a body.
+
+Usage::
+
+    python -m benchmarks.availability_api [--tables 50] [--bookings 100000] [--requests 500]
+"""
+import argparse
+import time
+from datetime import timedelta
+
+from benchmarks import utils
+
+
+def throughput(func, requests):
+    start = time.perf_counter()
+    for _ in range(requests):
+        func()
+    return round(requests / (time.perf_counter() - start), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tables', type=int, default=50)
+    parser.add_argument('--bookings', type=int, default=100000)
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    utils.setup()
+    from django.core.cache import cache
+    from django.test import Client
+    from django.urls import reverse
+
+    last_day = utils.seed(args.tables, args.bookings)
+    client = Client()
+    url = reverse('availability-api')
+    rows = []
+    for label, params in (
+        ('1 day', {'date': last_day.isoformat()}),
+        ('7 days', {'start': (last_day - timedelta(days=6)).isoformat(), 'end': last_day.isoformat()}),
+    ):
+        etag = client.get(url, params)['ETag']
+
+        def cold():
+            cache.clear()
+            assert client.get(url, params).status_code == 200
+
+        def warm():
+            assert client.get(url, params).status_code == 200
+
+        def not_modified():
+            assert client.get(url, params, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+        rows.append({
+            'range': label,
+            'cold req/s': throughput(cold, args.requests),
+            'warm req/s': throughput(warm, args.requests),
+            '304 req/s': throughput(not_modified, args.requests),
+        })
+    print(f'{args.tables} tables, {args.bookings} bookings')
+    utils.print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Render time and query count of the booking form at a large number of users.
+
+Renders /bookings/create/ (the lean BookingForm) and, for comparison, a
+ModelForm with the old fields, which offers every user and every table
+in a <select>. The lean form's table choices come from the cache, so
+its cost stays flat however many accounts there are.
+
+Usage::
+
+    python -m benchmarks.booking_form [--users 100000] [--tables 50] [--bookings 10000] [--repeat 10]
+"""
+import argparse
+
+from benchmarks import utils
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--tables', type=int, default=50)
+    parser.add_argument('--bookings', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    utils.setup()
+    from django import forms
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+    from django.urls import reverse
+    from website.forms import BookingForm
+    from website.models import Booking
+
+    last_day = utils.seed(args.tables, args.bookings, users=args.users)
+    client = Client()
+    client.force_login(User.objects.filter(username__startswith='bench-').first())
+    url = reverse('booking-create')
+    slot = {'date': last_day.isoformat(), 'time': '7:00 PM', 'num_guests': '4'}
+
+    class FullBookingForm(forms.ModelForm):
+        class Meta:
+            model = Booking
+            fields = ['user', 'table', 'date', 'time', 'num_guests']
+
+    cases = (
+        ('create page', lambda: client.get(url).content),
+        ('lean form', lambda: str(BookingForm())),
+        ('lean form, slot chosen', lambda: str(BookingForm(slot))),
+        ('form with user field', lambda: str(FullBookingForm())),
+    )
+    rows = []
+    for label, render in cases:
+        render()
+        with CaptureQueriesContext(connection) as queries:
+            render()
+        # Count now: the captured queries are a view of the connection's
+        # query log, which every request through the client clears.
+        count = len(queries)
+        samples = utils.measure(render, args.repeat)
+        rows.append({'render': label, 'queries': count, **utils.summary(samples)})
+    print(f'{args.users} users, {args.tables} tables, {args.bookings} bookings (latency in µs)')
+    utils.print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Throughput and memory of the import_bookings/export_bookings commands.
+
+Writes a synthetic booking file, imports it into an empty database, then
+exports it again in both formats. Reports rows/s and how much the
+process's peak memory grew during each step; streaming commands should
+not grow with the number of rows.
+
+Usage::
+
+    python -m benchmarks.bulk_io [--rows 1000000] [--tables 50] [--users 1000]
+"""
+import argparse
+import csv
+import os
+import resource
+import time
+from datetime import date, timedelta
+from io import StringIO
+
+from benchmarks import utils
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def write_file(path, rows, tables, users):
+    from website.slots import SLOT_TIMES
+
+    per_day = tables * len(SLOT_TIMES)
+    with open(path, 'w', newline='') as stream:
+        writer = csv.writer(stream)
+        writer.writerow(('user', 'table', 'date', 'time', 'num_guests', 'created_at'))
+        for n in range(rows):
+            day = date(2015, 1, 1) + timedelta(days=n // per_day)
+            cell = n % per_day
+            writer.writerow((
+                f'bench-{n % users}', cell // len(SLOT_TIMES) + 1, day.isoformat(),
+                SLOT_TIMES[cell % len(SLOT_TIMES)].isoformat(), n % 6 + 1,
+                f'{(day - timedelta(days=n % 30)).isoformat()}T12:00:00+00:00',
+            ))
+
+
+def step(name, rows, func):
+    before = peak_rss_mb()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    return {
+        'step': name,
+        'rows': rows,
+        'seconds': round(elapsed, 1),
+        'rows/s': round(rows / elapsed),
+        'peak RSS growth MB': round(peak_rss_mb() - before, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--tables', type=int, default=50)
+    parser.add_argument('--users', type=int, default=1000)
+    args = parser.parse_args()
+
+    utils.setup()
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from website.models import Table
+
+    Table.objects.bulk_create(Table(number=n, capacity=4) for n in range(1, args.tables + 1))
+    User.objects.bulk_create(User(username=f'bench-{n}') for n in range(args.users))
+    source = os.path.join(settings.BENCH_DIR, 'bookings.csv')
+    write_file(source, args.rows, args.tables, args.users)
+    quiet = {'stdout': StringIO(), 'stderr': StringIO()}
+
+    rows = [
+        step('import csv', args.rows, lambda: call_command('import_bookings', source, **quiet)),
+        step('export csv', args.rows, lambda: call_command(
+            'export_bookings', os.path.join(settings.BENCH_DIR, 'out.csv'), **quiet)),
+        step('export jsonl', args.rows, lambda: call_command(
+            'export_bookings', os.path.join(settings.BENCH_DIR, 'out.jsonl'), **quiet)),
+    ]
+    utils.print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Occupancy calendar response time for a month of 10,000 bookings.
+
+Seeds one month with --bookings bookings, then requests its calendar
+page as a staff user:
+
+* cold: the month's ETag dropped before every request, so the grid is
+  read from the occupancy summary and rendered;
+* fragment cached: the grid comes from the template fragment cache;
+* not modified: the browser sends the ETag back and gets a 304.
+
+Reports latencies in milliseconds and queries per request, and exits
+with an error if a cold render's p99 exceeds --budget-ms.
+
+Usage::
+
+    python -m benchmarks.calendar [--bookings 10000] [--requests 200] [--budget-ms 50]
+"""
+import argparse
+import math
+import sys
+from datetime import date
+
+from benchmarks import utils
+
+MONTH = date(2030, 1, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--bookings', type=int, default=10000)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--budget-ms', type=float, default=50)
+    args = parser.parse_args()
+
+    utils.setup()
+    from django.contrib.auth.models import User
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+    from django.urls import reverse
+
+    from website import caching, occupancy
+    from website.slots import SLOT_TIMES
+
+    # Two thirds of every slot of the month's 31 days are booked.
+    tables = math.ceil(args.bookings / (31 * len(SLOT_TIMES) * 2 / 3))
+    utils.seed(tables, args.bookings, start=MONTH)
+    occupancy.rebuild()
+    cache.clear()
+
+    staff = User.objects.create_user('bench-staff', is_staff=True)
+    client = Client()
+    client.force_login(staff)
+    url = reverse('occupancy-calendar-month', args=[MONTH.year, MONTH.month])
+    etag = None
+
+    def cold():
+        cache.delete(caching.month_key(MONTH.year, MONTH.month, caching._tables_version()))
+        assert client.get(url).status_code == 200
+
+    def cached():
+        assert client.get(url).status_code == 200
+
+    def not_modified():
+        nonlocal etag
+        etag = etag or client.get(url)['ETag']
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    rows = []
+    for label, request in (('cold', cold), ('fragment cached', cached), ('not modified', not_modified)):
+        request()
+        with CaptureQueriesContext(connection) as queries:
+            request()
+            count = len(queries)
+        samples = [sample / 1000 for sample in utils.measure(request, args.requests)]
+        rows.append({
+            'request': label,
+            'queries': count,
+            'p50 ms': round(utils.percentile(samples, 50), 2),
+            'p99 ms': round(utils.percentile(samples, 99), 2),
+        })
+    print(f'{args.bookings} bookings on {tables} tables in {MONTH:%B %Y}; '
+          f'queries include the session and user')
+    utils.print_table(rows)
+    if rows[0]['p99 ms'] > args.budget_ms:
+        sys.exit(f'Cold calendar p99 {rows[0]["p99 ms"]} ms is over the {args.budget_ms} ms budget.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Cold start of a web process: all apps against the lean web app set, and
+worker restarts with and without preloading.
+
+First loads tonyspizza.wsgi in fresh interpreters and sends each one
+request (see website/startup.py), with every installed app
+(WEB_PROCESS=0, as management commands and the outbox worker run) and
+with the web process's app set. Reports the import time, the first
+response, the total and the number of modules loaded, as medians.
+
+Then starts gunicorn with one sync worker, without preloading (as the
+Procfile did) and with the Procfile's profile (gunicorn_wsgi.conf.py,
+which preloads the application), kills the worker and times the first
+request after it, which waits for the replacement worker.
+
+Usage::
+
+    python -m benchmarks.cold_start [--runs 5] [--restarts 5] [--path /bookings/]
+"""
+import argparse
+import http.client
+import os
+import signal
+import statistics
+import time
+
+from benchmarks import utils
+from benchmarks.asgi_load import free_port, start_server
+
+APP_SETS = {'all apps': '0', 'web apps': '1'}
+
+SERVERS = {
+    'no preload': ['tonyspizza.wsgi'],
+    'preload': ['-c', 'gunicorn_wsgi.conf.py'],
+}
+
+
+def get(port, path):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        connection.request('GET', path)
+        return connection.getresponse().status
+    finally:
+        connection.close()
+
+
+def worker_pid(server):
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        with open(f'/proc/{server.pid}/task/{server.pid}/children') as children:
+            pids = children.read().split()
+        if pids:
+            return int(pids[0])
+        time.sleep(0.05)
+    raise RuntimeError('gunicorn started no worker')
+
+
+def restart_ms(port, server, path):
+    """
+    Kills the server's worker and returns how long the next request
+    takes, in milliseconds; it waits in the listen queue for the
+    replacement.
+    """
+    get(port, path)
+    old = worker_pid(server)
+    os.kill(old, signal.SIGKILL)
+    start = time.perf_counter()
+    get(port, path)
+    elapsed = (time.perf_counter() - start) * 1e3
+    assert worker_pid(server) != old
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--restarts', type=int, default=5)
+    parser.add_argument('--path', default='/bookings/')
+    args = parser.parse_args()
+
+    from website import startup
+
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='benchmarks.settings')
+    rows = []
+    for label, web_process in APP_SETS.items():
+        runs = [startup.measure(args.path, dict(env, WEB_PROCESS=web_process)) for _ in range(args.runs)]
+        rows.append({
+            'apps': label,
+            'import ms': statistics.median(run['import_ms'] for run in runs),
+            'first response ms': statistics.median(run['first_response_ms'] for run in runs),
+            'total ms': statistics.median(run['total_ms'] for run in runs),
+            'modules': statistics.median(len(run['modules']) for run in runs),
+        })
+    print(f'Fresh interpreter, first request to {args.path}, median of {args.runs} runs')
+    utils.print_table(rows)
+
+    rows = []
+    for label, server_args in SERVERS.items():
+        port = free_port()
+        server = start_server(server_args, 1, port, env)
+        try:
+            samples = [restart_ms(port, server, args.path) for _ in range(args.restarts)]
+        finally:
+            server.terminate()
+            server.wait()
+        rows.append({
+            'server': label,
+            'p50 ms': round(utils.percentile(samples, 50), 1),
+            'max ms': round(max(samples), 1),
+        })
+    print(f'\nFirst request after killing the worker, {args.restarts} restarts')
+    utils.print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Booking.claim() under contention on a single hot slot.
+
+Every round, all clients race to claim the same table and slot; exactly
+one of them should win. Reports successful claims per second and the
+latency of every claim attempt, winners and losers alike, as the number
+of concurrent clients grows.
+
+Runs on a throwaway SQLite file by default; set BENCH_DATABASE_URL to
+compare against a local PostgreSQL, e.g.::
+
+    BENCH_DATABASE_URL=postgres://localhost/tonyspizza_bench python -m benchmarks.contention
+
+Usage::
+
+    python -m benchmarks.contention [--clients 1 2 4 8 16 32 64] [--rounds 50]
+"""
+import argparse
+import threading
+import time
+from datetime import date, timedelta
+
+from benchmarks import utils
+
+
+def run(clients, rounds, number):
+    from django.contrib.auth.models import User
+    from django.db import OperationalError, connection
+    from website.models import Booking, SlotTaken, Table
+    from website.slots import SLOT_TIMES
+
+    user, _ = User.objects.get_or_create(username='bench-contention')
+    table = Table.objects.create(number=number, capacity=4)
+    barrier = threading.Barrier(clients)
+    lock = threading.Lock()
+    latencies = []
+    outcomes = {'won': 0, 'lost': 0, 'error': 0}
+
+    def client():
+        try:
+            for n in range(rounds):
+                slot = {
+                    'date': date(2030, 1, 1) + timedelta(days=n // len(SLOT_TIMES)),
+                    'time': SLOT_TIMES[n % len(SLOT_TIMES)],
+                }
+                barrier.wait()
+                start = time.perf_counter()
+                try:
+                    Booking(user=user, table=table, num_guests=2, **slot).claim()
+                    outcome = 'won'
+                except SlotTaken:
+                    outcome = 'lost'
+                except OperationalError:
+                    outcome = 'error'
+                elapsed = (time.perf_counter() - start) * 1e3
+                with lock:
+                    latencies.append(elapsed)
+                    outcomes[outcome] += 1
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    assert Booking.objects.filter(table=table).count() == outcomes['won'] <= rounds
+    return {
+        'clients': clients,
+        'claims/s': round(outcomes['won'] / wall, 1),
+        'p50 ms': round(utils.percentile(latencies, 50), 2),
+        'p99 ms': round(utils.percentile(latencies, 99), 2),
+        'won': outcomes['won'],
+        'lost': outcomes['lost'],
+        'errors': outcomes['error'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument('--rounds', type=int, default=50)
+    args = parser.parse_args()
+
+    utils.setup()
+    from django.db import connection
+    print(f'database: {connection.vendor}')
+    rows = [run(clients, args.rounds, number) for number, clients in enumerate(args.clients, 1)]
+    connection.close()
+    utils.print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
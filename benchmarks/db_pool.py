@@ -0,0 +1,134 @@
+"""
+Request latency with new, persistent and pooled database connections.
+
+Serves the booking list through the WSGI handler, from several threads
+at once, under three connection settings:
+
+* new: DB_CONN_MAX_AGE=0, a new connection for every request;
+* persistent: DB_CONN_MAX_AGE=60, one connection per thread, kept;
+* pooled: DB_POOL_SIZE connections shared by every thread.
+
+Each runs in a process of its own so that it gets its own settings.
+Connection set-up is what pooling saves, so run it against a local
+PostgreSQL for meaningful numbers::
+
+    BENCH_DATABASE_URL=postgres://localhost/tonyspizza_bench python -m benchmarks.db_pool
+
+Usage::
+
+    python -m benchmarks.db_pool [--threads 8] [--requests 200] [--pool-size 4]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks import utils
+
+
+def serve(cookie, threads, requests):
+    """
+    Makes requests to the booking list from each thread and returns the
+    latencies in ms and the number of times Django connected.
+    """
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.db.backends.signals import connection_created
+    from django.test import RequestFactory
+
+    handler = WSGIHandler()
+    factory = RequestFactory()
+    connects = []
+    connection_created.connect(lambda **kwargs: connects.append(1), weak=False)
+    latencies = []
+    lock = threading.Lock()
+
+    def start_response(status, headers):
+        assert status.startswith('200'), status
+
+    def client():
+        samples = []
+        for _ in range(requests):
+            environ = factory.get('/bookings/', HTTP_COOKIE=cookie).environ
+            start = time.perf_counter()
+            response = handler(environ, start_response)
+            b''.join(response)
+            response.close()
+            samples.append((time.perf_counter() - start) * 1e3)
+        with lock:
+            latencies.extend(samples)
+
+    workers = [threading.Thread(target=client) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return latencies, len(connects)
+
+
+def child(args):
+    utils.setup()
+    from website.db.pool import pool_stats
+
+    latencies, connects = serve(args.cookie, args.threads, args.requests)
+    stats = pool_stats().get('default')
+    print(json.dumps({
+        'mean': round(sum(latencies) / len(latencies), 1),
+        **{f'p{pct}': round(utils.percentile(latencies, pct), 1) for pct in (50, 95, 99)},
+        # Django connects for every checkout from a pool; only the pool
+        # knows how many connections it really opened.
+        'connections opened': stats['created'] if stats else connects,
+        'pool max wait ms': stats['max_wait_ms'] if stats else '-',
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help='requests per thread')
+    parser.add_argument('--pool-size', type=int, default=4)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--cookie', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args)
+
+    # The runs happen in their own processes, so they need a database
+    # they can all find.
+    os.environ.setdefault(
+        'BENCH_DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='tonyspizza-bench-'), 'bench.sqlite3'),
+    )
+    utils.setup()
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.test import Client
+
+    utils.seed(10, 20000, users=20)
+    client = Client()
+    client.force_login(User.objects.filter(username__startswith='bench-').first())
+    cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+    rows = []
+    for label, env in (
+        ('new', {'DB_CONN_MAX_AGE': '0', 'DB_POOL_SIZE': '0'}),
+        ('persistent', {'DB_CONN_MAX_AGE': '60', 'DB_POOL_SIZE': '0'}),
+        (f'pooled ({args.pool_size})', {'DB_POOL_SIZE': str(args.pool_size)}),
+    ):
+        output = subprocess.run(
+            [
+                sys.executable, '-m', 'benchmarks.db_pool', '--child', '--cookie', cookie,
+                '--threads', str(args.threads), '--requests', str(args.requests),
+            ],
+            env=dict(os.environ, REQUEST_PROFILING_SAMPLE_RATE='0', **env),
+            check=True, capture_output=True, text=True,
+        ).stdout
+        rows.append({'connections': label, **json.loads(output.splitlines()[-1])})
+    print(f"{settings.DATABASES['default']['ENGINE']}, {args.threads} threads (latency in ms)")
+    utils.print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,379 @@
+"""
+End-to-end load test of the booking flows, with a JSON report.
+
+Seeds tables, users and past bookings, starts the project under
+gunicorn (gunicorn_wsgi.conf.py, as the Procfile runs it, or
+gunicorn_asgi.conf.py with --server asgi) and runs --users virtual
+users against it at once, each logged in as a user of its own. Every
+virtual user logs in, then repeats a scenario until --seconds are up:
+
+* browses the tables (tables/) and the reservation page;
+* books through the reservation page and through bookings/create/;
+* lists its bookings (bookings/);
+* moves each of them to another slot and party size, and deletes it.
+
+Bookings are made on the coming days, at random slots, leaving the
+table to the site. A form that comes back with the slot taken counts as
+rejected, not failed.
+
+Reports each endpoint's requests, requests per second and latency
+percentiles in milliseconds, as a table and as JSON (--output, or
+standard output with --output -). Runs saved as JSON can be compared
+with --baseline, which adds the change in req/s and p95 against an
+earlier report.
+
+The server uses a throwaway SQLite database unless BENCH_DATABASE_URL
+points elsewhere; --db-latency adds that many milliseconds to every
+query, as a remote database would (see benchmarks/slowdb.py).
+
+Usage::
+
+    python -m benchmarks.load_test [--users 20] [--seconds 30] [--workers 2] [--server wsgi]
+        [--tables 20] [--bookings 20000] [--db-latency 0] [--output report.json] [--baseline old.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+
+from benchmarks import utils
+from benchmarks.asgi_load import free_port, start_server
+
+SERVERS = {
+    'wsgi': ['-c', 'gunicorn_wsgi.conf.py'],
+    'asgi': ['-c', 'gunicorn_asgi.conf.py'],
+}
+
+PASSWORD = 'bench-password'
+
+BOOKING_LINK = re.compile(rb'/bookings/(\d+)/update/')
+
+# Form errors that mean the slot was taken, as opposed to a bad request.
+REJECTIONS = (b'already booked', b'no longer free', b'no table can seat')
+
+
+class VirtualUser:
+    """
+    One logged-in visitor with a keep-alive connection and cookie jar,
+    recording the latency of each request under its endpoint.
+
+    Attributes:
+        results (dict): {endpoint: [latencies in ms]} of the requests
+        that got the expected status.
+        failures (dict): {endpoint: count} of errors and unexpected
+        statuses.
+        rejected (dict): {endpoint: count} of booking forms returned
+        because the slot was taken.
+    """
+
+    def __init__(self, port, username, rng, timeout):
+        self.port = port
+        self.username = username
+        self.rng = rng
+        self.timeout = timeout
+        self.cookies = {}
+        self.reader = self.writer = None
+        self.results = defaultdict(list)
+        self.failures = defaultdict(int)
+        self.rejected = defaultdict(int)
+
+    async def send(self, method, path, form=None):
+        """
+        Sends one request and returns (status, headers, body), keeping
+        any cookies it sets and reconnecting if the server closed the
+        connection.
+        """
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection('127.0.0.1', self.port)
+        body = urlencode(form).encode() if form is not None else b''
+        lines = [f'{method} {path} HTTP/1.1', 'Host: localhost', 'Connection: keep-alive']
+        if self.cookies:
+            lines.append('Cookie: ' + '; '.join(f'{name}={value}' for name, value in self.cookies.items()))
+        if method == 'POST':
+            lines += [
+                'Content-Type: application/x-www-form-urlencoded',
+                f'Content-Length: {len(body)}',
+                f"X-CSRFToken: {self.cookies.get('csrftoken', '')}",
+            ]
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + body)
+        await self.writer.drain()
+        head = (await self.reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+        status = int(head[0].split()[1])
+        headers = {}
+        for line in head[1:]:
+            if ': ' not in line:
+                continue
+            name, value = line.split(': ', 1)
+            if name.lower() == 'set-cookie':
+                for morsel in SimpleCookie(value).values():
+                    self.cookies[morsel.key] = morsel.value
+            headers[name.lower()] = value
+        if 'content-length' in headers:
+            content = await self.reader.readexactly(int(headers['content-length']))
+        elif headers.get('transfer-encoding') == 'chunked':
+            content = await self.read_chunks()
+        else:
+            content = await self.reader.read()
+            headers['connection'] = 'close'
+        if headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status, headers, content
+
+    async def read_chunks(self):
+        content = b''
+        while True:
+            size = int((await self.reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            content += (await self.reader.readexactly(size + 2))[:-2]
+            if not size:
+                return content
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def request(self, endpoint, method, path, form=None, expect=200):
+        """
+        Sends a request and records it under endpoint. Returns the
+        response body, or None if the request failed.
+        """
+        start = time.perf_counter()
+        try:
+            status, headers, content = await asyncio.wait_for(self.send(method, path, form), self.timeout)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, IndexError):
+            self.close()
+            self.failures[endpoint] += 1
+            return None
+        elapsed = (time.perf_counter() - start) * 1e3
+        if status == expect:
+            self.results[endpoint].append(elapsed)
+            return content
+        if status == 200 and method == 'POST' and any(error in content for error in REJECTIONS):
+            self.results[endpoint].append(elapsed)
+            self.rejected[endpoint] += 1
+            return None
+        self.failures[endpoint] += 1
+        return None
+
+    def booking_form(self, day_offset, slots):
+        return {
+            'table': '',
+            'date': (date.today() + timedelta(days=day_offset)).isoformat(),
+            'time': self.rng.choice(slots),
+            'num_guests': self.rng.randint(1, 6),
+        }
+
+    async def log_in(self):
+        await self.request('GET /accounts/login/', 'GET', '/accounts/login/')
+        content = await self.request(
+            'POST /accounts/login/', 'POST', '/accounts/login/',
+            {'login': self.username, 'password': PASSWORD}, expect=302,
+        )
+        return content is not None
+
+    async def scenario(self, slots, days):
+        await self.request('GET /tables/', 'GET', '/tables/')
+        await self.request('GET /bookings/reservation/', 'GET', '/bookings/reservation/')
+        await self.request(
+            'POST /bookings/reservation/', 'POST', '/bookings/reservation/',
+            self.booking_form(self.rng.randint(1, days), slots), expect=302,
+        )
+        await self.request('GET /bookings/create/', 'GET', '/bookings/create/')
+        await self.request(
+            'POST /bookings/create/', 'POST', '/bookings/create/',
+            self.booking_form(self.rng.randint(1, days), slots), expect=302,
+        )
+        listing = await self.request('GET /bookings/', 'GET', '/bookings/')
+        for pk in dict.fromkeys(BOOKING_LINK.findall(listing or b'')):
+            pk = pk.decode()
+            page = await self.request('GET /bookings/<pk>/update/', 'GET', f'/bookings/{pk}/update/')
+            if page is not None:
+                await self.request(
+                    'POST /bookings/<pk>/update/', 'POST', f'/bookings/{pk}/update/',
+                    self.booking_form(self.rng.randint(1, days), slots), expect=302,
+                )
+            await self.request('GET /bookings/<pk>/delete/', 'GET', f'/bookings/{pk}/delete/')
+            await self.request('POST /bookings/<pk>/delete/', 'POST', f'/bookings/{pk}/delete/', {}, expect=302)
+
+    async def run(self, deadline, slots, days):
+        """
+        Logs in and repeats the scenario until the deadline. Returns the
+        number of scenarios completed.
+        """
+        completed = 0
+        if await self.log_in():
+            while time.monotonic() < deadline:
+                await self.scenario(slots, days)
+                completed += 1
+        self.close()
+        return completed
+
+
+async def load(port, usernames, seconds, timeout, days):
+    from website.slots import TIME_CHOICES
+
+    slots = [value for value, label in TIME_CHOICES]
+    users = [VirtualUser(port, username, random.Random(n), timeout) for n, username in enumerate(usernames)]
+    deadline = time.monotonic() + seconds
+    start = time.perf_counter()
+    completed = await asyncio.gather(*(user.run(deadline, slots, days) for user in users))
+    return users, sum(completed), time.perf_counter() - start
+
+
+def report(users, elapsed):
+    """
+    Returns {endpoint: stats} over all virtual users, in the order the
+    scenario first visits them.
+    """
+    latencies = defaultdict(list)
+    failures = defaultdict(int)
+    rejected = defaultdict(int)
+    for user in users:
+        for endpoint, samples in user.results.items():
+            latencies[endpoint] += samples
+        for endpoint, count in user.failures.items():
+            failures[endpoint] += count
+        for endpoint, count in user.rejected.items():
+            rejected[endpoint] += count
+    endpoints = {}
+    for endpoint in dict.fromkeys([*latencies, *failures]):
+        samples = latencies[endpoint]
+        endpoints[endpoint] = {
+            'requests': len(samples),
+            'failed': failures[endpoint],
+            'rejected': rejected[endpoint],
+            'req/s': round(len(samples) / elapsed, 1),
+            'p50': round(utils.percentile(samples, 50), 1) if samples else None,
+            'p95': round(utils.percentile(samples, 95), 1) if samples else None,
+            'p99': round(utils.percentile(samples, 99), 1) if samples else None,
+        }
+    samples = [sample for endpoint in latencies.values() for sample in endpoint]
+    endpoints['all'] = {
+        'requests': len(samples),
+        'failed': sum(failures.values()),
+        'rejected': sum(rejected.values()),
+        'req/s': round(len(samples) / elapsed, 1),
+        'p50': round(utils.percentile(samples, 50), 1) if samples else None,
+        'p95': round(utils.percentile(samples, 95), 1) if samples else None,
+        'p99': round(utils.percentile(samples, 99), 1) if samples else None,
+    }
+    return endpoints
+
+
+def revision():
+    try:
+        return subprocess.run(
+            ['git', 'describe', '--always', '--dirty'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def change(new, old):
+    if not new or not old:
+        return '-'
+    return f'{(new - old) / old * 100:+.0f}%'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=20, help='concurrent virtual users')
+    parser.add_argument('--seconds', type=float, default=30)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--server', choices=SERVERS, default='wsgi')
+    parser.add_argument('--tables', type=int, default=20)
+    parser.add_argument('--bookings', type=int, default=20000, help='past bookings to seed')
+    parser.add_argument('--days', type=int, default=60, help='how many coming days to book on')
+    parser.add_argument('--timeout', type=float, default=10, help='seconds before a request counts as failed')
+    parser.add_argument('--db-latency', type=float, default=0, help='milliseconds added to every query')
+    parser.add_argument('--output', help='file to write the JSON report to, or - for standard output')
+    parser.add_argument('--baseline', help='an earlier JSON report to compare with')
+    args = parser.parse_args()
+
+    # The server runs in its own processes, so it needs a database it
+    # can find.
+    os.environ.setdefault(
+        'BENCH_DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='tonyspizza-bench-'), 'bench.sqlite3'),
+    )
+    utils.setup()
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from website.models import Booking
+
+    # Seeded bookings end before today, so each user's upcoming list
+    # only holds the bookings the load test makes.
+    days_seeded = args.bookings // max(1, args.tables * 8) + 2
+    utils.seed(args.tables, args.bookings, users=args.users, start=date.today() - timedelta(days=days_seeded))
+    Booking.objects.filter(date__gte=date.today()).delete()
+    users = User.objects.filter(username__startswith='bench-')
+    users.update(password=make_password(PASSWORD))
+    usernames = list(users.order_by('pk').values_list('username', flat=True))
+
+    env = dict(
+        os.environ,
+        DJANGO_SETTINGS_MODULE='benchmarks.settings',
+        BENCH_DB_LATENCY_MS=str(args.db_latency),
+        REQUEST_PROFILING_SAMPLE_RATE='0',
+    )
+    port = free_port()
+    server = start_server(SERVERS[args.server], args.workers, port, env)
+    try:
+        virtual_users, scenarios, elapsed = asyncio.run(load(port, usernames, args.seconds, args.timeout, args.days))
+    finally:
+        server.terminate()
+        server.wait()
+
+    result = {
+        'run': {
+            'revision': revision(),
+            'started': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'server': args.server,
+            'workers': args.workers,
+            'users': args.users,
+            'seconds': round(elapsed, 1),
+            'tables': args.tables,
+            'bookings': args.bookings,
+            'db_latency_ms': args.db_latency,
+            'scenarios': scenarios,
+        },
+        'endpoints': report(virtual_users, elapsed),
+    }
+    if args.output == '-':
+        json.dump(result, sys.stdout, indent=2)
+        print()
+        return
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(result, file, indent=2)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)['endpoints']
+    rows = []
+    for endpoint, stats in result['endpoints'].items():
+        row = {'endpoint': endpoint, **{name: '-' if value is None else value for name, value in stats.items()}}
+        if args.baseline:
+            old = baseline.get(endpoint, {})
+            row['req/s change'] = change(stats['req/s'], old.get('req/s'))
+            row['p95 change'] = change(stats['p95'], old.get('p95'))
+        rows.append(row)
+    print(
+        f"{args.users} users for {result['run']['seconds']} s, {args.server} with {args.workers} workers, "
+        f"{args.db_latency} ms per query: {scenarios} scenarios (latency in ms)"
+    )
+    utils.print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
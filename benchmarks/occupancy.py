@@ -0,0 +1,46 @@
+"""
+Month and season occupancy reads: summary table against raw bookings.
+
+Seeds bookings, rebuilds the occupancy summary, then times reading a
+month and a three-month season of per-slot occupancy both from
+SlotOccupancy and by grouping the raw Booking rows.
+
+Usage::
+
+    python -m benchmarks.occupancy [--tables 50] [--bookings 1000000]
+"""
+import argparse
+from datetime import timedelta
+
+from benchmarks import utils
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tables', type=int, default=50)
+    parser.add_argument('--bookings', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    utils.setup()
+    from website import occupancy
+
+    last_day = utils.seed(args.tables, args.bookings)
+    occupancy.rebuild()
+    rows = []
+    for label, days in (('month', 30), ('season', 91)):
+        start = last_day - timedelta(days=days - 1)
+        rows.append({
+            'range': label,
+            'summary rows': occupancy.summary_rows(start, last_day).count(),
+            'summary ms': round(utils.summary(utils.measure(
+                lambda: list(occupancy.for_range(start, last_day)), args.repeat))['p50'] / 1000, 2),
+            'raw group-by ms': round(utils.summary(utils.measure(
+                lambda: occupancy.aggregate(start, last_day), args.repeat))['p50'] / 1000, 2),
+        })
+    print(f'{args.tables} tables, {args.bookings} bookings')
+    utils.print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
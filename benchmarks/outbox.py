@@ -0,0 +1,78 @@
+"""
+Booking-creation latency as the cost of booking side effects grows.
+
+Creates bookings through /bookings/create/ with a stand-in outbox
+handler that takes --costs milliseconds (as a slow mail server would):
+
+* outbox: the request only writes the booking and its outbox event; the
+  process_outbox worker runs the handler afterwards;
+* inline: the handler runs before the response, as it would if side
+  effects were sent from the view.
+
+Usage::
+
+    python -m benchmarks.outbox [--costs 0 10 50 200] [--bookings 30]
+"""
+import argparse
+import importlib
+import time
+from datetime import date, timedelta
+
+from benchmarks import utils
+
+handler_cost = 0
+
+
+def slow_handler(event):
+    time.sleep(handler_cost)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--costs', type=float, nargs='+', default=[0, 10, 50, 200])
+    parser.add_argument('--bookings', type=int, default=30)
+    args = parser.parse_args()
+
+    utils.setup()
+    from django.contrib.auth.models import User
+    from django.test import Client, override_settings
+    from django.urls import reverse
+    from website import outbox
+    from website.models import OutboxEvent
+
+    utils.seed(20, 0)
+    client = Client()
+    client.force_login(User.objects.filter(username__startswith='bench-').first())
+    url = reverse('booking-create')
+    day = date(2030, 1, 1)
+    handlers = {topic: ['benchmarks.outbox.slow_handler'] for topic in ('booking.created', 'booking.updated')}
+    # The handler is looked up by name, which imports this file again
+    # under its module name rather than as __main__.
+    this = importlib.import_module('benchmarks.outbox')
+    rows = []
+    with override_settings(OUTBOX_HANDLERS=handlers, REQUEST_PROFILING_SAMPLE_RATE=0):
+        for cost in args.costs:
+            this.handler_cost = cost / 1e3
+            row = {'handler ms': cost}
+            for mode in ('outbox', 'inline'):
+                samples = []
+                for _ in range(args.bookings):
+                    day += timedelta(days=1)
+                    data = {'date': day.isoformat(), 'time': '7:00 PM', 'num_guests': 2}
+                    start = time.perf_counter()
+                    assert client.post(url, data).status_code == 302
+                    if mode == 'inline':
+                        outbox.process_batch()
+                    samples.append((time.perf_counter() - start) * 1e3)
+                outbox.process_batch(size=10 ** 6)
+                summary = utils.summary(samples)
+                row[f'{mode} p50'] = round(summary['p50'], 1)
+                row[f'{mode} p99'] = round(summary['p99'], 1)
+            rows.append(row)
+    assert not OutboxEvent.objects.filter(status=OutboxEvent.PENDING).exists()
+    print(f'{args.bookings} bookings per run (latency in ms)')
+    utils.print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Anonymous landing page throughput with and without caching.
+
+Requests / and /tables/ as an anonymous visitor:
+
+* before: no cache (DummyCache) and templates reloaded from disk on
+  every render, as with the project's old settings under DEBUG;
+* template cache: compiled templates kept in memory, no page cache;
+* page cache: the project's settings, where anonymous pages and the
+  navigation fragment come from the cache.
+
+Usage::
+
+    python -m benchmarks.page_cache [--tables 50] [--requests 2000]
+"""
+import argparse
+import time
+
+from benchmarks import utils
+
+
+def throughput(func, requests):
+    start = time.perf_counter()
+    for _ in range(requests):
+        func()
+    return round(requests / (time.perf_counter() - start), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tables', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    utils.setup()
+    from copy import deepcopy
+
+    from django.conf import settings
+    from django.test import Client, override_settings
+
+    utils.seed(args.tables, 0)
+    dummy_cache = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+    uncached_templates = deepcopy(settings.TEMPLATES)
+    uncached_templates[0]['OPTIONS']['loaders'] = [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]
+    configurations = (
+        ('before', {'CACHES': dummy_cache, 'TEMPLATES': uncached_templates}),
+        ('template cache', {'CACHES': dummy_cache}),
+        ('page cache', {}),
+    )
+    client = Client()
+    rows = []
+    for label, overrides in configurations:
+        with override_settings(**overrides):
+            row = {'settings': label}
+            for path in ('/', '/tables/'):
+                def get():
+                    assert client.get(path).status_code == 200
+
+                get()
+                row[f'{path} req/s'] = throughput(get, args.requests)
+            rows.append(row)
+    print(f'{args.tables} tables, anonymous requests')
+    utils.print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
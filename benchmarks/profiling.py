@@ -0,0 +1,70 @@
+"""
+Per-request cost of RequestProfilingMiddleware.
+
+Reports the middleware's added latency in microseconds at several
+sample rates, first around a trivial view that runs three queries
+(isolating the middleware itself), then end to end through the full
+middleware stack for the index page.
+
+Usage::
+
+    python -m benchmarks.profiling [--requests 5000]
+"""
+import argparse
+import statistics
+
+from benchmarks import utils
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=5000)
+    args = parser.parse_args()
+
+    utils.setup()
+    from django.conf import settings
+    from django.db import connection
+    from django.http import HttpResponse
+    from django.test import Client, RequestFactory, override_settings
+    from website.middleware import RequestProfilingMiddleware
+
+    def view(request):
+        with connection.cursor() as cursor:
+            for _ in range(3):
+                cursor.execute('SELECT 1')
+        return HttpResponse('ok')
+
+    request = RequestFactory().get('/')
+    baseline = statistics.median(utils.measure(lambda: view(request), args.requests))
+    rows = []
+    for rate in (0, 0.1, 1):
+        with override_settings(REQUEST_PROFILING_SAMPLE_RATE=rate, SLOW_REQUEST_THRESHOLD_MS=10 ** 6):
+            middleware = RequestProfilingMiddleware(view)
+            samples = utils.measure(lambda: middleware(request), args.requests)
+        rows.append({
+            'path': 'middleware only',
+            'sample rate': rate,
+            'median us': round(statistics.median(samples), 1),
+            'added us': round(statistics.median(samples) - baseline, 1),
+        })
+
+    without = [m for m in settings.MIDDLEWARE if m != 'website.middleware.RequestProfilingMiddleware']
+    with override_settings(MIDDLEWARE=without):
+        client = Client()
+        baseline = statistics.median(utils.measure(lambda: client.get('/'), args.requests // 5))
+    rows.append({'path': 'index page', 'sample rate': '-', 'median us': round(baseline, 1), 'added us': 0})
+    for rate in (0, 0.1, 1):
+        with override_settings(REQUEST_PROFILING_SAMPLE_RATE=rate, SLOW_REQUEST_THRESHOLD_MS=10 ** 6):
+            client = Client()
+            samples = utils.measure(lambda: client.get('/'), args.requests // 5)
+        rows.append({
+            'path': 'index page',
+            'sample rate': rate,
+            'median us': round(statistics.median(samples), 1),
+            'added us': round(statistics.median(samples) - baseline, 1),
+        })
+    utils.print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Per-occurrence cost of booking a weekly series against single bookings.
+
+Books --occurrences weekly dates of one table four ways: N single
+bookings saved one by one with Booking.claim(), N submissions of the
+booking form, one create_series() call, and one submission of the
+series form. Reports the total and per-occurrence time in milliseconds
+(median of --repeat runs) and the queries each took.
+
+Usage::
+
+    python -m benchmarks.series [--occurrences 13 52] [--repeat 10]
+"""
+import argparse
+import itertools
+import time
+from datetime import date, timedelta
+
+from benchmarks import utils
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--occurrences', type=int, nargs='+', default=[13, 52])
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    utils.setup()
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+    from django.urls import reverse
+
+    from website import series
+    from website.models import Booking, Table
+    from website.slots import parse_slot
+
+    utils.seed(20, 20000, users=20)
+    user = User.objects.filter(username__startswith='bench-').first()
+    client = Client()
+    client.force_login(user)
+    table = Table.objects.order_by('-capacity').first()
+    at = '7:00 PM'
+    seven = parse_slot(at)
+    # Every run books a fresh run of weeks, so nothing conflicts.
+    starts = itertools.count()
+
+    def fresh_dates(count):
+        return series.occurrences(date(2040, 1, 6) + timedelta(weeks=next(starts) * count), count=count)
+
+    def single_saves(dates):
+        for day in dates:
+            Booking(user=user, table=table, date=day, time=seven, num_guests=4).claim()
+
+    def single_posts(dates):
+        for day in dates:
+            response = client.post(reverse('booking-create'), {
+                'table': table.pk, 'date': day.isoformat(), 'time': at, 'num_guests': 4,
+            })
+            assert response.status_code == 302, response.content
+
+    def one_series(dates):
+        series.create_series(user, table, seven, 4, dates)
+
+    def series_post(dates):
+        response = client.post(reverse('booking-series'), {
+            'table': table.pk, 'start': dates[0].isoformat(), 'time': at, 'num_guests': 4,
+            'frequency': 'weekly', 'occurrences': len(dates),
+        })
+        assert response.status_code == 302, response.content
+
+    cases = (
+        ('single claims', single_saves),
+        ('single form posts', single_posts),
+        ('create_series', one_series),
+        ('series form post', series_post),
+    )
+    rows = []
+    for count in args.occurrences:
+        for label, book in cases:
+            book(fresh_dates(count))
+            with CaptureQueriesContext(connection) as queries:
+                book(fresh_dates(count))
+                queries = len(queries)
+            timings = []
+            for _ in range(args.repeat):
+                dates = fresh_dates(count)
+                start = time.perf_counter()
+                book(dates)
+                timings.append((time.perf_counter() - start) * 1e3)
+            total = utils.percentile(timings, 50)
+            rows.append({
+                'occurrences': count,
+                'how': label,
+                'queries': queries,
+                'total ms': round(total, 1),
+                'per occurrence ms': round(total / count, 2),
+            })
+    utils.print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
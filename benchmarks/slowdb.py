@@ -0,0 +1,29 @@
+"""
+Simulated database latency for the server benchmarks.
+
+With BENCH_DB_LATENCY_MS set, benchmarks/settings.py installs this
+middleware, which sleeps that long before every query, as a remote or
+busy database would.
+"""
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+
+class SlowDatabaseMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.latency = settings.BENCH_DB_LATENCY_MS / 1e3
+
+    def delay(self, execute, sql, params, many, context):
+        time.sleep(self.latency)
+        return execute(sql, params, many, context)
+
+    def __call__(self, request):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self.delay))
+            return self.get_response(request)
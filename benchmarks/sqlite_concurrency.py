@@ -0,0 +1,173 @@
+"""
+Mixed readers and writers on SQLite, with and without the production profile.
+
+Seeds an SQLite file database, then runs --readers processes loading
+the booking list and --writers processes creating and deleting bookings
+through the booking views, all at once, for --seconds. This is done
+twice, each time on a fresh database:
+
+* before: Django's own SQLite backend, with the rollback journal and a
+  plain BEGIN for every transaction;
+* profile: the SQLite production profile (SQLITE_PROFILE), with WAL, a
+  busy timeout, the tuned pragmas and BEGIN IMMEDIATE for booking writes.
+
+Reports successful reads and writes per second, failed requests
+("database is locked") and p99 latency in milliseconds.
+
+Usage::
+
+    python -m benchmarks.sqlite_concurrency [--readers 8] [--writers 4] [--seconds 5]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from benchmarks import utils
+
+PROFILES = {'before': '0', 'profile': '1'}
+
+
+def reader(cookie, seconds, results):
+    from django.db import OperationalError
+    from django.test import Client
+
+    client = Client()
+    client.cookies.load(cookie)
+    latencies, failed = [], 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            ok = client.get('/bookings/').status_code == 200
+        except OperationalError:
+            ok = False
+        if ok:
+            latencies.append((time.perf_counter() - start) * 1e3)
+        else:
+            failed += 1
+    results.put(('read', latencies, failed))
+
+
+def writer(cookie, table, seconds, results):
+    """
+    Books the table on successive days, then cancels each booking.
+    """
+    from django.db import OperationalError
+    from django.test import Client
+    from website.models import Booking
+
+    client = Client()
+    client.cookies.load(cookie)
+    latencies, failed = [], 0
+    day = date(2040, 1, 1)
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        day += timedelta(days=1)
+        start = time.perf_counter()
+        try:
+            response = client.post('/bookings/create/', {
+                'table': table, 'date': day.isoformat(), 'time': '7:00 PM', 'num_guests': 2,
+            })
+            ok = response.status_code == 302
+            if ok:
+                latencies.append((time.perf_counter() - start) * 1e3)
+                start = time.perf_counter()
+                pk = Booking.objects.values_list('pk', flat=True).get(table=table, date=day)
+                ok = client.post(f'/bookings/{pk}/delete/').status_code == 302
+        except OperationalError:
+            ok = False
+        if ok:
+            latencies.append((time.perf_counter() - start) * 1e3)
+        else:
+            failed += 1
+    results.put(('write', latencies, failed))
+
+
+def run(args):
+    """
+    Runs the load against this process's database and prints the
+    results as JSON.
+    """
+    import multiprocessing
+
+    utils.setup()
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.db import connections
+    from django.test import Client
+    from website.models import Table
+
+    utils.seed(max(args.writers, 10), 20000, users=20)
+    client = Client()
+    client.force_login(User.objects.filter(username__startswith='bench-').first())
+    cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+    tables = list(Table.objects.order_by('-capacity').values_list('pk', flat=True)[:args.writers])
+    # Every process opens its own connection.
+    connections.close_all()
+
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    workers = [context.Process(target=reader, args=(cookie, args.seconds, results)) for _ in range(args.readers)]
+    workers += [context.Process(target=writer, args=(cookie, table, args.seconds, results)) for table in tables]
+    for worker in workers:
+        worker.start()
+    totals = {'read': ([], 0), 'write': ([], 0)}
+    for _ in workers:
+        kind, latencies, failed = results.get()
+        totals[kind] = (totals[kind][0] + latencies, totals[kind][1] + failed)
+    for worker in workers:
+        worker.join()
+    print(json.dumps({
+        kind: {
+            'per_second': round(len(latencies) / args.seconds, 1),
+            'failed': failed,
+            'p99': round(utils.percentile(latencies, 99), 1) if latencies else None,
+        }
+        for kind, (latencies, failed) in totals.items()
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--run', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run:
+        return run(args)
+
+    rows = []
+    for name, enabled in PROFILES.items():
+        directory = tempfile.mkdtemp(prefix='tonyspizza-bench-')
+        env = dict(
+            os.environ,
+            SQLITE_PRODUCTION=enabled,
+            BENCH_DATABASE_URL='sqlite:///' + os.path.join(directory, 'bench.sqlite3'),
+            REQUEST_PROFILING_SAMPLE_RATE='0',
+        )
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.sqlite_concurrency', '--run', *sys.argv[1:]],
+            env=env, check=True, stdout=subprocess.PIPE, text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        rows.append({
+            'settings': name,
+            'reads/s': result['read']['per_second'],
+            'read p99': result['read']['p99'],
+            'failed reads': result['read']['failed'],
+            'writes/s': result['write']['per_second'],
+            'write p99': result['write']['p99'],
+            'failed writes': result['write']['failed'],
+        })
+    print(f'{args.readers} readers, {args.writers} writers, {args.seconds} s (latency in ms)')
+    utils.print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Static bytes and latency of a first and a repeat page view.
+
+Runs collectstatic, starts the project under gunicorn with its sync
+workers (tonyspizza.wsgi, which serves STATIC_ROOT itself), and loads
+the home page the way a browser would: the HTML, then every stylesheet
+and script it links to, over one keep-alive connection. This is done for
+clients that accept no compression, gzip, and gzip or brotli.
+
+A repeat view sends only the HTML request and revalidates any asset that
+is not cached as immutable; hashed assets are not requested at all.
+
+Before this pipeline, Bootstrap came from a third-party CDN (a DNS
+lookup and TLS handshake of its own on every cold visit) and
+static/css/style.css was never collected.
+
+Usage::
+
+    python -m benchmarks.static_assets [--views 50]
+"""
+import argparse
+import http.client
+import os
+import re
+import tempfile
+import time
+
+from benchmarks import utils
+from benchmarks.asgi_load import free_port, start_server
+
+CLIENTS = {'identity': '', 'gzip': 'gzip, deflate', 'brotli': 'gzip, deflate, br'}
+
+ASSET = re.compile(r'(?:href|src)="(/static/[^"]+)"')
+
+
+def fetch(conn, path, accept_encoding, etag=None):
+    """
+    Returns (status, headers, body) for a GET over conn.
+    """
+    headers = {'Accept-Encoding': accept_encoding} if accept_encoding else {}
+    if etag:
+        headers['If-None-Match'] = etag
+    conn.request('GET', path, headers=headers)
+    response = conn.getresponse()
+    body = response.read()
+    return response.status, {name.lower(): value for name, value in response.getheaders()}, body
+
+
+def page_view(port, accept_encoding, cached=None):
+    """
+    Loads the home page and its assets on a new connection. cached is
+    {path: (etag, immutable)} from an earlier view, if any. Returns
+    (requests, static bytes, milliseconds, {path: (etag, immutable)}).
+    """
+    start = time.perf_counter()
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    status, headers, html = fetch(conn, '/', accept_encoding)
+    assert status == 200, status
+    requests, static_bytes, seen = 1, 0, {}
+    for path in ASSET.findall(html.decode()):
+        etag, immutable = (cached or {}).get(path, (None, False))
+        if immutable:
+            seen[path] = (etag, immutable)
+            continue
+        status, headers, body = fetch(conn, path, accept_encoding, etag)
+        assert status in (200, 304), (path, status)
+        requests += 1
+        static_bytes += len(body)
+        seen[path] = (headers.get('etag'), 'immutable' in headers.get('cache-control', ''))
+    conn.close()
+    return requests, static_bytes, (time.perf_counter() - start) * 1e3, seen
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--views', type=int, default=50)
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='tonyspizza-bench-')
+    os.environ.setdefault('BENCH_DATABASE_URL', 'sqlite:///' + os.path.join(directory, 'bench.sqlite3'))
+    os.environ.setdefault('BENCH_STATIC_ROOT', os.path.join(directory, 'staticfiles'))
+    utils.setup()
+    from django.core.management import call_command
+
+    utils.seed(10, 0)
+    start = time.perf_counter()
+    call_command('collectstatic', interactive=False, verbosity=0)
+    print(f'collectstatic: {time.perf_counter() - start:.1f} s')
+
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='benchmarks.settings', REQUEST_PROFILING_SAMPLE_RATE='0')
+    port = free_port()
+    server = start_server(['tonyspizza.wsgi'], args.workers, port, env)
+    rows = []
+    try:
+        for name, accept_encoding in CLIENTS.items():
+            page_view(port, accept_encoding)
+            first = [page_view(port, accept_encoding) for _ in range(args.views)]
+            cached = first[-1][3]
+            repeat = [page_view(port, accept_encoding, cached) for _ in range(args.views)]
+            rows.append({
+                'client': name,
+                'first requests': first[0][0],
+                'first static bytes': first[0][1],
+                'first p50': round(utils.percentile([view[2] for view in first], 50), 2),
+                'repeat requests': repeat[0][0],
+                'repeat static bytes': repeat[0][1],
+                'repeat p50': round(utils.percentile([view[2] for view in repeat], 50), 2),
+            })
+    finally:
+        server.terminate()
+        server.wait()
+    print(f'{args.views} views per client, home page over loopback (latency in ms)')
+    utils.print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Helpers shared by the benchmark scripts.
+"""
+import os
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+
+def setup():
+    """
+    Configures Django with the benchmark settings and migrates the
+    benchmark database.
+    """
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'benchmarks.settings'
+    import django
+    django.setup()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+
+def percentile(samples, pct):
+    """
+    Returns the pct-th percentile of the samples (nearest rank).
+    """
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def measure(func, repeat=100):
+    """
+    Calls func repeat times and returns its latencies in microseconds.
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+def summary(samples):
+    """
+    Returns mean/p50/p99 of latency samples, rounded for printing.
+    """
+    return {
+        'mean': round(statistics.fmean(samples), 1),
+        'p50': round(percentile(samples, 50), 1),
+        'p99': round(percentile(samples, 99), 1),
+    }
+
+
+def print_table(rows):
+    """
+    Prints a list of dicts as an aligned text table.
+    """
+    if not rows:
+        return
+    headers = list(rows[0])
+    widths = [max(len(str(h)), *(len(str(row[h])) for row in rows)) for h in headers]
+    print('  '.join(str(h).rjust(w) for h, w in zip(headers, widths)))
+    for row in rows:
+        print('  '.join(str(row[h]).rjust(w) for h, w in zip(headers, widths)))
+
+
+def seed(tables, bookings, users=10, start=date(2020, 1, 1), rng=None):
+    """
+    Fills the database with tables, users and non-conflicting bookings
+    spread over consecutive days from start. Returns the last date used.
+    """
+    from django.contrib.auth.models import User
+    from website.models import Booking, Table
+    from website.slots import SLOT_TIMES
+
+    rng = rng or random.Random(0)
+    Booking.objects.all().delete()
+    Table.objects.all().delete()
+    User.objects.filter(username__startswith='bench-').delete()
+    Table.objects.bulk_create(
+        Table(number=n, capacity=rng.choice((2, 2, 4, 4, 6, 8))) for n in range(1, tables + 1)
+    )
+    User.objects.bulk_create(User(username=f'bench-{n}') for n in range(users))
+    table_ids = list(Table.objects.values_list('pk', flat=True))
+    user_ids = list(User.objects.filter(username__startswith='bench-').values_list('pk', flat=True))
+
+    per_day = len(table_ids) * len(SLOT_TIMES)
+    # Book roughly two thirds of each day so dates are realistically full.
+    per_day_booked = max(1, per_day * 2 // 3)
+    batch = []
+    day = start
+    made = 0
+    while made < bookings:
+        cells = rng.sample(range(per_day), min(per_day_booked, bookings - made))
+        for cell in cells:
+            batch.append(Booking(
+                user_id=rng.choice(user_ids),
+                table_id=table_ids[cell // len(SLOT_TIMES)],
+                date=day,
+                time=SLOT_TIMES[cell % len(SLOT_TIMES)],
+                num_guests=rng.randint(1, 6),
+            ))
+        made += len(cells)
+        if len(batch) >= 5000:
+            Booking.objects.bulk_create(batch)
+            batch = []
+        day += timedelta(days=1)
+    Booking.objects.bulk_create(batch)
+    return day - timedelta(days=1)
@@ -0,0 +1,22 @@
+"""
+Gunicorn server profile for the ASGI application.
+
+Runs tonyspizza.asgi under uvicorn workers, which serve many
+connections each, instead of the sync workers in the Procfile, which
+serve one request at a time::
+
+    gunicorn -c gunicorn_asgi.conf.py
+
+The async views (/async/bookings/, /async/api/availability/) hand their
+database calls to a thread and keep serving other connections while
+they wait; sync views run in a thread of their own for each request
+(see tonyspizza/asgi.py).
+"""
+import os
+
+wsgi_app = 'tonyspizza.asgi:application'
+worker_class = 'uvicorn.workers.UvicornWorker'
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+keepalive = 5
+timeout = 30
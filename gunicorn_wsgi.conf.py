@@ -0,0 +1,30 @@
+"""
+Gunicorn server profile for the WSGI application, with preloading.
+
+Loads tonyspizza.wsgi once in the master process, before forking the
+sync workers, instead of in every worker::
+
+    gunicorn -c gunicorn_wsgi.conf.py
+
+A worker that is started later, to replace one that was restarted or
+died, is then ready as soon as it is forked, and the workers share the
+loaded code in memory. Objects loaded by then are frozen out of the
+garbage collector, so that collections in the workers do not touch, and
+copy, the pages they share.
+
+The database connections and pools are opened after the fork, in each
+worker (see website/db/pool.py). Code changes need a full restart: a
+HUP reloads the workers from the master's already loaded code.
+"""
+import gc
+import os
+
+wsgi_app = 'tonyspizza.wsgi:application'
+preload_app = True
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+timeout = 30
+
+
+def when_ready(server):
+    gc.freeze()
@@ -9,8 +9,27 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
+from asgiref.sync import ThreadSensitiveContext
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tonyspizza.settings')
+# Leaves out the integrations only management commands use (see OPTIONAL_APPS).
+os.environ.setdefault('WEB_PROCESS', '1')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from website.startup import warm_up  # noqa: E402
+
+# Loads the URLconf and templates now rather than on the first request.
+warm_up()
+
+
+async def application(scope, receive, send):
+    """
+    Runs each request's sync code (middleware, sync views and
+    sync_to_async calls) in a thread of its own. Without this, Django 3.2
+    runs the sync code of every request in one shared thread, so
+    requests would wait for each other's database calls.
+    """
+    async with ThreadSensitiveContext():
+        return await django_application(scope, receive, send)
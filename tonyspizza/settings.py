@@ -12,7 +12,7 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 
 from pathlib import Path
 import os
-import dj_database_url
+from website.db import database_config
 if os.path.isfile('env.py'):
     import env
 
@@ -29,7 +29,10 @@ SECRET_KEY = SECRET_KEY = os.environ.get('SECRET_KEY')
 
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# DEBUG=1 in the environment (or env.py) turns it on for development;
+# with it off, pages link the hashed static files that collectstatic
+# writes (see the static files settings below).
+DEBUG = os.environ.get('DEBUG', '0') == '1'
 
 ALLOWED_HOSTS = ['tonys-pizza.herokuapp.com', 'localhost', '8000-d1ffamp-tonyspizza-iuzh6lkaksw.ws-eu99.gitpod.io']
 
@@ -46,14 +49,28 @@ INSTALLED_APPS = [
     'allauth',
     'allauth.account',
     'allauth.socialaccount',
-    'cloudinary_storage',
     'django.contrib.staticfiles',
-    'cloudinary',
     'django_summernote',
-    'crispy_forms',
     'website',
 ]
 
+# Integrations the web process never uses: Cloudinary's app (its
+# collectstatic and template tags; media storage only needs its modules)
+# and crispy forms. The web entry points (tonyspizza.wsgi and
+# tonyspizza.asgi) set WEB_PROCESS=1 and start without them, which keeps
+# their imports out of every cold start; management commands, the
+# development server and the tests install them. Apps with admin pages
+# (social accounts, Summernote) stay in INSTALLED_APPS, so the admin is
+# the same in every process.
+
+OPTIONAL_APPS = [
+    'cloudinary_storage',
+    'cloudinary',
+    'crispy_forms',
+]
+if os.environ.get('WEB_PROCESS') != '1':
+    INSTALLED_APPS[-1:-1] = OPTIONAL_APPS
+
 SITE_ID = 1
 
 LOGIN_REDIRECT_URL = '/'
@@ -65,11 +82,13 @@ CRISPY_TEMPLATE_PACK = 'bootstrap4'
 
 
 MIDDLEWARE = [
+    'website.middleware.RequestProfilingMiddleware',
+    'website.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'website.middleware.CachedAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -80,8 +99,15 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Compiled templates are kept in memory; the development
+            # server's autoreloader clears them when a template changes.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -105,10 +131,62 @@ WSGI_APPLICATION = 'tonyspizza.wsgi.application'
 #     }
 # }
 
+# DB_CONN_MAX_AGE: seconds each thread keeps its connection between
+# requests, for sync WSGI workers (0 closes it after every request).
+# DB_POOL_SIZE: if set, connections come from a per-process pool of at
+# most this many instead, shared by every thread; use it under ASGI,
+# where each request runs in a new thread (see website/db/pool.py).
+# DB_POOL_TIMEOUT: seconds a request waits for a pooled connection.
+# DB_HEALTH_CHECK_AFTER: seconds a connection may sit idle before it is
+# checked, and replaced if it no longer answers, before reuse.
+
+# SQLite production profile, for sites on SQLite; SQLITE_PRODUCTION=0
+# turns it off. Every new connection switches the database to WAL, so
+# readers no longer block writers or each other, and applies the other
+# PRAGMAS. A writer waits up to SQLITE_BUSY_TIMEOUT seconds for the write
+# lock instead of failing with "database is locked", and booking writes
+# take the lock as they begin (see website.db.write_transaction).
+
+SQLITE_PROFILE = {
+    'busy_timeout': float(os.environ.get('SQLITE_BUSY_TIMEOUT', '20')),
+    'pragmas': {
+        'journal_mode': 'WAL',
+        # Safe from corruption in WAL mode; only the last commits can be
+        # lost, and only on a power failure.
+        'synchronous': 'NORMAL',
+        # 64 MB of page cache (negative sizes are in KiB) and 256 MB of
+        # memory-mapped reads per connection.
+        'cache_size': -64000,
+        'mmap_size': 256 * 2 ** 20,
+        'temp_store': 'MEMORY',
+    },
+} if os.environ.get('SQLITE_PRODUCTION', '1') == '1' else None
+
+connection_options = {
+    'conn_max_age': int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+    'pool_size': int(os.environ.get('DB_POOL_SIZE', '0')),
+    'pool_timeout': float(os.environ.get('DB_POOL_TIMEOUT', '10')),
+    'check_after': float(os.environ.get('DB_HEALTH_CHECK_AFTER', '30')),
+    'sqlite': SQLITE_PROFILE,
+}
+
 DATABASES = {
-    'default': dj_database_url.parse(os.environ.get("DATABASE_URL"))
+    'default': database_config(os.environ.get("DATABASE_URL"), **connection_options)
 }
 
+# Read replicas
+# DATABASE_REPLICA_URLS: comma-separated URLs of read-only replicas of
+# DATABASE_URL. Reads go to a random replica, except for a visitor who
+# has written in the last READ_YOUR_WRITES_SECONDS, whose reads stay on
+# the primary (see website/routers.py).
+
+for n, url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(',')), start=1):
+    DATABASES[f'replica{n}'] = {**database_config(url, **connection_options), 'TEST': {'MIRROR': 'default'}}
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['website.routers.PrimaryReplicaRouter']
+READ_YOUR_WRITES_SECONDS = int(os.environ.get('READ_YOUR_WRITES_SECONDS', '5'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -146,10 +224,16 @@ USE_TZ = True
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/3.2/howto/static-files/
 
+# collectstatic gives each file a content-hashed name and precompresses
+# it (see website/storage.py), and tonyspizza.wsgi serves STATIC_ROOT
+# itself (see website/static.py): hashed files with far-future caching,
+# anything else for STATIC_MAX_AGE seconds. Cloudinary only stores media.
+
 STATIC_URL = '/static/'
-STATICFILES_STORAGE = 'cloudinary_storage.storage.StaticHashedCloudinaryStorage'
-STATICFILES_DIR = [os.path.join(BASE_DIR, 'static')]
+STATICFILES_STORAGE = 'website.storage.CompressedManifestStaticFilesStorage'
+STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+STATIC_MAX_AGE = 60
 
 MEDIA_URL = '/media/'
 DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
@@ -158,3 +242,134 @@ DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Table availability
+# Seconds a date's occupancy stays in each process's availability index
+# before it is reloaded from the database (see website/availability.py).
+
+AVAILABILITY_INDEX_TTL = 30
+AVAILABILITY_INDEX_MAX_DATES = 366
+
+# The most adjoining tables that may be pushed together for one party
+# (see website/allocation.py).
+
+TABLE_COMBINATION_MAX = 2
+
+# Seconds a date's availability stays cached for the JSON availability API,
+# as a backstop to signal-based invalidation (see website/caching.py).
+
+AVAILABILITY_CACHE_TIMEOUT = 300
+
+# Request profiling
+# Share of requests (0 to 1) that get a Server-Timing header, and the
+# duration above which a profiled request is logged with its SQL to the
+# website.slow_requests logger (see website/middleware.py).
+
+REQUEST_PROFILING_SAMPLE_RATE = float(os.environ.get('REQUEST_PROFILING_SAMPLE_RATE', '1.0'))
+SLOW_REQUEST_THRESHOLD_MS = int(os.environ.get('SLOW_REQUEST_THRESHOLD_MS', '500'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'website.slow_requests': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+        'website.startup': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# Caching
+# The default cache is local memory, private to each process. Set
+# CACHE_BACKEND to 'django.core.cache.backends.filebased.FileBasedCache'
+# (with CACHE_LOCATION a directory) to share it between the processes
+# of one host, or to a shared backend such as
+# 'django.core.cache.backends.memcached.PyMemcacheCache' (with
+# CACHE_LOCATION its address) to share it between hosts, so that
+# signal-based invalidation reaches every process.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'tonyspizza'),
+    },
+}
+
+# Seconds an anonymous page stays cached, as a backstop to the Table
+# signals that invalidate it (see website/caching.py).
+
+PAGE_CACHE_TIMEOUT = 600
+
+# Email
+# Printed to the console unless EMAIL_BACKEND says otherwise, e.g.
+# 'django.core.mail.backends.filebased.EmailBackend' with EMAIL_FILE_PATH
+# a directory, or 'django.core.mail.backends.smtp.EmailBackend'.
+
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_FILE_PATH = os.environ.get('EMAIL_FILE_PATH', os.path.join(BASE_DIR, 'sent_emails'))
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', "Tony's Pizza <bookings@tonyspizza.example>")
+KITCHEN_EMAIL = os.environ.get('KITCHEN_EMAIL', '')
+
+# Booking side effects
+# Handlers the process_outbox worker runs for each outbox topic, and how
+# it retries: failed events wait OUTBOX_RETRY_DELAY seconds, doubling
+# each time, for up to OUTBOX_MAX_ATTEMPTS attempts; a claimed event is
+# retried after OUTBOX_LEASE seconds if its worker dies
+# (see website/outbox.py).
+
+OUTBOX_HANDLERS = {
+    'booking.created': [
+        'website.handlers.send_confirmation',
+        'website.handlers.notify_kitchen',
+        'website.handlers.send_calendar_invite',
+    ],
+    'booking.updated': [
+        'website.handlers.send_confirmation',
+        'website.handlers.notify_kitchen',
+        'website.handlers.send_calendar_invite',
+    ],
+    'booking.cancelled': [
+        'website.handlers.send_confirmation',
+        'website.handlers.notify_kitchen',
+        'website.handlers.send_calendar_invite',
+    ],
+}
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_RETRY_DELAY = 30
+OUTBOX_LEASE = 300
+
+# Booking archive
+# The archive_bookings command moves bookings older than this many days
+# out of the live Booking table (see website/archive.py).
+
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', '365'))
+
+# Sessions and users
+# With a cache shared between processes (see CACHE_BACKEND above),
+# sessions are read from the cache, and changes that do not log anyone
+# in or out reach the database at most once every SESSION_WRITE_BEHIND
+# seconds (see website/sessions.py), and the user logged in to a session
+# is cached for USER_CACHE_TIMEOUT seconds (see website/auth.py). With
+# the default local-memory cache both are read from the database.
+
+SESSION_ENGINE = 'website.sessions'
+SESSION_WRITE_BEHIND = int(os.environ.get('SESSION_WRITE_BEHIND', '60'))
+USER_CACHE_TIMEOUT = int(os.environ.get('USER_CACHE_TIMEOUT', '300'))
+
+# Cold start
+# The most milliseconds a new web process may take to load the
+# application and answer its first request, as measured by the
+# startup_profile command and the tests (see website/startup.py).
+
+COLD_START_BUDGET_MS = int(os.environ.get('COLD_START_BUDGET_MS', '1000'))
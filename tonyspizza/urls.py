@@ -21,11 +21,17 @@ from website.views import (
     IndexView,
     TableListView,
     BookingListView,
+    BookingHistoryView,
     CustomLoginView,
     BookingCreateView,
+    SeriesBookingCreateView,
     BookingUpdateView,
     BookingDeleteView,
     ReservationView,
+    AvailabilityAPIView,
+    OccupancyCalendarView,
+    availability_api_async,
+    booking_list_async,
 )
 
 
@@ -34,9 +40,17 @@ urlpatterns = [
     path('', IndexView.as_view(), name='index'),
     path('tables/', TableListView.as_view(), name='table-list'),
     path('bookings/', BookingListView.as_view(), name='booking-list'),
+    path('bookings/history/', BookingHistoryView.as_view(), name='booking-history'),
     path('bookings/create/', BookingCreateView.as_view(), name='booking-create'),
+    path('bookings/series/', SeriesBookingCreateView.as_view(), name='booking-series'),
     path('bookings/<int:pk>/update/', BookingUpdateView.as_view(), name='booking-update'),
     path('bookings/<int:pk>/delete/', BookingDeleteView.as_view(), name='booking-delete'),
     path('bookings/reservation/', ReservationView.as_view(), name='reservation'),
+    path('api/availability/', AvailabilityAPIView.as_view(), name='availability-api'),
+    path('calendar/', OccupancyCalendarView.as_view(), name='occupancy-calendar'),
+    path('calendar/<int:year>/<int:month>/', OccupancyCalendarView.as_view(), name='occupancy-calendar-month'),
+    path('async/bookings/', booking_list_async, name='booking-list-async'),
+    path('async/api/availability/', availability_api_async, name='availability-api-async'),
     path('accounts/login/', CustomLoginView.as_view(), name='account_login'),
+    path('accounts/', include('allauth.account.urls')),
 ]
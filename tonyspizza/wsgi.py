@@ -8,9 +8,27 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/wsgi/
 """
 
 import os
+import time
 
-from django.core.wsgi import get_wsgi_application
+started = time.perf_counter()
+
+from django.core.wsgi import get_wsgi_application  # noqa: E402
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tonyspizza.settings')
+# Leaves out the integrations only management commands use (see OPTIONAL_APPS).
+os.environ.setdefault('WEB_PROCESS', '1')
+
+django_application = get_wsgi_application()
+
+from website.startup import FirstResponseTimer, warm_up  # noqa: E402
+from website.static import StaticFiles  # noqa: E402
+
+# Loads the URLconf and templates now rather than on the first request.
+warm_up()
+
+# Collected static files are served here, from STATIC_ROOT, rather than
+# by Django (see website/static.py).
+application = StaticFiles(django_application)
 
-application = get_wsgi_application()
+if os.environ.get('STARTUP_PROFILE') == '1':
+    application = FirstResponseTimer(application, started)
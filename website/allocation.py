@@ -0,0 +1,112 @@
+"""
+Best-fit table assignment.
+
+Every table, and every group of up to TABLE_COMBINATION_MAX adjoining
+tables, is a candidate seating. Candidates are kept sorted by seats, so
+a party's best fit is found by binary search: the first free candidate
+at or above the party size wastes the fewest seats. Single tables sort
+ahead of groups with the same number of seats.
+"""
+import threading
+from bisect import bisect_left
+
+from django.conf import settings
+
+from . import availability
+from .models import Table
+
+
+def adjoining_groups(adjacency, max_size):
+    """
+    Returns every connected group of up to max_size tables as sorted
+    tuples of table ids, given {table_id: set of adjoining table ids}.
+    """
+    groups = {(table_id,) for table_id in adjacency}
+    frontier = set(groups)
+    for _ in range(max_size - 1):
+        grown = set()
+        for group in frontier:
+            for table_id in group:
+                for neighbour in adjacency[table_id]:
+                    if neighbour not in group:
+                        grown.add(tuple(sorted((*group, neighbour))))
+        grown -= groups
+        groups |= grown
+        frontier = grown
+    return groups
+
+
+class TableAllocator:
+    """
+    Capacity-sorted candidate seatings for best-fit assignment.
+
+    Attributes:
+        capacities (dict): Table id to seat capacity.
+        candidates (list): (seats, table count, table ids) for every
+        table and adjoining group, sorted.
+    """
+
+    def __init__(self, capacities, adjacency=None, max_group=2):
+        self.capacities = dict(capacities)
+        adjacency = {table_id: set() for table_id in self.capacities} | dict(adjacency or {})
+        self.candidates = sorted(
+            (sum(self.capacities[t] for t in group), len(group), group)
+            for group in adjoining_groups(adjacency, max_group)
+        )
+        self._seats = [candidate[0] for candidate in self.candidates]
+
+    def assign(self, party_size, is_free):
+        """
+        Returns the table ids of the free seating that wastes the fewest
+        seats for party_size, or None if nothing free is large enough.
+        is_free(table_id) says whether a table is free for the slot.
+        """
+        for seats, count, group in self.candidates[bisect_left(self._seats, party_size):]:
+            if all(is_free(table_id) for table_id in group):
+                return group
+        return None
+
+
+_allocator = None
+_allocator_lock = threading.Lock()
+
+
+def get_allocator():
+    """
+    Returns this process's allocator, loading tables and their adjoining
+    tables on first use.
+    """
+    global _allocator
+    if _allocator is None:
+        with _allocator_lock:
+            if _allocator is None:
+                adjacency = {}
+                for from_id, to_id in Table.adjoining.through.objects.values_list('from_table_id', 'to_table_id'):
+                    adjacency.setdefault(from_id, set()).add(to_id)
+                _allocator = TableAllocator(
+                    Table.objects.values_list('id', 'capacity'),
+                    adjacency,
+                    max_group=getattr(settings, 'TABLE_COMBINATION_MAX', 2),
+                )
+    return _allocator
+
+
+def reset_allocator():
+    """
+    Drops the allocator so the next assignment reloads the tables.
+    """
+    global _allocator
+    _allocator = None
+
+
+def assign_tables(date, time, party_size, own_tables=()):
+    """
+    Returns the best-fit free table ids for a party at a slot, or None.
+    own_tables are treated as free: they belong to the booking being
+    changed.
+    """
+    index = availability.load_dates(date)
+    return get_allocator().assign(
+        party_size,
+        lambda table_id: table_id in own_tables or index.is_free(table_id, date, time),
+    )
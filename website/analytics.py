@@ -0,0 +1,261 @@
+"""
+Utilization analytics over the booking history, computed with NumPy.
+
+load() streams (table number, date, time, guests, created_at) for the
+live and archived bookings into one column array per field, a chunk at
+a time. Dates and times are fetched as text and parsed by NumPy a whole
+chunk at once, which is many times faster than letting the ORM turn
+every value into a Python object first. The reports are then computed
+from the whole columns at once, without a Python loop over the
+bookings:
+
+* utilization(): how often each table is booked in each slot of each
+  weekday, as a share of the days in the range;
+* lead_times(): how far ahead parties book;
+* party_sizes(): how many guests parties bring.
+
+Extra tables pushed together for a large party count towards their
+table's utilization, but not as parties of their own.
+
+NumPy is only needed for these reports, so nothing else imports this
+module.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.db.models import CharField, F
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .models import ArchivedBooking, Booking
+from .slots import SLOT_TIMES, format_slot
+
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+SLOT_MINUTES = np.array([slot.hour * 60 + slot.minute for slot in SLOT_TIMES])
+
+# Upper bounds, in days, of the lead time buckets.
+LEAD_BUCKETS = (
+    ('same day', 1),
+    ('1 day', 2),
+    ('2-3 days', 4),
+    ('4-7 days', 8),
+    ('8-14 days', 15),
+    ('15-30 days', 31),
+    ('over 30 days', np.inf),
+)
+
+
+class Columns:
+    """
+    The loaded bookings, one array per field, all the same length.
+
+    Attributes:
+        table (ndarray): Table numbers.
+        day (ndarray): Dates, as datetime64[D].
+        minute (ndarray): Minutes past midnight of the booked slots.
+        guests (ndarray): Party sizes; 0 for a party's extra tables.
+        created (ndarray): When each booking was made, in UTC, as
+        datetime64[s].
+        start (date): The first date of the range, or None.
+        end (date): The last date of the range, or None.
+    """
+
+    fields = ('table', 'day', 'minute', 'guests', 'created')
+    dtypes = ('int32', 'datetime64[D]', 'int16', 'int16', 'datetime64[s]')
+
+    def __init__(self, chunks, start=None, end=None):
+        columns = [[] for _ in self.fields]
+        for chunk in chunks:
+            for column, array in zip(columns, chunk):
+                column.append(array)
+        for name, dtype, column in zip(self.fields, self.dtypes, columns):
+            setattr(self, name, np.concatenate(column) if column else np.empty(0, dtype))
+        self.start = start
+        self.end = end
+
+    def __len__(self):
+        return len(self.table)
+
+    def days(self):
+        """
+        Returns the dates of the range as datetime64[D], or the dates
+        from the first booking to the last if it is open ended.
+        """
+        if not len(self) and not (self.start and self.end):
+            return np.empty(0, 'datetime64[D]')
+        first = np.datetime64(self.start, 'D') if self.start else self.day.min()
+        last = np.datetime64(self.end, 'D') if self.end else self.day.max()
+        return np.arange(first, last + 1)
+
+
+def weekday(days):
+    """
+    Returns the weekday (Monday is 0) of each datetime64[D] date.
+    """
+    # 1970-01-01 was a Thursday.
+    return ((days.astype('int64') + 3) % 7).astype('int8')
+
+
+def chunk_arrays(rows, size):
+    """
+    Yields the rows size at a time, as one array per field.
+    """
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield to_arrays(chunk)
+            chunk = []
+    if chunk:
+        yield to_arrays(chunk)
+
+
+def to_arrays(chunk):
+    """
+    Returns the columns of a chunk of rows whose date, time and
+    created_at are ISO text ('2030-03-01', '19:00:00' and
+    '2030-02-26 18:30:00.123456', perhaps with an offset, which is
+    always +00 because Django keeps its connections in UTC).
+    """
+    tables, days, times, guests, created = zip(*chunk)
+    digits = np.array(times, 'S5').view('uint8').reshape(-1, 5).astype('int16') - ord('0')
+    return (
+        np.array(tables, 'int32'),
+        np.array(days, 'datetime64[D]'),
+        (digits[:, 0] * 10 + digits[:, 1]) * 60 + digits[:, 3] * 10 + digits[:, 4],
+        np.array(guests, 'int16'),
+        np.array(created, 'U19').astype('datetime64[s]'),
+    )
+
+
+def queryset(model, table_field, start=None, end=None, tables=None):
+    rows = model.objects.order_by()
+    if start:
+        rows = rows.filter(date__gte=start)
+    if end:
+        rows = rows.filter(date__lte=end)
+    if tables:
+        rows = rows.filter(**{f'{table_field}__in': tables})
+    return rows.annotate(
+        table_key=F(table_field),
+        day=Cast('date', CharField()),
+        slot=Cast('time', CharField()),
+        made=Cast('created_at', CharField()),
+    ).values_list('table_key', 'day', 'slot', 'num_guests', 'made')
+
+
+def load(start=None, end=None, tables=None, archived=True, chunk_size=20000):
+    """
+    Returns the Columns of the bookings from start to end (inclusive,
+    either open ended), optionally only on the given table numbers, with
+    the archived bookings unless archived is False.
+    """
+    sources = [queryset(Booking, 'table__number', start, end, tables)]
+    if archived:
+        sources.append(queryset(ArchivedBooking, 'table_number', start, end, tables))
+
+    def chunks():
+        for rows in sources:
+            yield from chunk_arrays(rows.iterator(chunk_size=chunk_size), chunk_size)
+
+    return Columns(chunks(), start, end)
+
+
+def utilization(columns):
+    """
+    Returns (table numbers, bookings, utilization), where bookings is an
+    array of [weekday, slot, table] booking counts and utilization
+    divides them by the number of each weekday in the range.
+    """
+    numbers = np.unique(columns.table)
+    slot = np.searchsorted(SLOT_MINUTES, columns.minute)
+    known = (slot < len(SLOT_MINUTES)) & (SLOT_MINUTES[np.minimum(slot, len(SLOT_MINUTES) - 1)] == columns.minute)
+    cell = (weekday(columns.day[known]).astype('int64') * len(SLOT_MINUTES) + slot[known]) * len(numbers)
+    cell += np.searchsorted(numbers, columns.table[known])
+    shape = (len(WEEKDAYS), len(SLOT_MINUTES), len(numbers))
+    bookings = np.bincount(cell, minlength=np.prod(shape)).reshape(shape)
+    weekdays = np.bincount(weekday(columns.days()), minlength=len(WEEKDAYS))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        share = np.where(weekdays[:, None, None] > 0, bookings / weekdays[:, None, None], 0.0)
+    return numbers, bookings, share
+
+
+def parties(columns):
+    """
+    Returns a mask of the bookings that are parties, not extra tables.
+    """
+    return columns.guests > 0
+
+
+def utc_offsets(days, minutes):
+    """
+    Returns the UTC offset, in seconds, of the current time zone at each
+    local date and minute of the day, working out each distinct one once.
+    """
+    keys, inverse = np.unique(days.astype('int64') * 1440 + minutes, return_inverse=True)
+    zone = timezone.get_current_timezone()
+    epoch = datetime(1970, 1, 1)
+    offsets = np.array([
+        int(timezone.make_aware(epoch + timedelta(minutes=int(key)), zone, is_dst=False).utcoffset().total_seconds())
+        for key in keys
+    ], dtype='int64')
+    return offsets[inverse]
+
+
+def lead_times(columns):
+    """
+    Returns the parties' lead times, in days from booking to the start of
+    their slot, as {'buckets': {label: parties}, 'percentiles': {...}}.
+    """
+    mask = parties(columns)
+    days, minutes = columns.day[mask], columns.minute[mask].astype('int64')
+    # Bookings are for local times, whose offset changes with daylight
+    # saving time; created_at is in UTC.
+    starts = days + (minutes * 60 - utc_offsets(days, minutes)).astype('timedelta64[s]')
+    lead = (starts - columns.created[mask]) / np.timedelta64(1, 'D')
+    bounds = np.array([bound for label, bound in LEAD_BUCKETS])
+    counts = np.bincount(np.searchsorted(bounds, np.maximum(lead, 0), side='right'), minlength=len(bounds))
+    percentiles = np.percentile(lead, [50, 90, 99]) if len(lead) else [np.nan] * 3
+    return {
+        'buckets': {label: int(count) for (label, bound), count in zip(LEAD_BUCKETS, counts)},
+        'percentiles': {
+            f'p{pct}': None if np.isnan(value) else round(float(value), 2)
+            for pct, value in zip((50, 90, 99), percentiles)
+        },
+    }
+
+
+def party_sizes(columns):
+    """
+    Returns {guests: parties} for every party size booked.
+    """
+    sizes, counts = np.unique(columns.guests[parties(columns)], return_counts=True)
+    return {int(size): int(count) for size, count in zip(sizes, counts)}
+
+
+def report(columns):
+    """
+    Returns every report as plain data, ready for JSON.
+    """
+    numbers, bookings, share = utilization(columns)
+    days = columns.days()
+    return {
+        'start': str(days[0]) if len(days) else None,
+        'end': str(days[-1]) if len(days) else None,
+        'bookings': len(columns),
+        'parties': int(parties(columns).sum()),
+        'utilization': [
+            {
+                'weekday': WEEKDAYS[day],
+                'slot': format_slot(SLOT_TIMES[slot]),
+                'table': int(number),
+                'bookings': int(bookings[day, slot, position]),
+                'utilization': round(float(share[day, slot, position]), 4),
+            }
+            for day in range(len(WEEKDAYS))
+            for slot in range(len(SLOT_TIMES))
+            for position, number in enumerate(numbers)
+        ],
+        'lead_times': lead_times(columns),
+        'party_sizes': party_sizes(columns),
+    }
@@ -0,0 +1,66 @@
+"""
+Archival of past bookings.
+
+Booking only ever grows, and every live query pays for its history. The
+archive_bookings command moves bookings older than ARCHIVE_AFTER_DAYS
+into ArchivedBooking, where BookingHistoryView still shows them to their
+guests.
+
+Bookings move oldest first, in batches of whole days, each in a
+transaction of its own that copies the batch and deletes it from Booking
+together. A batch holds its locks only for as long as it takes, and an
+interrupted run loses nothing: running it again carries on from the
+oldest booking left.
+
+The move is not a cancellation, so it sends no signals. The occupancy
+summary keeps the archived dates' rows as they were, and rebuild() and
+check() leave them alone (see occupancy.default_start).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .db import delete_rows, write_transaction
+from .models import ArchivedBooking, Booking
+
+
+def horizon(days=None):
+    """
+    Returns the first date that is not archived: bookings before it are.
+    """
+    if days is None:
+        days = getattr(settings, 'ARCHIVE_AFTER_DAYS', 365)
+    return timezone.localdate() - timedelta(days=days)
+
+
+def archive_batch(before, size=1000):
+    """
+    Moves the bookings of the oldest days before the given date into the
+    archive: whole days, up to the one holding the size-th oldest
+    booking, so that a party and its extra tables always move together.
+    Returns the number of bookings moved.
+    """
+    with write_transaction():
+        old = Booking.objects.filter(date__lt=before).order_by('date')
+        days = old.values_list('date', flat=True)
+        first = days.first()
+        if first is None:
+            return 0
+        last = days[size - 1:size].first() or before - timedelta(days=1)
+        rows = old.filter(date__gte=first, date__lte=last).values_list(
+            'pk', 'user_id', 'table__number', 'table__capacity', 'combined_with_id',
+            'date', 'time', 'num_guests', 'created_at',
+        )
+        archived = [
+            ArchivedBooking(
+                id=pk, user_id=user_id, table_number=number, seats=seats, combined_with=combined_with,
+                date=date, time=time, num_guests=num_guests, created_at=created_at,
+            )
+            for pk, user_id, number, seats, combined_with, date, time, num_guests, created_at in rows
+        ]
+        ArchivedBooking.objects.bulk_create(archived, ignore_conflicts=True)
+        # A plain DELETE: Booking.delete() would collect every row and
+        # send post_delete, which treats the bookings as cancelled.
+        delete_rows(Booking, [booking.pk for booking in archived])
+    return len(archived)
@@ -0,0 +1,100 @@
+"""
+Cached users for authenticated requests.
+
+Django's AuthenticationMiddleware loads request.user from the database on
+every request. CachedAuthenticationMiddleware (see middleware.py) keeps
+the resolved user in the cache for USER_CACHE_TIMEOUT seconds instead,
+keyed by the session, the session's auth hash and a per-user version:
+
+* a password change changes the auth hash, which Django derives from
+  the password hash, so old sessions no longer find the user;
+* saving or deleting the user starts a new version (see signals.py),
+  which drops the user from every session's cache;
+* logging out deletes the session's entry.
+
+None of this reaches other processes through a local-memory cache,
+which would keep serving a deactivated user, or one whose password has
+changed, for up to USER_CACHE_TIMEOUT seconds. With such a cache users
+are loaded from the database on every request, as Django does; set
+CACHE_BACKEND to a shared cache to cache them (see the CACHES setting).
+"""
+import time
+
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import HASH_SESSION_KEY, SESSION_KEY
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def shared():
+    """
+    Whether other processes see the cache, so that users can be cached.
+    """
+    return not isinstance(caches['default'], LocMemCache)
+
+
+def version_key(user_id):
+    return f'auth:user-version:{user_id}'
+
+
+def _user_version(user_id):
+    """
+    Returns the current version of a user, starting a new one if the
+    cache has lost it.
+    """
+    key = version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def user_key(session_key, user_id, session_hash, version):
+    return f'auth:user:{user_id}:{version}:{session_key}:{session_hash}'
+
+
+def session_user_key(session):
+    """
+    Returns the cache key of the user logged in to a session, or None if
+    nobody is.
+    """
+    user_id = session.get(SESSION_KEY)
+    if user_id is None or session.session_key is None:
+        return None
+    return user_key(session.session_key, user_id, session.get(HASH_SESSION_KEY), _user_version(user_id))
+
+
+def get_user(request):
+    """
+    Returns the user logged in to the request's session, from the cache
+    if possible, or AnonymousUser.
+    """
+    if not shared():
+        return auth.get_user(request)
+    key = session_user_key(request.session)
+    user = None if key is None else cache.get(key)
+    if user is None:
+        user = auth.get_user(request)
+        # get_user() may have updated the session's auth hash.
+        key = session_user_key(request.session)
+        if user.is_authenticated and key is not None:
+            cache.set(key, user, getattr(settings, 'USER_CACHE_TIMEOUT', 300))
+    return user
+
+
+def invalidate_user(user_id):
+    """
+    Drops a user from the cache of every session.
+    """
+    cache.set(version_key(user_id), time.time_ns(), None)
+
+
+def forget_session(session):
+    """
+    Drops the user logged in to a session from the cache.
+    """
+    key = session_user_key(session)
+    if key is not None:
+        cache.delete(key)
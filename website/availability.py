@@ -0,0 +1,253 @@
+"""
+Slot availability for tables.
+
+Availability is answered from an in-memory occupancy index instead of
+scanning Booking: each loaded date holds one integer bitmap per table,
+with one bit per slot of the booking grid (see slots.SLOT_TIMES). Loading
+any number of dates costs one query; every lookup after that is a handful
+of bit operations.
+
+The index is kept current by the Booking signals in signals.py. Each web
+process has its own copy, so loaded dates also expire after
+AVAILABILITY_INDEX_TTL seconds to pick up writes made by other processes
+or by queryset.update()/bulk_create(), which send no signals.
+"""
+import threading
+import time as clock
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+
+from .models import Booking, Table
+from .slots import SLOT_TIMES, SLOT_INDEX, ALL_SLOTS
+
+
+def date_range(start, end):
+    """
+    Yields every date from start to end inclusive.
+    """
+    for offset in range((end - start).days + 1):
+        yield start + timedelta(days=offset)
+
+
+def slots_in(bits):
+    """
+    Returns the slot times whose bits are set in the given bitmap.
+    """
+    return [slot for bit, slot in enumerate(SLOT_TIMES) if bits >> bit & 1]
+
+
+class OccupancyIndex:
+    """
+    Per-date occupancy bitmaps for every table.
+
+    Attributes:
+        capacities (dict): Table id to seat capacity.
+        ttl (float): Seconds a loaded date stays valid, or None for ever.
+        max_dates (int): How many dates are kept before the least
+        recently used one is dropped.
+    """
+
+    def __init__(self, tables=(), ttl=None, max_dates=366):
+        self.capacities = dict(tables)
+        self.ttl = ttl
+        self.max_dates = max_dates
+        self._days = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __contains__(self, date):
+        entry = self._days.get(date)
+        if entry is None:
+            return False
+        return self.ttl is None or clock.monotonic() - entry[0] < self.ttl
+
+    def missing_dates(self, dates):
+        """
+        Returns the dates that still have to be loaded from the database.
+        """
+        return [date for date in dates if date not in self]
+
+    def load(self, dates, rows):
+        """
+        Replaces the occupancy of the given dates with the
+        (table_id, date, time) rows booked on them.
+        """
+        now = clock.monotonic()
+        fresh = {date: {} for date in dates}
+        for table_id, date, time in rows:
+            day = fresh.get(date)
+            bit = SLOT_INDEX.get(time)
+            if day is not None and bit is not None:
+                day[table_id] = day.get(table_id, 0) | 1 << bit
+        with self._lock:
+            for date, day in fresh.items():
+                self._days[date] = (now, day)
+                self._days.move_to_end(date)
+            while len(self._days) > self.max_dates:
+                self._days.popitem(last=False)
+
+    def add(self, table_id, date, time):
+        """
+        Marks a table as booked for a slot, if that date is loaded.
+        """
+        bit = SLOT_INDEX.get(time)
+        with self._lock:
+            entry = self._days.get(date)
+            if entry is not None and bit is not None:
+                day = entry[1]
+                day[table_id] = day.get(table_id, 0) | 1 << bit
+
+    def discard(self, table_id, date, time):
+        """
+        Marks a table as free for a slot, if that date is loaded.
+        """
+        bit = SLOT_INDEX.get(time)
+        with self._lock:
+            entry = self._days.get(date)
+            if entry is not None and bit is not None:
+                day = entry[1]
+                day[table_id] = day.get(table_id, 0) & ~(1 << bit)
+
+    def occupied(self, date, table_id):
+        """
+        Returns the bitmap of booked slots for a table on a loaded date.
+        """
+        return self._days[date][1].get(table_id, 0)
+
+    def is_free(self, table_id, date, time):
+        return not self.occupied(date, table_id) >> SLOT_INDEX[time] & 1
+
+    def free_tables(self, date, time, party_size=1):
+        """
+        Returns the ids of the tables that seat party_size and are free
+        for the slot.
+        """
+        mask = 1 << SLOT_INDEX[time]
+        day = self._days[date][1]
+        return [
+            table_id for table_id, capacity in self.capacities.items()
+            if capacity >= party_size and not day.get(table_id, 0) & mask
+        ]
+
+    def free_slot_bits(self, date, party_size=1):
+        """
+        Returns a bitmap of the slots in which at least one table that
+        seats party_size is free.
+        """
+        day = self._days[date][1]
+        free = 0
+        for table_id, capacity in self.capacities.items():
+            if capacity >= party_size:
+                free |= ~day.get(table_id, 0) & ALL_SLOTS
+                if free == ALL_SLOTS:
+                    break
+        return free
+
+    def free_slots(self, date, party_size=1):
+        """
+        Returns the slot times that can still seat party_size.
+        """
+        return slots_in(self.free_slot_bits(date, party_size))
+
+    def free_capacity(self, date, time):
+        """
+        Returns the number of seats on tables that are free for the slot.
+        """
+        mask = 1 << SLOT_INDEX[time]
+        day = self._days[date][1]
+        return sum(
+            capacity for table_id, capacity in self.capacities.items()
+            if not day.get(table_id, 0) & mask
+        )
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """
+    Returns this process's occupancy index, loading the tables on first use.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = OccupancyIndex(
+                    Table.objects.values_list('id', 'capacity'),
+                    ttl=getattr(settings, 'AVAILABILITY_INDEX_TTL', 30),
+                    max_dates=getattr(settings, 'AVAILABILITY_INDEX_MAX_DATES', 366),
+                )
+    return _index
+
+
+def reset_index():
+    """
+    Drops the index so the next lookup reloads tables and bookings.
+    """
+    global _index
+    _index = None
+
+
+def move_booking(old, new):
+    """
+    Moves a booking from its old (table_id, date, time) slot to its new
+    one in this process's index, if the index has been built. Either
+    slot may be None.
+    """
+    index = _index
+    if index is None:
+        return
+    if old is not None and None not in old:
+        index.discard(*old)
+    if new is not None:
+        index.add(*new)
+
+
+def load_dates(start, end=None, fresh=False):
+    """
+    Returns the index with every date from start to end loaded,
+    fetching any missing dates in a single query. With fresh=True every
+    date is reloaded, whether or not it has expired.
+    """
+    index = get_index()
+    dates = date_range(start, end or start)
+    missing = list(dates) if fresh else index.missing_dates(dates)
+    if missing:
+        rows = Booking.objects.filter(
+            date__range=(missing[0], missing[-1]),
+        ).values_list('table_id', 'date', 'time')
+        index.load(missing, rows.iterator())
+    return index
+
+
+def is_free(table_id, date, time):
+    return load_dates(date).is_free(table_id, date, time)
+
+
+def free_tables(date, time, party_size=1):
+    return load_dates(date).free_tables(date, time, party_size)
+
+
+def free_slots(date, party_size=1):
+    return load_dates(date).free_slots(date, party_size)
+
+
+def free_capacity(date, time):
+    return load_dates(date).free_capacity(date, time)
+
+
+def availability(start, end=None, party_size=1):
+    """
+    Returns {date: {slot: [table ids]}} for the free tables that seat
+    party_size in every slot from start to end inclusive.
+    """
+    index = load_dates(start, end)
+    return {
+        date: {
+            slot: index.free_tables(date, slot, party_size)
+            for slot in index.free_slots(date, party_size)
+        }
+        for date in date_range(start, end or start)
+    }
@@ -0,0 +1,248 @@
+"""
+Cached availability and pages.
+
+Each date's free tables live in a cache entry of their own, keyed by
+the date's generation, so a booking change only invalidates the dates it
+touches by starting new generations for them (see signals.py). An entry
+computed from a load that a booking change overtook is stored under the
+old generation, where nothing reads it. Table changes affect every date,
+so they start a new key version instead. Each entry carries an ETag
+computed from its content, which lets the API answer a conditional GET
+from the cache alone.
+
+Invalidation reaches other web processes only through a shared CACHES
+backend; with the default local-memory cache, entries also expire after
+AVAILABILITY_CACHE_TIMEOUT seconds.
+
+Pages that only depend on the tables are cached whole for anonymous
+visitors under the same table version, so Table changes invalidate
+them too (see cache_anonymous_page). Each month of the occupancy
+calendar has an ETag that booking changes in the month invalidate.
+"""
+import hashlib
+import json
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+
+from . import availability
+from .models import Table
+from .slots import format_slot
+
+TABLES_VERSION_KEY = 'availability:tables'
+
+
+def _tables_version():
+    """
+    Returns the current table version, starting a new one if the cache
+    has lost it.
+    """
+    version = cache.get(TABLES_VERSION_KEY)
+    if version is None:
+        cache.add(TABLES_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(TABLES_VERSION_KEY)
+    return version
+
+
+def generation_key(date):
+    return f'availability:generation:{date.isoformat()}'
+
+
+def _generations(dates):
+    """
+    Returns {date: generation} for the given dates, starting new
+    generations for those the cache has lost.
+    """
+    keys = {generation_key(date): date for date in dates}
+    generations = cache.get_many(keys)
+    lost = [key for key in keys if key not in generations]
+    if lost:
+        for key in lost:
+            cache.add(key, time.time_ns(), None)
+        generations.update(cache.get_many(lost))
+    return {keys[key]: generations.get(key) for key in keys}
+
+
+def day_key(date, version, generation):
+    return f'availability:{version}:{date.isoformat()}:{generation}'
+
+
+def tables_key(version):
+    return f'tables:{version}'
+
+
+def month_key(year, month, version):
+    return f'calendar:{version}:{year}-{month:02d}'
+
+
+def invalidate_months(*dates):
+    """
+    Drops the ETags of the occupancy calendars of the given dates' months.
+    """
+    version = _tables_version()
+    cache.delete_many({month_key(date.year, date.month, version) for date in dates if date is not None})
+
+
+def invalidate_dates(*dates):
+    """
+    Drops the cached availability of the given dates, by starting new
+    generations for them, and the ETags of their months' occupancy
+    calendars.
+    """
+    version = _tables_version()
+    dates = {date for date in dates if date is not None}
+    generation = time.time_ns()
+    cache.set_many({generation_key(date): generation for date in dates}, None)
+    cache.delete_many([month_key(date.year, date.month, version) for date in dates])
+
+
+def invalidate_tables():
+    """
+    Drops the cached availability of every date.
+    """
+    cache.set(TABLES_VERSION_KEY, time.time_ns(), None)
+
+
+def get_tables():
+    """
+    Returns every table as (id, label, capacity), by number, loading
+    them once per table version.
+    """
+    version = _tables_version()
+    tables = cache.get(tables_key(version))
+    if tables is None:
+        tables = [
+            (table.pk, str(table), table.capacity)
+            for table in Table.objects.only('number', 'capacity').order_by('number')
+        ]
+        cache.set(tables_key(version), tables, None)
+    return tables
+
+
+def table_choices(date=None, time=None, party_size=1, own_tables=()):
+    """
+    Returns (id, label) choices for the tables that seat party_size and,
+    if a slot is given, are free for it. own_tables are treated as free:
+    they belong to the booking being changed.
+    """
+    tables = get_tables()
+    if date is not None and time is not None:
+        slot = time.strftime('%H:%M')
+        free = set(own_tables)
+        for entry in get_days(date, date)[0]['slots']:
+            if entry['time'] == slot:
+                free.update(table_id for table_id, capacity in entry['tables'])
+        tables = [table for table in tables if table[0] in free]
+    return [(table_id, label) for table_id, label, capacity in tables if capacity >= party_size]
+
+
+def month_etag(year, month):
+    """
+    Returns a strong ETag for a month's occupancy calendar, which stays
+    the same until a booking in the month or a table changes, or None
+    if the cache cannot keep one.
+    """
+    key = month_key(year, month, _tables_version())
+    token = cache.get(key)
+    if token is None:
+        cache.add(key, time.time_ns(), None)
+        token = cache.get(key)
+    return None if token is None else f'"{token}"'
+
+
+def build_day(index, date):
+    """
+    Returns the cache entry for a loaded date: each slot's free tables
+    as [table_id, capacity] pairs, and an ETag for them.
+    """
+    slots = [
+        {
+            'time': slot.strftime('%H:%M'),
+            'label': format_slot(slot),
+            'tables': [[table_id, index.capacities[table_id]] for table_id in index.free_tables(date, slot)],
+        }
+        for slot in index.free_slots(date)
+    ]
+    body = json.dumps(slots, separators=(',', ':'))
+    return {
+        'date': date.isoformat(),
+        'slots': slots,
+        'etag': hashlib.sha1(body.encode()).hexdigest(),
+    }
+
+
+def get_days(start, end):
+    """
+    Returns the cache entries for every date from start to end,
+    computing the missing ones from a single fresh database load. The
+    generations are read before the load, so entries for dates that
+    change during it are stored under keys that are already stale.
+    """
+    version = _tables_version()
+    generations = _generations(availability.date_range(start, end))
+    keys = {day_key(date, version, generation): date for date, generation in generations.items()}
+    days = cache.get_many(keys)
+    missing = [date for key, date in keys.items() if key not in days]
+    if missing:
+        index = availability.load_dates(missing[0], missing[-1], fresh=True)
+        computed = {day_key(date, version, generations[date]): build_day(index, date) for date in missing}
+        cache.set_many(computed, getattr(settings, 'AVAILABILITY_CACHE_TIMEOUT', 300))
+        days.update(computed)
+    return [days[key] for key in keys]
+
+
+def days_etag(days, party_size):
+    """
+    Returns a strong ETag for an availability response.
+    """
+    tags = ','.join(day['etag'] for day in days)
+    return '"%s"' % hashlib.sha1(f'{party_size}:{tags}'.encode()).hexdigest()
+
+
+def days_payload(days, party_size):
+    """
+    Returns the JSON body for an availability response, keeping only
+    the tables that seat party_size.
+    """
+    dates = []
+    for day in days:
+        slots = []
+        for slot in day['slots']:
+            tables = [table_id for table_id, capacity in slot['tables'] if capacity >= party_size]
+            if tables:
+                slots.append({'time': slot['time'], 'label': slot['label'], 'tables': tables})
+        dates.append({'date': day['date'], 'slots': slots})
+    return {'party_size': party_size, 'dates': dates}
+
+
+def page_key(request, version):
+    return f'page:{version}:{request.get_full_path()}'
+
+
+def cache_anonymous_page(view):
+    """
+    Caches a view's GET responses for anonymous visitors, keyed by path
+    and table version, for PAGE_CACHE_TIMEOUT seconds. Logged-in users
+    always get a fresh response, so they never share output with
+    anonymous visitors. Only use it on pages without forms, whose
+    content depends on nothing but the tables.
+    """
+    @wraps(view)
+    def cached_view(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+        key = page_key(request, _tables_version())
+        response = cache.get(key)
+        if response is None:
+            response = view(request, *args, **kwargs)
+            if callable(getattr(response, 'render', None)):
+                response = response.render()
+            if response.status_code == 200 and not response.cookies:
+                cache.set(key, response, getattr(settings, 'PAGE_CACHE_TIMEOUT', 600))
+        patch_vary_headers(response, ('Cookie',))
+        return response
+
+    return cached_view
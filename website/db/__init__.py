@@ -0,0 +1,115 @@
+"""
+Database connection settings, persistence and pooling.
+
+Kept free of model imports so that tonyspizza/settings.py can use
+database_config() to build DATABASES.
+"""
+import time
+from contextlib import contextmanager
+
+import dj_database_url
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+
+POOLED_ENGINES = {
+    'django.db.backends.postgresql': 'website.db.backends.postgresql',
+    'django.db.backends.postgresql_psycopg2': 'website.db.backends.postgresql',
+    'django.db.backends.sqlite3': 'website.db.backends.sqlite3',
+}
+
+SQLITE_ENGINE = 'django.db.backends.sqlite3'
+
+
+def database_config(url, conn_max_age=0, pool_size=0, pool_timeout=10, check_after=30, sqlite=None):
+    """
+    Returns a DATABASES entry for a database URL.
+
+    With pool_size 0, each thread keeps its connection for conn_max_age
+    seconds between requests. Otherwise the connections come from a
+    per-process pool of at most pool_size connections, shared by every
+    thread, and go back to it at the end of each request. Either way a
+    connection that has been idle for check_after seconds is checked
+    before it is reused.
+
+    sqlite, if given, is the SQLite production profile applied to an
+    SQLite database: {'busy_timeout': seconds, 'pragmas': {name: value}}
+    (see SQLITE_PROFILE in tonyspizza/settings.py).
+    """
+    config = dj_database_url.parse(url, conn_max_age=conn_max_age)
+    config['HEALTH_CHECK_AFTER'] = check_after
+    if sqlite is not None and config['ENGINE'] == SQLITE_ENGINE:
+        config['ENGINE'] = POOLED_ENGINES[SQLITE_ENGINE]
+        config.setdefault('OPTIONS', {})['timeout'] = sqlite['busy_timeout']
+        config['PRAGMAS'] = dict(sqlite['pragmas'])
+    if pool_size:
+        if config['ENGINE'] not in POOLED_ENGINES.keys() | POOLED_ENGINES.values():
+            raise ValueError(f"Connection pooling does not support {config['ENGINE']}.")
+        config['ENGINE'] = POOLED_ENGINES.get(config['ENGINE'], config['ENGINE'])
+        config['CONN_MAX_AGE'] = 0
+        config['POOL'] = {'MAX_SIZE': pool_size, 'TIMEOUT': pool_timeout, 'CHECK_AFTER': check_after}
+    return config
+
+
+def mark_idle(connections):
+    """
+    Records when each open connection went idle.
+    """
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is not None:
+            connection.idle_since = now
+
+
+def check_idle_connections(connections):
+    """
+    Closes persistent connections that have been idle for their
+    HEALTH_CHECK_AFTER seconds and no longer answer, so that the request
+    opens a fresh connection instead of failing on its first query.
+    """
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is None or connection.in_atomic_block:
+            continue
+        idle_since = getattr(connection, 'idle_since', now)
+        if now - idle_since >= connection.settings_dict.get('HEALTH_CHECK_AFTER', 30) and not connection.is_usable():
+            connection.close()
+
+
+@contextmanager
+def write_transaction(using=None):
+    """
+    transaction.atomic() for a block that writes. On an SQLite database
+    with the production profile, the outermost such block begins with
+    BEGIN IMMEDIATE, taking the write lock up front. A plain BEGIN
+    defers it to the first write, and a transaction that has read by
+    then fails at once with "database is locked" if another connection
+    wrote in the meantime, instead of waiting for the lock.
+    """
+    connection = connections[using or DEFAULT_DB_ALIAS]
+    outermost = not connection.in_atomic_block
+    if outermost:
+        connection.begin_immediate = True
+    try:
+        with transaction.atomic(using=using):
+            yield
+    finally:
+        if outermost:
+            connection.begin_immediate = False
+
+
+def delete_rows(model, pks, using=None, batch_size=500):
+    """
+    Deletes the rows of model with the given primary keys with plain
+    DELETE statements. Unlike QuerySet.delete(), nothing is collected or
+    cascaded and no signals are sent. Returns the number of rows deleted.
+    """
+    connection = connections[using or router.db_for_write(model)]
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(model._meta.pk.column)
+    pks = list(pks)
+    deleted = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(pks), batch_size):
+            batch = pks[start:start + batch_size]
+            cursor.execute(f"DELETE FROM {table} WHERE {column} IN ({', '.join(['%s'] * len(batch))})", batch)
+            deleted += cursor.rowcount
+    return deleted
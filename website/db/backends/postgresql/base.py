@@ -0,0 +1,9 @@
+from django.db.backends.postgresql import base
+
+from website.db.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """
+    The PostgreSQL backend, with connections taken from a pool.
+    """
@@ -0,0 +1,33 @@
+from django.db.backends.sqlite3 import base
+
+from website.db.pool import PooledDatabaseWrapperMixin
+
+
+class ProfiledDatabaseWrapper(base.DatabaseWrapper):
+    """
+    The SQLite backend with the production profile: the database's
+    PRAGMAS run on every new connection, and write_transaction() blocks
+    begin with BEGIN IMMEDIATE.
+    """
+
+    begin_immediate = False
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for name, value in self.settings_dict.get('PRAGMAS', {}).items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        if self.begin_immediate:
+            self.begin_immediate = False
+            self.cursor().execute('BEGIN IMMEDIATE')
+        else:
+            super()._start_transaction_under_autocommit()
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, ProfiledDatabaseWrapper):
+    """
+    The SQLite backend, with the production profile, and connections
+    taken from a pool if the database has POOL settings.
+    """
@@ -0,0 +1,223 @@
+"""
+A per-process database connection pool.
+
+Django opens a connection per thread. Under sync WSGI workers that is
+one connection per process, which CONN_MAX_AGE can keep open between
+requests. Under ASGI every request runs in a thread of its own, so
+persistent connections would pile up one per thread. The pooled
+backends in website.db.backends instead take their connections from a
+ConnectionPool shared by every thread of the process, and give them back
+when Django closes them at the end of each request.
+"""
+import os
+import threading
+import time
+from collections import deque
+from functools import partial
+
+from django.db.utils import OperationalError
+
+
+class PoolExhausted(OperationalError):
+    """
+    Raised when no pooled connection becomes free within the timeout.
+    """
+
+
+def ping(connection):
+    """
+    Returns whether a DB-API connection still answers a query.
+    """
+    try:
+        cursor = connection.cursor()
+        try:
+            cursor.execute('SELECT 1')
+        finally:
+            cursor.close()
+    except Exception:
+        return False
+    return True
+
+
+def close_quietly(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+class ConnectionPool:
+    """
+    A thread-safe pool of DB-API connections.
+
+    Attributes:
+        max_size (int): The most connections open at once, in use or idle.
+        timeout (float): Seconds to wait for a free connection before
+        raising PoolExhausted.
+        check_after (float): Seconds a connection may sit idle before it
+        is pinged on checkout; one that does not answer is replaced.
+    """
+
+    def __init__(self, max_size=10, timeout=10, check_after=30, check=ping):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_after = check_after
+        self.check = check
+        self._idle = deque()
+        self._in_use = 0
+        self._condition = threading.Condition()
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self.created = 0
+        self.discarded = 0
+
+    def acquire(self, connect):
+        """
+        Returns an idle connection, or one made by connect() if there is
+        room for another. Waits up to timeout seconds for one otherwise.
+        """
+        start = time.monotonic()
+        with self._condition:
+            while not self._idle and self._in_use >= self.max_size:
+                remaining = self.timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    raise PoolExhausted(
+                        f"No database connection became free within {self.timeout}s "
+                        f"({self.max_size} in use)."
+                    )
+                self._condition.wait(remaining)
+            waited = time.monotonic() - start
+            self.checkouts += 1
+            if waited > 0.001:
+                self.waits += 1
+            self.wait_time += waited
+            self.max_wait = max(self.max_wait, waited)
+            # The most recently used connection is the likeliest to be alive.
+            connection, idle_since = self._idle.pop() if self._idle else (None, None)
+            self._in_use += 1
+        try:
+            if connection is not None and time.monotonic() - idle_since >= self.check_after:
+                if not self.check(connection):
+                    close_quietly(connection)
+                    self.discarded += 1
+                    connection = None
+            if connection is None:
+                connection = connect()
+                self.created += 1
+        except BaseException:
+            with self._condition:
+                self._in_use -= 1
+                self._condition.notify()
+            raise
+        return connection
+
+    def release(self, connection, broken=False):
+        """
+        Returns a connection to the pool, rolling back anything left
+        open on it, or closes it if it is broken.
+        """
+        if not broken:
+            try:
+                connection.rollback()
+            except Exception:
+                broken = True
+        if broken:
+            close_quietly(connection)
+        with self._condition:
+            self._in_use -= 1
+            if broken:
+                self.discarded += 1
+            else:
+                self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+
+    def close_all(self):
+        """
+        Closes every idle connection.
+        """
+        with self._condition:
+            idle, self._idle = self._idle, deque()
+        for connection, idle_since in idle:
+            close_quietly(connection)
+
+    def stats(self):
+        with self._condition:
+            return {
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'max_size': self.max_size,
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'wait_ms': round(self.wait_time * 1e3, 2),
+                'max_wait_ms': round(self.max_wait * 1e3, 2),
+                'created': self.created,
+                'discarded': self.discarded,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, options):
+    """
+    Returns this process's pool for a database alias, creating it from
+    the alias's POOL options on first use.
+    """
+    pool = _pools.get(alias)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(alias)
+            if pool is None:
+                pool = _pools[alias] = ConnectionPool(
+                    max_size=options.get('MAX_SIZE', 10),
+                    timeout=options.get('TIMEOUT', 10),
+                    check_after=options.get('CHECK_AFTER', 30),
+                )
+    return pool
+
+
+def pool_stats():
+    """
+    Returns {alias: stats} for every pool in this process.
+    """
+    return {alias: pool.stats() for alias, pool in list(_pools.items())}
+
+
+def reset_pools():
+    """
+    Forgets every pool, so that a forked worker opens its own
+    connections instead of sharing its parent's.
+    """
+    _pools.clear()
+
+
+os.register_at_fork(after_in_child=reset_pools)
+
+
+class PooledDatabaseWrapperMixin:
+    """
+    Makes a DatabaseWrapper take its connections from the alias's pool
+    and give them back instead of closing them, if the database has
+    POOL settings.
+    """
+
+    @property
+    def pool(self):
+        options = self.settings_dict.get('POOL')
+        return None if options is None else get_pool(self.alias, options)
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        connect = partial(super().get_new_connection, conn_params)
+        return connect() if pool is None else pool.acquire(connect)
+
+    def _close(self):
+        pool = self.pool
+        if pool is None:
+            super()._close()
+        elif self.connection is not None:
+            broken = self.errors_occurred and not self.is_usable()
+            pool.release(self.connection, broken=broken)
@@ -1,28 +1,140 @@
 from django import forms
-from .models import Booking
+from . import allocation, availability, caching, series
+from .models import Booking, Table
+from .slots import TIME_CHOICES, parse_slot, format_slot
 
 
 class BookingForm(forms.ModelForm):
-    TIME_CHOICES = (
-        ('9:00 AM', '9:00 AM'),
-        ('10:00 AM', '10:00 AM'),
-        ('11:00 AM', '11:00 AM'),
-        ('12:00 PM', '12:00 PM'),
-        ('1:00 PM', '1:00 PM'),
-        ('2:00 PM', '2:00 PM'),
-        ('3:00 PM', '3:00 PM'),
-        ('4:00 PM', '4:00 PM'),
-        ('5:00 PM', '5:00 PM'),
-        ('6:00 PM', '6:00 PM'),
-        ('7:00 PM', '7:00 PM'),
-        ('8:00 PM', '8:00 PM'),
-        ('9:00 PM', '9:00 PM'),
-        ('10:00 PM', '10:00 PM'),
-    )
+    TIME_CHOICES = TIME_CHOICES
 
     date = forms.DateField(widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}))
-    time = forms.ChoiceField(choices=TIME_CHOICES, widget=forms.Select(attrs={'class': 'form-control'}))
+    time = forms.TypedChoiceField(choices=TIME_CHOICES, coerce=parse_slot, widget=forms.Select(attrs={'class': 'form-control'}))
 
     class Meta:
         model = Booking
-        fields = ['user', 'table', 'date', 'time', 'num_guests']
+        fields = ['table', 'date', 'time', 'num_guests']
+
+    def __init__(self, *args, **kwargs):
+        """
+        Shows the booking's current slot as selected when editing, and
+        lets the guest leave the table for us to pick.
+
+        The booking's user is set by the view, so the form has no user
+        field. The table choices come from the cached table list and
+        only offer tables that are free for the slot and seat the party.
+        """
+        super().__init__(*args, **kwargs)
+        if self.instance.time is not None:
+            self.initial['time'] = format_slot(self.instance.time)
+        self.fields['table'].required = False
+        self.fields['table'].choices = [('', 'Best table for my party'), *self.table_choices()]
+        self.extra_tables = ()
+
+    def chosen_slot(self):
+        """
+        Returns the (date, time, party size) the form is for: the
+        submitted values, or the booking's own when editing. Any of them
+        may be None.
+        """
+        if not self.is_bound:
+            return self.instance.date, self.instance.time, self.instance.num_guests
+        values = []
+        for name in ('date', 'time', 'num_guests'):
+            field = self.fields[name]
+            try:
+                values.append(field.clean(field.widget.value_from_datadict(self.data, self.files, self.add_prefix(name))))
+            except forms.ValidationError:
+                values.append(None)
+        return values
+
+    def table_choices(self):
+        date, time, guests = self.chosen_slot()
+        own = ()
+        if self.instance.pk is not None and (self.instance.date, self.instance.time) == (date, time):
+            own = (self.instance.table_id,)
+        return caching.table_choices(date, time, guests or 1, own)
+
+    def own_tables(self, date, time):
+        """
+        Returns the tables this booking already holds at the given slot.
+        """
+        if self.instance.pk is None or (self.instance.date, self.instance.time) != (date, time):
+            return ()
+        extras = self.instance.extra_bookings.values_list('table_id', flat=True)
+        return (self.instance.table_id, *extras)
+
+    def clean(self):
+        """
+        Checks a chosen table against the party size and the slot, or
+        picks the best-fit free table, or adjoining tables, if none was
+        chosen.
+        """
+        cleaned_data = super().clean()
+        table = cleaned_data.get('table')
+        date = cleaned_data.get('date')
+        time = cleaned_data.get('time')
+        guests = cleaned_data.get('num_guests')
+        if not (date and time and guests):
+            return cleaned_data
+        own = self.own_tables(date, time)
+        if table is None:
+            tables = allocation.assign_tables(date, time, guests, own)
+            if tables is None:
+                raise forms.ValidationError(f"Sorry, no table can seat {guests} guests at {format_slot(time)}.")
+            cleaned_data['table'] = Table.objects.get(pk=tables[0])
+            self.extra_tables = tables[1:]
+        elif table.capacity < guests:
+            self.add_error('table', f"{table} only seats {table.capacity}.")
+        elif table.pk not in own and not availability.is_free(table.pk, date, time):
+            raise forms.ValidationError(f"{table} is already booked at {format_slot(time)}.")
+        return cleaned_data
+
+    def validate_unique(self):
+        """
+        Skips the table/slot uniqueness query: clean() has already checked
+        the slot against the availability index, and Booking.claim()
+        settles any race when the booking is saved.
+        """
+        exclude = self._get_validation_exclusions()
+        exclude.append('table')
+        try:
+            self.instance.validate_unique(exclude=exclude)
+        except forms.ValidationError as e:
+            self._update_errors(e)
+
+
+class SeriesBookingForm(forms.Form):
+    """
+    Books one table at the same time on a run of dates, such as every
+    Friday for a quarter (see series.py).
+
+    The table choices come from the cached table list; the series is
+    checked against the bookings when it is saved.
+    """
+
+    table = forms.ModelChoiceField(queryset=Table.objects.all())
+    start = forms.DateField(widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}))
+    time = forms.TypedChoiceField(choices=TIME_CHOICES, coerce=parse_slot, widget=forms.Select(attrs={'class': 'form-control'}))
+    num_guests = forms.IntegerField(min_value=1)
+    frequency = forms.ChoiceField(choices=[(name, name.title()) for name in series.FREQUENCIES], initial='weekly')
+    occurrences = forms.IntegerField(min_value=2, max_value=series.MAX_OCCURRENCES, initial=13)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['table'].choices = [('', '---------'), *caching.table_choices()]
+
+    def clean(self):
+        """
+        Checks the table against the party size and works out the dates.
+        """
+        cleaned_data = super().clean()
+        table = cleaned_data.get('table')
+        guests = cleaned_data.get('num_guests')
+        if table and guests and table.capacity < guests:
+            self.add_error('table', f"{table} only seats {table.capacity}.")
+        start = cleaned_data.get('start')
+        count = cleaned_data.get('occurrences')
+        frequency = cleaned_data.get('frequency')
+        if start and count and frequency:
+            cleaned_data['dates'] = series.occurrences(start, frequency, count=count)
+        return cleaned_data
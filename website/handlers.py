@@ -0,0 +1,110 @@
+"""
+Outbox handlers for booking events (see website/outbox.py).
+
+Each takes an OutboxEvent whose payload describes the booking. Email
+goes through Django's EMAIL_BACKEND, which is the console or file
+backend unless configured otherwise.
+"""
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import EmailMessage, send_mail
+
+from .models import Table
+from .slots import format_slot
+
+# How long a booking holds its table, for calendar invites.
+BOOKING_LENGTH = timedelta(minutes=90)
+
+SUBJECTS = {
+    'booking.created': "Your table is booked",
+    'booking.updated': "Your booking has changed",
+    'booking.cancelled': "Your booking is cancelled",
+}
+
+
+def describe(payload):
+    """
+    Returns a booking's table, day and time as text.
+    """
+    when = date.fromisoformat(payload['date'])
+    slot = format_slot(time.fromisoformat(payload['time']))
+    table = Table.objects.filter(pk=payload['table']).first()
+    return f"{table or 'A table'} for {payload['num_guests']} on {when:%A %d %B %Y} at {slot}"
+
+
+def guest_email(payload):
+    return User.objects.filter(pk=payload['user']).values_list('email', flat=True).first()
+
+
+def send_confirmation(event):
+    """
+    Emails the guest about a booking being made, changed or cancelled.
+    """
+    email = guest_email(event.payload)
+    if not email:
+        return
+    send_mail(
+        SUBJECTS[event.topic],
+        f"{describe(event.payload)}.\n\nTony's Pizza",
+        settings.DEFAULT_FROM_EMAIL,
+        [email],
+    )
+
+
+def notify_kitchen(event):
+    """
+    Tells the kitchen about the covers a booking adds or takes away, if
+    KITCHEN_EMAIL is set.
+    """
+    kitchen = getattr(settings, 'KITCHEN_EMAIL', '')
+    if kitchen:
+        action = event.topic.split('.')[1]
+        send_mail(
+            f"Booking {action}: {event.payload['num_guests']} covers",
+            f"{describe(event.payload)} ({action}).",
+            settings.DEFAULT_FROM_EMAIL,
+            [kitchen],
+        )
+
+
+def calendar_invite(payload, cancelled=False):
+    """
+    Returns an iCalendar invite for a booking.
+    """
+    start = datetime.combine(date.fromisoformat(payload['date']), time.fromisoformat(payload['time']))
+    end = start + BOOKING_LENGTH
+    stamp = '%Y%m%dT%H%M%S'
+    return '\r\n'.join([
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        "PRODID:-//Tony's Pizza//Bookings//EN",
+        f"METHOD:{'CANCEL' if cancelled else 'REQUEST'}",
+        'BEGIN:VEVENT',
+        f"UID:booking-{payload['booking']}@tonyspizza",
+        f'DTSTAMP:{datetime.utcnow().strftime(stamp)}Z',
+        f'DTSTART:{start.strftime(stamp)}',
+        f'DTEND:{end.strftime(stamp)}',
+        "SUMMARY:Dinner at Tony's Pizza",
+        f"STATUS:{'CANCELLED' if cancelled else 'CONFIRMED'}",
+        'END:VEVENT',
+        'END:VCALENDAR',
+        '',
+    ])
+
+
+def send_calendar_invite(event):
+    """
+    Emails the guest a calendar invite for the booking, or its
+    cancellation.
+    """
+    email = guest_email(event.payload)
+    if not email:
+        return
+    message = EmailMessage(
+        SUBJECTS[event.topic], describe(event.payload), settings.DEFAULT_FROM_EMAIL, [email],
+    )
+    cancelled = event.topic == 'booking.cancelled'
+    message.attach('booking.ics', calendar_invite(event.payload, cancelled), 'text/calendar')
+    message.send()
@@ -0,0 +1,79 @@
+import csv
+import json
+import os
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+def parse_date(value):
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        raise CommandError(f"Invalid date: {value}")
+
+
+class Command(BaseCommand):
+    help = (
+        "Writes utilization by weekday, slot and table, lead time and party size "
+        "reports over the booking history, including archived bookings, as JSON "
+        "and CSV files. Needs NumPy."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="Directory to write the reports to; created if missing.")
+        parser.add_argument('--format', choices=('json', 'csv', 'both'), default='both')
+        parser.add_argument('--since', help="First date to report (YYYY-MM-DD).")
+        parser.add_argument('--until', help="Last date to report (YYYY-MM-DD).")
+        parser.add_argument('--table', type=int, action='append', help="Only this table number; may be repeated.")
+        parser.add_argument('--no-archive', action='store_true', help="Leave out archived bookings.")
+        parser.add_argument('--chunk-size', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        try:
+            from website import analytics
+        except ImportError as error:
+            raise CommandError(f"The analytics reports need NumPy ({error}); pip install numpy.")
+        since, until = parse_date(options['since']), parse_date(options['until'])
+        start = time.perf_counter()
+        columns = analytics.load(
+            since, until, options['table'], archived=not options['no_archive'], chunk_size=options['chunk_size'],
+        )
+        loaded = time.perf_counter() - start
+        report = analytics.report(columns)
+        os.makedirs(options['output'], exist_ok=True)
+        written = []
+        if options['format'] in ('json', 'both'):
+            written.append(self.write_json(options['output'], report))
+        if options['format'] in ('csv', 'both'):
+            written.extend(self.write_csv(options['output'], report))
+        self.stdout.write(self.style.SUCCESS(
+            f"Reported on {report['bookings']} bookings ({loaded:.1f}s to load, "
+            f"{time.perf_counter() - start:.1f}s in all): {', '.join(written)}"
+        ))
+
+    def write_json(self, directory, report):
+        path = os.path.join(directory, 'report.json')
+        with open(path, 'w') as output:
+            json.dump(report, output, indent=2)
+        return path
+
+    def write_csv(self, directory, report):
+        tables = {
+            'utilization.csv': (
+                ('weekday', 'slot', 'table', 'bookings', 'utilization'),
+                ([row[name] for name in ('weekday', 'slot', 'table', 'bookings', 'utilization')] for row in report['utilization']),
+            ),
+            'lead_times.csv': (('lead_time', 'parties'), report['lead_times']['buckets'].items()),
+            'party_sizes.csv': (('guests', 'parties'), report['party_sizes'].items()),
+        }
+        paths = []
+        for name, (header, rows) in tables.items():
+            path = os.path.join(directory, name)
+            with open(path, 'w', newline='') as output:
+                writer = csv.writer(output)
+                writer.writerow(header)
+                writer.writerows(rows)
+            paths.append(path)
+        return paths
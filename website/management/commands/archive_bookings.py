@@ -0,0 +1,40 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from website import archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves bookings older than ARCHIVE_AFTER_DAYS (or --days) out of the live "
+        "booking table into the archive, in small transactions. Safe to stop and rerun."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Archive bookings more than this many days old.")
+        parser.add_argument('--before', help="Archive bookings before this date (YYYY-MM-DD) instead.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Bookings moved per transaction, rounded up to whole days.")
+        parser.add_argument(
+            '--pause', type=float, default=0.0,
+            help="Seconds to wait between batches, to leave room for live traffic and replicas.",
+        )
+
+    def handle(self, *args, **options):
+        if options['before']:
+            try:
+                before = date.fromisoformat(options['before'])
+            except ValueError:
+                raise CommandError(f"Invalid date: {options['before']}")
+        else:
+            before = archive.horizon(options['days'])
+        total = 0
+        while True:
+            moved = archive.archive_batch(before, options['batch_size'])
+            if not moved:
+                break
+            total += moved
+            self.stdout.write(f"Archived {total} bookings...")
+            time.sleep(options['pause'])
+        self.stdout.write(self.style.SUCCESS(f"Archived {total} bookings from before {before}."))
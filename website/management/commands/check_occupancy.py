@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from website import occupancy
+
+
+class Command(BaseCommand):
+    help = (
+        "Diffs the daily occupancy summary against the raw bookings and "
+        "lists every slot that differs. Exits with an error if any do."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="First date to check (YYYY-MM-DD).")
+        parser.add_argument('--until', help="Last date to check (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        differences = occupancy.check(options['since'], options['until'])
+        for date, time, summary, raw in differences:
+            self.stdout.write(
+                f"{date} {time}: summary (tables, covers, seats) {summary}, bookings {raw}"
+            )
+        if differences:
+            raise CommandError(
+                f"{len(differences)} slots differ; run rebuild_occupancy for those dates."
+            )
+        self.stdout.write(self.style.SUCCESS("Occupancy summary matches the bookings."))
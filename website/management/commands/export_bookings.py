@@ -0,0 +1,106 @@
+import csv
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from website.models import Booking
+
+# Columns written for each booking, in order. user and table are written
+# as the username and table number so the file can be read (and imported
+# into another database) without the ids.
+FIELDS = ('id', 'user', 'table', 'date', 'time', 'num_guests', 'created_at', 'combined_with')
+COLUMNS = ('pk', 'user__username', 'table__number', 'date', 'time', 'num_guests', 'created_at', 'combined_with_id')
+
+
+def file_format(path, fmt):
+    """
+    Returns 'csv' or 'jsonl', from --format or the file extension.
+    """
+    fmt = fmt or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+    if fmt not in ('csv', 'jsonl'):
+        raise CommandError(f"Unknown format {fmt!r}; use csv or jsonl.")
+    return fmt
+
+
+def read_checkpoint(path):
+    try:
+        with open(path) as checkpoint:
+            return json.load(checkpoint)
+    except FileNotFoundError:
+        return None
+
+
+def write_checkpoint(path, state):
+    with open(path, 'w') as checkpoint:
+        json.dump(state, checkpoint)
+
+
+class Command(BaseCommand):
+    help = (
+        "Streams bookings to a CSV or JSONL file in id order, a chunk at a "
+        "time, so memory use stays flat however many bookings there are."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="File to write, or - for standard output.")
+        parser.add_argument('--format', choices=('csv', 'jsonl'), help="Defaults to the file extension, else csv.")
+        parser.add_argument('--since', help="Only bookings on or after this date (YYYY-MM-DD).")
+        parser.add_argument('--until', help="Only bookings on or before this date (YYYY-MM-DD).")
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument(
+            '--checkpoint',
+            help="File recording the last exported id after every chunk. If it "
+                 "exists, the export resumes after that id and appends to output.",
+        )
+
+    def handle(self, *args, **options):
+        output = options['output']
+        fmt = file_format(output, options['format'])
+        checkpoint = options['checkpoint']
+        state = read_checkpoint(checkpoint) if checkpoint else None
+        if state and output == '-':
+            raise CommandError("Cannot resume an export to standard output.")
+        state = state or {'last_id': 0, 'rows': 0}
+
+        queryset = Booking.objects.order_by('pk').values_list(*COLUMNS)
+        if options['since']:
+            queryset = queryset.filter(date__gte=options['since'])
+        if options['until']:
+            queryset = queryset.filter(date__lte=options['until'])
+
+        resuming = state['rows'] > 0
+        stream = sys.stdout if output == '-' else open(output, 'a' if resuming else 'w', newline='')
+        try:
+            if fmt == 'csv':
+                writer = csv.writer(stream)
+                write = writer.writerow
+                if not resuming:
+                    write(FIELDS)
+            else:
+                def write(row):
+                    stream.write(json.dumps(dict(zip(FIELDS, row)), default=str) + '\n')
+
+            start = time.perf_counter()
+            exported = 0
+            while True:
+                chunk = list(queryset.filter(pk__gt=state['last_id'])[:options['chunk_size']])
+                if not chunk:
+                    break
+                for row in chunk:
+                    write([value.isoformat() if hasattr(value, 'isoformat') else value for value in row])
+                stream.flush()
+                exported += len(chunk)
+                state = {'last_id': chunk[-1][0], 'rows': state['rows'] + len(chunk)}
+                if checkpoint:
+                    write_checkpoint(checkpoint, state)
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+
+        elapsed = time.perf_counter() - start
+        self.stderr.write(
+            f"Exported {exported} bookings in {elapsed:.1f}s "
+            f"({exported / elapsed if elapsed else 0:.0f} rows/s); {state['rows']} in total."
+        )
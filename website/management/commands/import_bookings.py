@@ -0,0 +1,196 @@
+import csv
+import json
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+from datetime import time as clock_time
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from website import caching, occupancy
+from website.models import Booking, Table
+from .export_bookings import file_format, read_checkpoint, write_checkpoint
+
+
+@contextmanager
+def keep_created_at():
+    """
+    Lets imported bookings keep their original created_at, which
+    auto_now_add would otherwise overwrite with the time of the import.
+    """
+    field = Booking._meta.get_field('created_at')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def read_rows(stream, fmt):
+    """
+    Yields each booking in the file as a dict.
+    """
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+class Command(BaseCommand):
+    help = (
+        "Streams bookings in from a CSV or JSONL file written by "
+        "export_bookings (columns user, table, date, time, num_guests and "
+        "optionally created_at and combined_with), inserting them in batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help="File to read.")
+        parser.add_argument('--format', choices=('csv', 'jsonl'), help="Defaults to the file extension, else csv.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--checkpoint',
+            help="File recording how many rows have been imported after every "
+                 "batch. If it exists, the import skips those rows and carries on.",
+        )
+        parser.add_argument(
+            '--skip-invalid', action='store_true',
+            help="Skip rows with an unknown user or table or a bad value instead of stopping.",
+        )
+        parser.add_argument(
+            '--ignore-conflicts', action='store_true',
+            help="Skip rows whose table is already booked for the slot instead of stopping.",
+        )
+
+    def handle(self, *args, **options):
+        fmt = file_format(options['input'], options['format'])
+        checkpoint = options['checkpoint']
+        state = (read_checkpoint(checkpoint) if checkpoint else None) or {'rows': 0}
+
+        # Every row's user and table are resolved from these maps, loaded
+        # once, instead of with a query per row.
+        users = dict(User.objects.values_list('username', 'pk'))
+        tables = self.tables_by_number()
+        now = timezone.now()
+
+        start = time.perf_counter()
+        imported = skipped = 0
+        first_date = last_date = None
+        with open(options['input'], newline='') as stream, keep_created_at():
+            rows = enumerate(read_rows(stream, fmt), start=1)
+            rows = islice(rows, state['rows'], None)
+            while True:
+                batch = list(islice(rows, options['batch_size']))
+                if not batch:
+                    break
+                bookings = []
+                extras = []
+                for line, row in batch:
+                    try:
+                        booking = self.booking(row, users, tables, now)
+                    except (KeyError, ValueError) as error:
+                        if not options['skip_invalid']:
+                            raise CommandError(f"Row {line}: {error!r}")
+                        skipped += 1
+                        continue
+                    (extras if row.get('combined_with') else bookings).append((line, booking))
+                with transaction.atomic():
+                    Booking.objects.bulk_create(
+                        [booking for line, booking in bookings], ignore_conflicts=options['ignore_conflicts'],
+                    )
+                    linked = self.link_extras(extras, options['skip_invalid'])
+                    Booking.objects.bulk_create(linked, ignore_conflicts=options['ignore_conflicts'])
+                skipped += len(extras) - len(linked)
+                bookings = [booking for line, booking in bookings] + linked
+                dates = [booking.date for booking in bookings]
+                if dates:
+                    first_date = min(dates + [first_date or dates[0]])
+                    last_date = max(dates + [last_date or dates[0]])
+                imported += len(bookings)
+                state = {'rows': batch[-1][0]}
+                if checkpoint:
+                    write_checkpoint(checkpoint, state)
+                elapsed = time.perf_counter() - start
+                self.stderr.write(f"{state['rows']} rows read, {imported / elapsed:.0f} rows/s")
+
+        # bulk_create sends no signals, so rebuild the occupancy summary
+        # for the imported dates and drop all cached availability.
+        if first_date:
+            occupancy.rebuild(first_date, last_date)
+        caching.invalidate_tables()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {imported} bookings, skipped {skipped}, in {elapsed:.1f}s "
+            f"({imported / elapsed if elapsed else 0:.0f} rows/s)."
+        ))
+
+    def tables_by_number(self):
+        """
+        Returns {table number: pk}. Raises CommandError if two tables
+        share a number, since rows name their table by number.
+        """
+        tables = {}
+        duplicates = set()
+        for number, pk in Table.objects.values_list('number', 'pk'):
+            if number in tables:
+                duplicates.add(number)
+            tables[number] = pk
+        if duplicates:
+            raise CommandError(
+                f"Tables {', '.join(map(str, sorted(duplicates)))} are numbered more than once; "
+                f"renumber them before importing."
+            )
+        return tables
+
+    def link_extras(self, extras, skip_invalid):
+        """
+        Points each extra table held for a party, as (line, booking), at
+        the party's own booking: the user's booking on another table at
+        the same slot, imported earlier or already in the database, found
+        with one query. Returns the extras that were linked.
+        """
+        if not extras:
+            return []
+        slots = {(booking.user_id, booking.date, booking.time) for line, booking in extras}
+        parties = {}
+        for pk, user, day, at in Booking.objects.filter(
+            user_id__in={user for user, day, at in slots},
+            date__in={day for user, day, at in slots},
+            time__in={at for user, day, at in slots},
+            combined_with__isnull=True,
+        ).values_list('pk', 'user_id', 'date', 'time'):
+            parties.setdefault((user, day, at), []).append(pk)
+        linked = []
+        for line, booking in extras:
+            party = parties.get((booking.user_id, booking.date, booking.time), [])
+            if len(party) != 1:
+                if not skip_invalid:
+                    raise CommandError(f"Row {line}: found {len(party)} bookings for the party this extra table is held for.")
+                continue
+            booking.combined_with_id = party[0]
+            linked.append(booking)
+        return linked
+
+    def booking(self, row, users, tables, now):
+        """
+        Returns an unsaved Booking for a row of the file.
+        Raises KeyError or ValueError for a row that cannot be imported.
+        """
+        created_at = row.get('created_at')
+        if created_at:
+            created_at = datetime.fromisoformat(created_at)
+            if timezone.is_naive(created_at):
+                created_at = timezone.make_aware(created_at, timezone.utc)
+        return Booking(
+            user_id=users[row['user']],
+            table_id=tables[int(row['table'])],
+            date=date.fromisoformat(row['date']),
+            time=clock_time.fromisoformat(row['time']),
+            num_guests=int(row['num_guests']),
+            created_at=created_at or now,
+        )
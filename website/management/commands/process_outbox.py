@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from website import outbox
+
+
+class Command(BaseCommand):
+    help = "Runs the handlers for pending outbox events, such as booking confirmation emails."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help="Events claimed at a time.")
+        parser.add_argument('--poll', type=float, default=1.0, help="Seconds to wait when no events are due.")
+        parser.add_argument('--once', action='store_true', help="Process the due events, then exit.")
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            succeeded, failed = outbox.process_batch(options['batch_size'])
+            if succeeded or failed:
+                self.stdout.write(f"Processed {succeeded} events, {failed} failed.")
+            elif options['once']:
+                return
+            else:
+                time.sleep(options['poll'])
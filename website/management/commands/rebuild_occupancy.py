@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from website import occupancy
+
+
+class Command(BaseCommand):
+    help = "Recomputes the daily occupancy summary from the raw bookings, for backfills and repairs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="First date to rebuild (YYYY-MM-DD); defaults to the first booking.")
+        parser.add_argument('--until', help="Last date to rebuild (YYYY-MM-DD); defaults to the last booking.")
+
+    def handle(self, *args, **options):
+        rows = occupancy.rebuild(options['since'], options['until'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} occupancy summary rows."))
@@ -0,0 +1,45 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from website import startup
+
+
+class Command(BaseCommand):
+    help = (
+        "Starts the web application in a fresh interpreter, as a new worker would, "
+        "and reports its import time, time to first response and the slowest "
+        "imports. Fails if the cold start is over COLD_START_BUDGET_MS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/bookings/', help="The first request's path.")
+        parser.add_argument('--top', type=int, default=20, help="How many packages and modules to list.")
+        parser.add_argument('--json', action='store_true', help="Print the full result as JSON.")
+
+    def handle(self, *args, **options):
+        try:
+            result = startup.measure(options['path'])
+        except RuntimeError as error:
+            raise CommandError(str(error))
+        budget = getattr(settings, 'COLD_START_BUDGET_MS', None)
+        if options['json']:
+            self.stdout.write(json.dumps({**result, 'budget_ms': budget}, indent=2))
+        else:
+            self.report(result, options['top'])
+        if budget and result['total_ms'] > budget:
+            raise CommandError(f"Cold start took {result['total_ms']} ms, over the {budget} ms budget.")
+
+    def report(self, result, top):
+        self.stdout.write(
+            f"Imported the application in {result['import_ms']} ms; the first response "
+            f"({result['status']}) took {result['first_response_ms']} ms more."
+        )
+        self.stdout.write("\nSlowest packages (ms importing their own modules):")
+        for package, ms in list(startup.by_package(result['imports']).items())[:top]:
+            self.stdout.write(f"  {ms:8.1f}  {package}")
+        self.stdout.write("\nSlowest modules (ms, including what they import):")
+        slowest = sorted(result['imports'], key=lambda timing: -timing[2])
+        for module, own, cumulative in slowest[:top]:
+            self.stdout.write(f"  {cumulative:8.1f}  {module}")
@@ -0,0 +1,199 @@
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.db import connections
+from django.utils.functional import SimpleLazyObject
+
+from . import auth, routers
+from .db.pool import pool_stats
+
+slow_request_log = logging.getLogger('website.slow_requests')
+
+
+class QueryTimer:
+    """
+    A database execute wrapper that records each query's SQL and duration.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    @property
+    def total(self):
+        return sum(duration for sql, duration in self.queries)
+
+
+class RequestProfile:
+    """
+    Timings gathered for one profiled request, in seconds.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.view_start = None
+        self.view_end = None
+        self.render_start = None
+        self.render_end = None
+        self.sql = QueryTimer()
+
+    def timings(self, end):
+        """
+        Returns the request's timings in milliseconds.
+        """
+        view_end = self.view_end or end
+        view = view_end - self.view_start if self.view_start else 0
+        render = self.render_end - self.render_start if self.render_end else 0
+        return {
+            'total': round((end - self.start) * 1e3, 2),
+            'view': round(view * 1e3, 2),
+            'render': round(render * 1e3, 2),
+            'db': round(self.sql.total * 1e3, 2),
+        }
+
+
+class RequestProfilingMiddleware:
+    """
+    Times a sample of requests and reports where the time went.
+
+    Each profiled request gets a Server-Timing header with its total,
+    view, template render and database time plus its query count, and
+    the state of this process's connection pools, if any (the longest
+    wait for a pooled connection so far, and the connections in use and
+    idle).
+    Profiled requests slower than SLOW_REQUEST_THRESHOLD_MS are written
+    to the website.slow_requests log as JSON, with their SQL.
+
+    REQUEST_PROFILING_SAMPLE_RATE (0 to 1) sets the share of requests
+    profiled; the rest only pay for one random number.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'REQUEST_PROFILING_SAMPLE_RATE', 1.0)
+        self.threshold = getattr(settings, 'SLOW_REQUEST_THRESHOLD_MS', 500)
+
+    def __call__(self, request):
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        profile = request._profile = RequestProfile()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile.sql))
+            response = self.get_response(request)
+        timings = profile.timings(time.perf_counter())
+
+        queries = len(profile.sql.queries)
+        pools = pool_stats()
+        response['Server-Timing'] = ', '.join([
+            f'total;dur={timings["total"]}',
+            f'view;dur={timings["view"]}',
+            f'render;dur={timings["render"]}',
+            f'db;dur={timings["db"]};desc="{queries} queries"',
+            *(
+                f'pool-{alias};dur={stats["max_wait_ms"]};'
+                f'desc="{stats["in_use"]} in use, {stats["idle"]} idle, {stats["waits"]} waits"'
+                for alias, stats in pools.items()
+            ),
+        ])
+        if timings['total'] >= self.threshold:
+            self.log_slow_request(request, response, timings, profile.sql.queries, pools)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = getattr(request, '_profile', None)
+        if profile is not None:
+            profile.view_start = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        """
+        Ends the view timing and times the template render that follows.
+        """
+        profile = getattr(request, '_profile', None)
+        if profile is not None:
+            profile.view_end = profile.render_start = time.perf_counter()
+
+            def end_render(response):
+                profile.render_end = time.perf_counter()
+
+            response.add_post_render_callback(end_render)
+        return response
+
+    def log_slow_request(self, request, response, timings, queries, pools):
+        slow_request_log.warning(json.dumps({
+            'event': 'slow_request',
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'ms': timings,
+            'queries': len(queries),
+            'pools': pools,
+            'sql': [
+                {'ms': round(duration * 1e3, 2), 'sql': sql}
+                for sql, duration in sorted(queries, key=lambda query: -query[1])
+            ],
+        }))
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Keeps a visitor's reads on the primary database for
+    READ_YOUR_WRITES_SECONDS after any request of theirs writes to it
+    (see website/routers.py). The deadline is kept in a cookie, so it
+    holds whichever process serves the next request.
+
+    Must come before SessionMiddleware, so that session reads and writes
+    are routed too.
+    """
+
+    cookie_name = 'read_primary_until'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.window = getattr(settings, 'READ_YOUR_WRITES_SECONDS', 5)
+
+    def __call__(self, request):
+        try:
+            pinned = float(request.COOKIES.get(self.cookie_name, 0)) > time.time()
+        except ValueError:
+            pinned = False
+        state, token = routers.begin_request(pinned)
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.end_request(token)
+        if state.wrote and self.window > 0:
+            response.set_cookie(
+                self.cookie_name, str(time.time() + self.window),
+                max_age=self.window, httponly=True, samesite='Lax',
+            )
+        return response
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """
+    AuthenticationMiddleware that takes request.user from the cache
+    when it can (see website/auth.py).
+    """
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_user(request))
+
+
+def get_user(request):
+    if not hasattr(request, '_cached_user'):
+        request._cached_user = auth.get_user(request)
+    return request._cached_user
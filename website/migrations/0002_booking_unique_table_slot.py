@@ -0,0 +1,17 @@
+# Generated by Django 3.2.19 on 2026-10-18 06:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=models.UniqueConstraint(fields=('table', 'date', 'time'), name='unique_table_slot'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.19 on 2026-10-18 06:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0003_booking_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='combined_with',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='extra_bookings', to='website.booking'),
+        ),
+        migrations.AddField(
+            model_name='table',
+            name='adjoining',
+            field=models.ManyToManyField(blank=True, related_name='_website_table_adjoining_+', to='website.Table'),
+        ),
+    ]
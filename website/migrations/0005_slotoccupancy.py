@@ -0,0 +1,31 @@
+# Generated by Django 3.2.19 on 2026-10-18 06:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0004_table_adjoining_booking_combined_with'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('time', models.TimeField()),
+                ('booked_tables', models.IntegerField(default=0)),
+                ('booked_covers', models.IntegerField(default=0)),
+                ('booked_seats', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['date', 'time'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='slotoccupancy',
+            constraint=models.UniqueConstraint(fields=('date', 'time'), name='unique_occupancy_slot'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.19 on 2026-10-18 08:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0007_archivedbooking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxevent',
+            name='completed_handlers',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
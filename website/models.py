@@ -1,30 +1,50 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, models
 from django.contrib.auth.models import User
-from cloudinary.models import CloudinaryField
+from django.utils import timezone
+
+from .db import write_transaction
 
 
 class Table(models.Model):
     """
     Model to represent a table in the restaurant.
+    Adjoining tables can be pushed together to seat a larger party.
     The string returns the table no
     """
 
     number = models.PositiveIntegerField()
     capacity = models.PositiveIntegerField()
+    adjoining = models.ManyToManyField('self', blank=True)
 
     def __str__(self):
         return f"Table {self.number}"
 
 
+class SlotTaken(ValidationError):
+    """
+    Raised when a booking's table is already booked for its slot.
+    """
+
+
 class Booking(models.Model):
     """
     Model to represent a booking made by a user.
-    The meta class orders each booking by reservation date in descending order.
+    The meta class orders each booking by reservation date in descending order,
+    allows only one booking per table per slot, and indexes a user's bookings
+    by date and every booking by slot.
     str returns the reservation date and time to be used as booking title
     """
 
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
-    table = models.ForeignKey(Table, on_delete=models.CASCADE)
+    # Both foreign keys are covered by the leading columns of the indexes
+    # below, so they do not get single-column indexes of their own.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
+    table = models.ForeignKey(Table, on_delete=models.CASCADE, db_index=False)
+    # Set on the bookings that hold the extra tables pushed together for a
+    # large party; they go when the party's main booking goes.
+    combined_with = models.ForeignKey(
+        'self', on_delete=models.CASCADE, null=True, blank=True, related_name='extra_bookings',
+    )
     date = models.DateField()
     time = models.TimeField()
     num_guests = models.IntegerField()
@@ -32,6 +52,142 @@ class Booking(models.Model):
 
     class Meta:
         ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(fields=['table', 'date', 'time'], name='unique_table_slot'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'date', 'time'], name='booking_user_date_idx'),
+            models.Index(fields=['date', 'time', 'table'], name='booking_date_slot_idx'),
+        ]
 
     def __str__(self):
         return f"Booking {self.date} {self.time}"
+
+    def claim(self, extra_tables=()):
+        """
+        Saves the booking, claiming its table for the slot, together with
+        any extra tables pushed together for the party.
+
+        The database's unique_table_slot constraint decides between
+        concurrent claims, so only one of them can succeed; the losers
+        get SlotTaken instead of an IntegrityError.
+        """
+        tables = [self.table_id, *extra_tables]
+        adding = self._state.adding
+        try:
+            with write_transaction():
+                if self.pk is not None:
+                    for extra in self.extra_bookings.all():
+                        extra.delete()
+                self.save()
+                for table_id in extra_tables:
+                    Booking.objects.create(
+                        user_id=self.user_id, table_id=table_id, date=self.date,
+                        time=self.time, num_guests=0, combined_with=self,
+                    )
+        except IntegrityError:
+            if adding:
+                # The insert was rolled back, so the booking is new again.
+                self.pk = None
+                self._state.adding = True
+            others = Booking.objects.filter(table_id__in=tables, date=self.date, time=self.time)
+            if self.pk is not None:
+                others = others.exclude(pk=self.pk).exclude(combined_with=self.pk)
+            taken = others.exists()
+            if not taken:
+                raise
+            if extra_tables:
+                raise SlotTaken("Those tables are no longer free at that time.", code='slot_taken')
+            raise SlotTaken(f"{self.table} is already booked for that time.", code='slot_taken')
+
+
+class ArchivedBooking(models.Model):
+    """
+    Model to keep a past booking moved out of Booking by the
+    archive_bookings command, so that live queries stay small.
+    It keeps the booking's id, and its table's number and seats as they
+    were when it was archived, so that history survives later changes to
+    the tables.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
+    table_number = models.PositiveIntegerField()
+    seats = models.PositiveIntegerField()
+    # The id of the party's main booking, on the extra tables' bookings.
+    combined_with = models.BigIntegerField(null=True, blank=True)
+    date = models.DateField()
+    time = models.TimeField()
+    num_guests = models.IntegerField()
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-date']
+        indexes = [
+            models.Index(fields=['user', 'date', 'time'], name='archive_user_date_idx'),
+            models.Index(fields=['date'], name='archive_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"Booking {self.date} {self.time}"
+
+
+class SlotOccupancy(models.Model):
+    """
+    Model to summarise how full one slot of one day is.
+    Kept up to date from Booking changes by website/occupancy.py, so that
+    reports read one row per slot instead of grouping every booking.
+    booked_seats counts the seats on the booked tables.
+    """
+
+    date = models.DateField()
+    time = models.TimeField()
+    booked_tables = models.IntegerField(default=0)
+    booked_covers = models.IntegerField(default=0)
+    booked_seats = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['date', 'time']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'time'], name='unique_occupancy_slot'),
+        ]
+
+    def __str__(self):
+        return f"Occupancy {self.date} {self.time}"
+
+
+class OutboxEvent(models.Model):
+    """
+    Model to hold a side effect of a booking change, such as a
+    confirmation email, until the outbox worker has run its handlers.
+    Written in the same transaction as the change, so an event exists
+    if and only if the change was committed (see website/outbox.py).
+    """
+
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    topic = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    # Handlers that have succeeded, which a retry skips.
+    completed_handlers = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['available_at']
+        indexes = [
+            models.Index(
+                fields=['available_at'], name='outbox_pending_idx', condition=models.Q(status='pending'),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.topic} #{self.pk}"
@@ -0,0 +1,201 @@
+"""
+The daily occupancy summary.
+
+SlotOccupancy holds one row per (date, slot) with the number of booked
+tables, covers and seats. Booking signals apply each change to it as a
+delta, inside the booking's own transaction, so the summary commits or
+rolls back with the booking; Table signals do the same for changes to a
+table's capacity. Writes that send no signals (bulk_create,
+queryset.update()) must call rebuild() for the dates they touched.
+"""
+import calendar
+from datetime import date, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, F, IntegerField, Max, OuterRef, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import ArchivedBooking, Booking, SlotOccupancy, Table
+from .slots import SLOT_INDEX, SLOT_TIMES
+
+
+def deltas(tables, covers, seats):
+    return {
+        'booked_tables': F('booked_tables') + tables,
+        'booked_covers': F('booked_covers') + covers,
+        'booked_seats': F('booked_seats') + seats,
+    }
+
+
+def apply(date, time, tables, covers, seats):
+    """
+    Adds the given deltas to a slot's summary row, creating it if needed.
+    """
+    if SlotOccupancy.objects.filter(date=date, time=time).update(**deltas(tables, covers, seats)):
+        return
+    try:
+        with transaction.atomic():
+            SlotOccupancy.objects.create(
+                date=date, time=time, booked_tables=tables, booked_covers=covers, booked_seats=seats,
+            )
+    except IntegrityError:
+        # Another booking created the row first.
+        SlotOccupancy.objects.filter(date=date, time=time).update(**deltas(tables, covers, seats))
+
+
+def apply_dates(dates, time, tables, covers, seats):
+    """
+    Adds the same deltas to one slot's summary row on each of the given
+    dates, in two queries however many dates there are: any missing rows
+    are created empty, then every row is updated at once.
+    """
+    SlotOccupancy.objects.bulk_create(
+        [SlotOccupancy(date=date, time=time) for date in dates], ignore_conflicts=True,
+    )
+    SlotOccupancy.objects.filter(date__in=dates, time=time).update(**deltas(tables, covers, seats))
+
+
+def capacity(table_id, table=None):
+    if table is not None and table.pk == table_id:
+        return table.capacity
+    return Table.objects.values_list('capacity', flat=True).get(pk=table_id)
+
+
+def move_booking(old, new, table=None):
+    """
+    Moves a booking's share of the summary from its old
+    (table_id, date, time, num_guests) to its new one. Either may be
+    None; table is the booking's current Table, if it is loaded.
+    """
+    if old == new:
+        return
+    if old is not None and old[0] is not None:
+        table_id, date, time, guests = old
+        apply(date, time, -1, -guests, -capacity(table_id, table))
+    if new is not None:
+        table_id, date, time, guests = new
+        apply(date, time, 1, guests, capacity(table_id, table))
+
+
+def change_capacity(table_id, old, new):
+    """
+    Applies a change to a table's capacity to the seats of every slot
+    the table is booked for, in one query.
+    """
+    if old == new:
+        return
+    booked = Booking.objects.filter(table_id=table_id, date=OuterRef('date'), time=OuterRef('time'))
+    SlotOccupancy.objects.filter(Exists(booked)).update(booked_seats=F('booked_seats') + new - old)
+
+
+def aggregate(start=None, end=None):
+    """
+    Returns the summary rows computed from the raw bookings, as
+    {(date, time): (tables, covers, seats)}, in one grouped query.
+    """
+    bookings = Booking.objects.order_by()
+    if start:
+        bookings = bookings.filter(date__gte=start)
+    if end:
+        bookings = bookings.filter(date__lte=end)
+    rows = bookings.values('date', 'time').annotate(
+        tables=Count('id'), covers=Sum('num_guests'), seats=Sum('table__capacity'),
+    ).values_list('date', 'time', 'tables', 'covers', 'seats')
+    return {(date, time): (tables, covers, seats) for date, time, tables, covers, seats in rows.iterator()}
+
+
+def summary_rows(start=None, end=None):
+    """
+    Returns the SlotOccupancy rows for a date range.
+    """
+    rows = SlotOccupancy.objects.all()
+    if start:
+        rows = rows.filter(date__gte=start)
+    if end:
+        rows = rows.filter(date__lte=end)
+    return rows
+
+
+def for_range(start, end):
+    """
+    Returns the summary rows from start to end, annotated with the
+    remaining_capacity of each slot.
+    """
+    total = Table.objects.aggregate(seats=Coalesce(Sum('capacity'), 0))['seats']
+    return summary_rows(start, end).annotate(
+        remaining_capacity=Value(total, output_field=IntegerField()) - F('booked_seats'),
+    )
+
+
+def default_start():
+    """
+    Returns the first date rebuild() and check() cover unless told
+    otherwise: the day after the last archived booking, or None. The
+    summary rows of archived dates are kept as they were when their
+    bookings left Booking (see archive.py).
+    """
+    last = ArchivedBooking.objects.aggregate(last=Max('date'))['last']
+    return last and last + timedelta(days=1)
+
+
+@transaction.atomic
+def rebuild(start=None, end=None, batch_size=2000):
+    """
+    Recomputes the summary for a date range (or every date since the
+    archive) from the raw bookings. Returns the number of summary rows
+    written.
+    """
+    start = start or default_start()
+    summary_rows(start, end).delete()
+    rows = [
+        SlotOccupancy(date=date, time=time, booked_tables=tables, booked_covers=covers, booked_seats=seats)
+        for (date, time), (tables, covers, seats) in aggregate(start, end).items()
+    ]
+    SlotOccupancy.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def check(start=None, end=None):
+    """
+    Diffs the summary against the raw bookings. Returns a list of
+    (date, time, summary values, raw values) for every slot that differs;
+    a slot missing on either side shows as None.
+    """
+    start = start or default_start()
+    raw = aggregate(start, end)
+    summary = {
+        (date, time): (tables, covers, seats)
+        for date, time, tables, covers, seats in summary_rows(start, end).values_list(
+            'date', 'time', 'booked_tables', 'booked_covers', 'booked_seats',
+        ).iterator()
+        if (tables, covers, seats) != (0, 0, 0)
+    }
+    return [
+        (date, time, summary.get((date, time)), raw.get((date, time)))
+        for date, time in sorted(raw.keys() | summary.keys())
+        if summary.get((date, time)) != raw.get((date, time))
+    ]
+
+
+def month_grid(year, month, total_seats):
+    """
+    Returns a row for every day of a month, from its summary rows in one
+    query: {'date', 'covers', 'slots'}, where slots holds, in slot order,
+    (booked tables, covers, percent of total_seats booked) or None for
+    an empty slot.
+    """
+    first = date(year, month, 1)
+    last = date(year, month, calendar.monthrange(year, month)[1])
+    days = {
+        day: {'date': day, 'covers': 0, 'slots': [None] * len(SLOT_TIMES)}
+        for day in (date(year, month, n) for n in range(1, last.day + 1))
+    }
+    rows = summary_rows(first, last).filter(booked_tables__gt=0).values_list(
+        'date', 'time', 'booked_tables', 'booked_covers', 'booked_seats',
+    )
+    for day, time, tables, covers, seats in rows:
+        if time in SLOT_INDEX:
+            percent = round(100 * seats / total_seats) if total_seats else 100
+            days[day]['slots'][SLOT_INDEX[time]] = (tables, covers, percent)
+            days[day]['covers'] += covers
+    return list(days.values())
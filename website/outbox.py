@@ -0,0 +1,138 @@
+"""
+The transactional outbox for booking side effects.
+
+Booking changes publish() an OutboxEvent in their own transaction
+instead of sending emails and notices while the guest waits. The
+process_outbox worker claims pending events in batches and runs the
+handlers listed for their topic in OUTBOX_HANDLERS. A failed event is
+retried with exponential backoff, up to OUTBOX_MAX_ATTEMPTS times, and
+then marked failed. Each handler that succeeds is recorded on the
+event, and a retry only runs the ones that have not.
+
+Claiming an event leases it for OUTBOX_LEASE seconds, so an event whose
+worker dies is picked up again afterwards. Handlers can therefore run
+more than once for the same event, and must be safe to repeat.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .db import write_transaction
+from .models import OutboxEvent
+
+log = logging.getLogger('website.outbox')
+
+
+def publish(topic, payload):
+    """
+    Records an event, in the caller's transaction if there is one.
+    """
+    return OutboxEvent.objects.create(topic=topic, payload=payload)
+
+
+def booking_payload(booking):
+    """
+    Returns the details of a booking that its events carry, so that
+    handlers can still see them after a cancellation.
+    """
+    return {
+        'booking': booking.pk,
+        'user': booking.user_id,
+        'table': booking.table_id,
+        'date': str(booking.date),
+        'time': str(booking.time)[:5],
+        'num_guests': booking.num_guests,
+    }
+
+
+def publish_booking(topic, booking):
+    """
+    Records an event about a booking.
+    """
+    return publish(topic, booking_payload(booking))
+
+
+def publish_bookings(topic, bookings):
+    """
+    Records an event about each of the bookings, in one query.
+    """
+    return OutboxEvent.objects.bulk_create(
+        OutboxEvent(topic=topic, payload=booking_payload(booking)) for booking in bookings
+    )
+
+
+def handlers_for(topic):
+    """
+    Returns [(path, handler)] of the handlers for a topic.
+    """
+    return [(path, import_string(path)) for path in getattr(settings, 'OUTBOX_HANDLERS', {}).get(topic, ())]
+
+
+def retry_delay(attempts):
+    """
+    Returns how long to wait before retrying an event that has failed
+    the given number of times: OUTBOX_RETRY_DELAY seconds, doubling with
+    each attempt, up to an hour.
+    """
+    base = getattr(settings, 'OUTBOX_RETRY_DELAY', 30)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), 3600))
+
+
+def claim_batch(size):
+    """
+    Claims up to size due events and returns them. Where the database
+    supports it, rows locked by another worker are skipped rather than
+    waited for.
+    """
+    now = timezone.now()
+    with write_transaction():
+        due = OutboxEvent.objects.filter(status=OutboxEvent.PENDING, available_at__lte=now)
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        events = list(due.order_by('available_at')[:size])
+        lease = now + timedelta(seconds=getattr(settings, 'OUTBOX_LEASE', 300))
+        for event in events:
+            event.attempts += 1
+            event.available_at = lease
+        OutboxEvent.objects.bulk_update(events, ['attempts', 'available_at'])
+    return events
+
+
+def process(event):
+    """
+    Runs the event's handlers that have not yet succeeded, recording
+    each one that does, and then the outcome. Returns whether they all
+    succeeded.
+    """
+    try:
+        for path, handler in handlers_for(event.topic):
+            if path in event.completed_handlers:
+                continue
+            handler(event)
+            event.completed_handlers.append(path)
+            event.save(update_fields=['completed_handlers'])
+    except Exception as error:
+        log.exception("Outbox event %s failed (attempt %s).", event, event.attempts)
+        event.last_error = f"{type(error).__name__}: {error}"
+        if event.attempts >= getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 8):
+            event.status = OutboxEvent.FAILED
+        else:
+            event.available_at = timezone.now() + retry_delay(event.attempts)
+        event.save(update_fields=['status', 'available_at', 'last_error'])
+        return False
+    event.status = OutboxEvent.DONE
+    event.processed_at = timezone.now()
+    event.save(update_fields=['status', 'processed_at'])
+    return True
+
+
+def process_batch(size=100):
+    """
+    Claims and processes one batch. Returns (succeeded, failed) counts.
+    """
+    results = [process(event) for event in claim_batch(size)]
+    return results.count(True), results.count(False)
@@ -0,0 +1,128 @@
+"""
+Keyset (seek) pagination.
+
+Offset pagination makes the database count and skip every row before
+the requested page, so deep pages get slower as history grows. Keyset
+pagination instead remembers the sort key of the last row shown and asks
+for the rows after it, which an index on the sort key answers directly
+however deep the page is.
+"""
+from django.db.models import Q
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+
+class KeysetPage:
+    """
+    One page of a keyset paginated queryset.
+
+    Attributes:
+        object_list (list): The rows on this page.
+        has_next (bool): Whether there are rows after this page.
+        has_previous (bool): Whether there are rows before this page.
+    """
+
+    def __init__(self, paginator, object_list, has_next, has_previous):
+        self.paginator = paginator
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    @property
+    def next_cursor(self):
+        return self.paginator.cursor(self.object_list[-1]) if self.has_next else None
+
+    @property
+    def previous_cursor(self):
+        return self.paginator.cursor(self.object_list[0]) if self.has_previous else None
+
+
+class KeysetPaginator:
+    """
+    Paginates a queryset by a unique combination of sort keys.
+
+    Attributes:
+        queryset (QuerySet): The rows to paginate.
+        keys (tuple): Field names that together order rows uniquely,
+        e.g. ('date', 'time', 'pk').
+        per_page (int): The number of rows on each page.
+        descending (bool): Whether pages run from the largest key down.
+    """
+
+    def __init__(self, queryset, keys, per_page, descending=False):
+        self.queryset = queryset
+        self.keys = keys
+        self.per_page = per_page
+        self.descending = descending
+        meta = queryset.model._meta
+        self._fields = [meta.pk if key == 'pk' else meta.get_field(key) for key in keys]
+
+    def cursor(self, obj):
+        """
+        Returns the opaque cursor that points at obj.
+        """
+        values = [field.value_to_string(obj) for field in self._fields]
+        return urlsafe_base64_encode('|'.join(values).encode())
+
+    def decode(self, cursor):
+        """
+        Returns the key values a cursor points at.
+        Raises ValueError for a cursor that was not made by cursor().
+        """
+        try:
+            values = urlsafe_base64_decode(cursor).decode().split('|')
+            if len(values) != len(self._fields):
+                raise ValueError
+            return [field.to_python(value) for field, value in zip(self._fields, values)]
+        except Exception:
+            raise ValueError(f"Invalid cursor {cursor!r}")
+
+    def _seek(self, values, forward):
+        """
+        Returns the filter for rows past the given key values.
+
+        The leading key gets a plain range bound as well, so the database
+        can start the index scan at the cursor instead of filtering rows.
+        """
+        after = forward != self.descending
+        op = 'gt' if after else 'lt'
+        condition = Q()
+        for n, key in enumerate(self.keys):
+            equal = {k: v for k, v in zip(self.keys[:n], values[:n])}
+            condition |= Q(**equal, **{f'{key}__{op}': values[n]})
+        return Q(**{f'{self.keys[0]}__{op}e': values[0]}) & condition
+
+    def window(self, after=None, before=None):
+        """
+        Returns the ordered, unsliced queryset for the rows after (or
+        before) the given cursor. Rows before a cursor come in reverse.
+        """
+        queryset = self.queryset
+        forward = before is None
+        if after is not None:
+            queryset = queryset.filter(self._seek(self.decode(after), forward=True))
+        if before is not None:
+            queryset = queryset.filter(self._seek(self.decode(before), forward=False))
+        reverse = self.descending == forward
+        return queryset.order_by(*(f'-{key}' if reverse else key for key in self.keys))
+
+    def page(self, after=None, before=None):
+        """
+        Returns the page after the cursor, the page before it, or the
+        first page if neither is given.
+        """
+        rows = list(self.window(after, before)[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if before is not None:
+            rows.reverse()
+            return KeysetPage(self, rows, has_next=True, has_previous=more)
+        return KeysetPage(self, rows, has_next=more, has_previous=after is not None)
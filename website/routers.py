@@ -0,0 +1,83 @@
+"""
+Primary/replica database routing with read-your-writes stickiness.
+
+Writes always go to the primary ('default'). Reads go to a random alias
+in DATABASE_REPLICAS, except:
+
+* inside a transaction on the primary, which must see its own writes;
+* later in a request that has written, and for READ_YOUR_WRITES_SECONDS
+  afterwards for the same visitor, so that a redirect after a booking
+  change shows the change even while the replicas lag behind.
+
+ReplicaRoutingMiddleware carries the stickiness from one request to the
+next in a cookie; outside requests only the first rule applies.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PRIMARY = DEFAULT_DB_ALIAS
+
+_routing = ContextVar('routing', default=None)
+
+
+class RoutingState:
+    """
+    The routing state of one request.
+
+    Attributes:
+        pinned (bool): Whether reads go to the primary for this request.
+        wrote (bool): Whether the request has written to the primary.
+    """
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+def begin_request(pinned):
+    """
+    Starts routing a request, with its reads pinned to the primary if
+    the visitor wrote recently. Returns the state and a token for
+    end_request().
+    """
+    state = RoutingState(pinned)
+    return state, _routing.set(state)
+
+
+def end_request(token):
+    _routing.reset(token)
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', ())
+        if not replicas:
+            return None
+        state = _routing.get()
+        if state is not None and (state.pinned or state.wrote):
+            return PRIMARY
+        if connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *getattr(settings, 'DATABASE_REPLICAS', ())}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """
+        Migrates the primary only; replicas get their schema from it.
+        """
+        return db not in getattr(settings, 'DATABASE_REPLICAS', ())
@@ -0,0 +1,113 @@
+"""
+Recurring bookings: one table at the same time on a run of dates, such
+as every Friday for a quarter.
+
+create_series() books a whole series at once. One query finds the dates
+on which the table is already taken; if there are none, every
+occurrence is inserted with one bulk_create, in one transaction, so the
+series is booked all or nothing.
+
+bulk_create sends no Booking signals, so create_series() does their
+work itself, for the whole series at once: it adds the series to the
+occupancy summary and publishes a booking.created event for each
+occurrence in the same transaction, then updates the availability index
+and drops the cached dates once it commits.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+
+from . import availability, caching, occupancy, outbox
+from .db import write_transaction
+from .models import Booking, SlotTaken
+from .slots import format_slot
+
+FREQUENCIES = {
+    'daily': 1,
+    'weekly': 7,
+    'fortnightly': 14,
+}
+
+MAX_OCCURRENCES = 52
+
+
+class SeriesConflict(SlotTaken):
+    """
+    Raised when a series' table is already booked on some of its dates.
+
+    Attributes:
+        dates (list): The dates on which the table is taken, in order.
+    """
+
+    def __init__(self, table, time, dates):
+        self.dates = dates
+        listed = ', '.join(str(date) for date in dates)
+        super().__init__(f"{table} is already booked at {format_slot(time)} on {listed}.", code='slot_taken')
+
+
+def occurrences(start, frequency='weekly', count=None, until=None):
+    """
+    Returns the dates of a series from start, every day, week or
+    fortnight, for count occurrences or up to and including until.
+    Raises ValueError for a series longer than MAX_OCCURRENCES.
+    """
+    if count is None and until is None:
+        raise ValueError("Give a number of occurrences or an end date.")
+    step = timedelta(days=FREQUENCIES[frequency])
+    dates = []
+    date = start
+    while (count is None or len(dates) < count) and (until is None or date <= until):
+        if len(dates) == MAX_OCCURRENCES:
+            raise ValueError(f"A series can have at most {MAX_OCCURRENCES} occurrences.")
+        dates.append(date)
+        date += step
+    return dates
+
+
+def conflicts(table, time, dates):
+    """
+    Returns the dates on which the table is already booked at the given
+    time, in one query.
+    """
+    taken = Booking.objects.filter(table=table, time=time, date__in=dates)
+    return sorted(taken.values_list('date', flat=True))
+
+
+def create_series(user, table, time, num_guests, dates):
+    """
+    Books the table at the given time on every one of the dates, or on
+    none of them. Returns the bookings, by date. Raises SeriesConflict,
+    listing the dates, if the table is taken on any of them.
+    """
+    if not dates:
+        return []
+    with write_transaction():
+        taken = conflicts(table, time, dates)
+        if taken:
+            raise SeriesConflict(table, time, taken)
+        bookings = [
+            Booking(user=user, table=table, date=date, time=time, num_guests=num_guests)
+            for date in sorted(dates)
+        ]
+        try:
+            with transaction.atomic():
+                Booking.objects.bulk_create(bookings)
+        except IntegrityError:
+            # A concurrent booking took one of the dates since the check.
+            taken = conflicts(table, time, dates)
+            if not taken:
+                raise
+            raise SeriesConflict(table, time, taken)
+        if bookings and bookings[0].pk is None:
+            # Not every database returns the new ids from bulk_create.
+            bookings = list(Booking.objects.filter(table=table, time=time, date__in=dates).order_by('date'))
+        occupancy.apply_dates(dates, time, 1, num_guests, table.capacity)
+        outbox.publish_bookings('booking.created', bookings)
+
+    def update():
+        for booking in bookings:
+            availability.move_booking(None, (table.pk, booking.date, time))
+        caching.invalidate_dates(*dates)
+
+    transaction.on_commit(update)
+    return bookings
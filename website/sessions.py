@@ -0,0 +1,95 @@
+"""
+A session engine that reads from the cache and writes behind it.
+
+Like django.contrib.sessions.backends.cached_db, sessions are read from
+the cache and only loaded from the database when the cache does not have
+them. Saving is different: creating a session, and any change to who is
+logged in, is written to the database at once, but other changes are
+written to the cache only if the database copy was written less than
+SESSION_WRITE_BEHIND seconds ago. They reach the database with the next
+save after that, so a busy session costs at most one database write per
+SESSION_WRITE_BEHIND seconds; if the cache loses the session before
+then, it falls back to the database copy.
+
+This only works if every process sees the same cache. A local-memory
+cache is private to each process: a logout in one worker would leave the
+session cached, and logged in, in the others, and written-behind changes
+would only reach the worker that made them. With such a cache the
+sessions are read from and written to the database on every request, as
+with django.contrib.sessions.backends.db; set CACHE_BACKEND to a shared
+cache to serve them from the cache (see the CACHES setting).
+"""
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.sessions.backends import cached_db, db
+from django.core.cache.backends.locmem import LocMemCache
+
+KEY_PREFIX = 'website.sessions'
+
+AUTH_KEYS = (SESSION_KEY, BACKEND_SESSION_KEY, HASH_SESSION_KEY)
+
+
+def auth_fields(data):
+    return tuple(data.get(key) for key in AUTH_KEYS)
+
+
+class SessionStore(cached_db.SessionStore):
+    """
+    Attributes:
+        loaded_auth (tuple): The session's user id, backend and auth hash
+        as loaded, to tell whether a save changes who is logged in.
+    """
+    cache_key_prefix = KEY_PREFIX
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self.loaded_auth = auth_fields({})
+
+    @property
+    def shared(self):
+        """
+        Whether other processes see the cache, so that the session can
+        be served from it.
+        """
+        return not isinstance(self._cache, LocMemCache)
+
+    def persisted_key(self, session_key):
+        return f'{self.cache_key_prefix}{session_key}:persisted'
+
+    def exists(self, session_key):
+        if not self.shared:
+            return db.SessionStore.exists(self, session_key)
+        return super().exists(session_key)
+
+    def load(self):
+        data = super().load() if self.shared else db.SessionStore.load(self)
+        self.loaded_auth = auth_fields(data)
+        return data
+
+    def save(self, must_create=False):
+        if not self.shared:
+            db.SessionStore.save(self, must_create)
+            return
+        delay = getattr(settings, 'SESSION_WRITE_BEHIND', 60)
+        if (
+            must_create
+            or self.session_key is None
+            or not delay
+            or auth_fields(self._get_session()) != self.loaded_auth
+            or not self._cache.get(self.persisted_key(self.session_key))
+        ):
+            super().save(must_create)
+            self.loaded_auth = auth_fields(self._get_session())
+            if delay:
+                self._cache.set(self.persisted_key(self.session_key), True, delay)
+            return
+        self._cache.set(self.cache_key, self._get_session(), self.get_expiry_age())
+
+    def delete(self, session_key=None):
+        session_key = session_key or self.session_key
+        if not self.shared:
+            db.SessionStore.delete(self, session_key)
+            return
+        super().delete(session_key)
+        if session_key is not None:
+            self._cache.delete(self.persisted_key(session_key))
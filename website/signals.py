@@ -0,0 +1,139 @@
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_out
+from django.core.signals import request_finished, request_started
+from django.db import connections, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import allocation, auth, availability, caching, db, occupancy, outbox
+from .models import Booking, Table
+
+
+@receiver(post_init, sender=Booking)
+def remember_booking_slot(sender, instance, **kwargs):
+    """
+    Remembers the slot and party size a booking was loaded with, so that
+    changing it can be applied to the availability index and the
+    occupancy summary as a move.
+    """
+    instance._loaded = (instance.table_id, instance.date, instance.time, instance.num_guests)
+
+
+def cached_table(booking):
+    if Booking.table.is_cached(booking):
+        return booking.table
+    return None
+
+
+@receiver(post_save, sender=Booking)
+def index_saved_booking(sender, instance, created, **kwargs):
+    """
+    Moves a saved booking in the occupancy summary and publishes an
+    outbox event for it straight away, and moves it to its new slot in
+    the availability index, dropping the cached availability of both
+    dates, once the transaction commits.
+    """
+    old = None if created else instance._loaded
+    new = (instance.table_id, instance.date, instance.time, instance.num_guests)
+    instance._loaded = new
+    occupancy.move_booking(old, new, cached_table(instance))
+    if instance.combined_with_id is None and old != new:
+        outbox.publish_booking('booking.created' if created else 'booking.updated', instance)
+    old_slot = old and old[:3]
+    if old_slot != new[:3]:
+        def update():
+            availability.move_booking(old_slot, new[:3])
+            caching.invalidate_dates(old_slot and old_slot[1], new[1])
+
+        transaction.on_commit(update)
+    elif old != new:
+        # Only the guest count changed, which only the calendar shows.
+        transaction.on_commit(lambda: caching.invalidate_months(new[1]))
+
+
+@receiver(post_delete, sender=Booking)
+def unindex_deleted_booking(sender, instance, **kwargs):
+    """
+    Takes a deleted booking out of the occupancy summary and publishes
+    an outbox event for it straight away, and frees its slot in the
+    availability index, dropping the cached availability of its date,
+    once the transaction commits.
+    """
+    old = instance._loaded
+    occupancy.move_booking(old, None, cached_table(instance))
+    if instance.combined_with_id is None:
+        outbox.publish_booking('booking.cancelled', instance)
+
+    def update():
+        availability.move_booking(old[:3], None)
+        caching.invalidate_dates(old[1])
+
+    transaction.on_commit(update)
+
+
+@receiver(post_init, sender=Table)
+def remember_table_capacity(sender, instance, **kwargs):
+    instance._loaded_capacity = instance.capacity
+
+
+@receiver(post_save, sender=Table)
+def resize_occupancy(sender, instance, created, **kwargs):
+    """
+    Applies a change to a table's capacity to the occupancy summary of
+    every slot it is booked for, in the table's own transaction.
+    """
+    if not created:
+        occupancy.change_capacity(instance.pk, instance._loaded_capacity, instance.capacity)
+    instance._loaded_capacity = instance.capacity
+
+
+@receiver(post_save, sender=Table)
+@receiver(post_delete, sender=Table)
+def reset_availability(sender, **kwargs):
+    """
+    Rebuilds the availability index and the table allocator, and drops
+    all cached availability, after tables change.
+    """
+    def update():
+        availability.reset_index()
+        allocation.reset_allocator()
+        caching.invalidate_tables()
+
+    transaction.on_commit(update)
+
+
+@receiver(m2m_changed, sender=Table.adjoining.through)
+def reset_allocator(sender, action, **kwargs):
+    """
+    Rebuilds the table allocator after adjoining tables change.
+    """
+    if action.startswith('post_'):
+        transaction.on_commit(allocation.reset_allocator)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """
+    Drops an edited or deleted user from the cache of every session.
+    """
+    auth.invalidate_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def forget_logged_out_user(sender, request, **kwargs):
+    if request is not None and hasattr(request, 'session'):
+        auth.forget_session(request.session)
+
+
+@receiver(request_started)
+def check_idle_connections(sender, **kwargs):
+    """
+    Replaces persistent connections that went stale while idle.
+    """
+    db.check_idle_connections(connections)
+
+
+@receiver(request_finished)
+def mark_idle_connections(sender, **kwargs):
+    db.mark_idle(connections)
@@ -0,0 +1,42 @@
+from datetime import datetime
+
+
+TIME_CHOICES = (
+    ('9:00 AM', '9:00 AM'),
+    ('10:00 AM', '10:00 AM'),
+    ('11:00 AM', '11:00 AM'),
+    ('12:00 PM', '12:00 PM'),
+    ('1:00 PM', '1:00 PM'),
+    ('2:00 PM', '2:00 PM'),
+    ('3:00 PM', '3:00 PM'),
+    ('4:00 PM', '4:00 PM'),
+    ('5:00 PM', '5:00 PM'),
+    ('6:00 PM', '6:00 PM'),
+    ('7:00 PM', '7:00 PM'),
+    ('8:00 PM', '8:00 PM'),
+    ('9:00 PM', '9:00 PM'),
+    ('10:00 PM', '10:00 PM'),
+)
+
+
+def parse_slot(label):
+    """
+    Converts a slot label such as '7:00 PM' into a time object.
+    """
+    return datetime.strptime(label, '%I:%M %p').time()
+
+
+def format_slot(value):
+    """
+    Converts a time object back into its slot label, e.g. '7:00 PM'.
+    """
+    hour = value.hour % 12 or 12
+    suffix = 'AM' if value.hour < 12 else 'PM'
+    return f"{hour}:{value.minute:02d} {suffix}"
+
+
+# The booking slot grid, in the order the slots are offered to guests.
+# A slot's position in this tuple is its bit in an occupancy bitmap.
+SLOT_TIMES = tuple(parse_slot(value) for value, label in TIME_CHOICES)
+SLOT_INDEX = {slot: bit for bit, slot in enumerate(SLOT_TIMES)}
+ALL_SLOTS = (1 << len(SLOT_TIMES)) - 1
@@ -0,0 +1,174 @@
+"""
+Cold-start profiling for the web process.
+
+measure() starts a fresh interpreter with Python's import timing turned
+on (-X importtime), loads tonyspizza.wsgi and sends it one request, as a
+newly started worker would. It returns how long the import and the
+first response took, and the time spent importing each module.
+
+warm_up() does the loading a first request would otherwise do; the web
+entry points call it once the application is set up.
+
+With STARTUP_PROFILE=1 in the environment, tonyspizza.wsgi also logs its
+own import time and time to first response to the website.startup
+logger (see FirstResponseTimer). Run the server with
+PYTHONPROFILEIMPORTTIME=1 as well to get each module's import time on
+stderr.
+"""
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import Counter
+
+log = logging.getLogger('website.startup')
+
+IMPORT_TIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$')
+
+PROBE = '''
+import io, json, sys, time
+start = time.perf_counter()
+from tonyspizza.wsgi import application
+imported = time.perf_counter()
+response = {}
+def start_response(status, headers):
+    response['status'] = status
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': sys.argv[1], 'QUERY_STRING': '', 'SERVER_NAME': 'localhost',
+    'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'wsgi.url_scheme': 'http',
+    'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+}
+body = b''.join(application(environ, start_response))
+done = time.perf_counter()
+print(json.dumps({
+    'status': response['status'],
+    'import_ms': round((imported - start) * 1e3, 1),
+    'first_response_ms': round((done - imported) * 1e3, 1),
+    'modules': sorted(sys.modules),
+}))
+'''
+
+
+def warm_up():
+    """
+    Loads what a process would otherwise load on its first request: the
+    URLconf, with every view it imports, and the compiled page templates.
+    """
+    from django.conf import settings
+    from django.template.loader import get_template
+    from django.urls import get_resolver
+
+    get_resolver().url_patterns
+    for directory in settings.TEMPLATES[0]['DIRS']:
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.html'):
+                get_template(name)
+
+
+def parse_import_times(lines):
+    """
+    Returns [(module, self_ms, cumulative_ms)] from -X importtime output,
+    in import order.
+    """
+    timings = []
+    for line in lines:
+        match = IMPORT_TIME.match(line)
+        if match:
+            own, cumulative, indent, module = match.groups()
+            timings.append((module, int(own) / 1e3, int(cumulative) / 1e3))
+    return timings
+
+
+def by_package(timings):
+    """
+    Returns {top-level package: import ms}, slowest first.
+    """
+    totals = Counter()
+    for module, own, cumulative in timings:
+        totals[module.split('.')[0]] += own
+    return {package: round(ms, 1) for package, ms in totals.most_common()}
+
+
+def measure(path='/', env=None, database_url=None):
+    """
+    Loads tonyspizza.wsgi in a new interpreter and requests path. Returns
+    {'status', 'import_ms', 'first_response_ms', 'total_ms', 'modules',
+    'imports'}, where imports are the import timings of the interpreter's
+    own startup and of the application.
+
+    The interpreter gets env (by default this process's environment) and
+    opens the database it names, unless database_url gives another one.
+    Opening a database applies the SQLite profile to it, so the tests
+    pass a throwaway database of their own.
+    """
+    env = dict(os.environ if env is None else env)
+    if database_url is not None:
+        env['DATABASE_URL'] = database_url
+    env.pop('PYTHONPROFILEIMPORTTIME', None)
+    env.pop('STARTUP_PROFILE', None)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE, path],
+        cwd=root, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=False,
+    )
+    if process.returncode:
+        raise RuntimeError(f'The startup probe failed:\n{process.stderr[-2000:]}')
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    result['total_ms'] = round(result['import_ms'] + result['first_response_ms'], 1)
+    result['imports'] = parse_import_times(process.stderr.splitlines())
+    return result
+
+
+class FirstResponseTimer:
+    """
+    WSGI middleware that logs how long the application took to load and
+    how long the process took over its first response, then gets out of
+    the way. The first response is passed on as it is produced, and
+    timed until the server closes it.
+
+    Attributes:
+        load_ms (float): Milliseconds from started to the application
+        being loaded.
+    """
+
+    def __init__(self, application, started):
+        self.application = application
+        self.load_ms = (time.perf_counter() - started) * 1e3
+        self.done = False
+
+    def __call__(self, environ, start_response):
+        if self.done:
+            return self.application(environ, start_response)
+        self.done = True
+        return TimedResponse(
+            self.application(environ, start_response), time.perf_counter(), self.load_ms, environ.get('PATH_INFO'),
+        )
+
+
+class TimedResponse:
+    """
+    Passes on a WSGI response and logs how long it took once it is
+    closed.
+    """
+
+    def __init__(self, response, start, load_ms, path):
+        self.response = response
+        self.start = start
+        self.load_ms = load_ms
+        self.path = path
+
+    def __iter__(self):
+        return iter(self.response)
+
+    def close(self):
+        try:
+            if hasattr(self.response, 'close'):
+                self.response.close()
+        finally:
+            log.info(
+                'Process %s: application loaded in %.1f ms, first response (%s) took %.1f ms.',
+                os.getpid(), self.load_ms, self.path, (time.perf_counter() - self.start) * 1e3,
+            )
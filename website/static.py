@@ -0,0 +1,205 @@
+"""
+A WSGI static file server for the collected files in STATIC_ROOT.
+
+StaticFiles wraps the project's WSGI application and answers GET and
+HEAD requests under STATIC_URL itself, without going through Django:
+
+* the brotli or gzip copy written by collectstatic (see
+  website/storage.py) is sent to clients that accept it;
+* files whose names carry a content hash, as listed in staticfiles.json,
+  are cached by browsers for a year and marked immutable, so that a
+  repeat visit does not ask for them at all; anything else is cached for
+  STATIC_MAX_AGE seconds;
+* ETag, If-None-Match, Range and If-Range are supported. A range is
+  always served from the uncompressed file.
+
+The files are indexed once, when the application starts, so run
+collectstatic before starting the server.
+"""
+import json
+import mimetypes
+import os
+import re
+from email.utils import formatdate
+
+from django.conf import settings
+from django.utils.http import parse_etags
+
+FOREVER = 365 * 24 * 60 * 60
+MANIFEST = 'staticfiles.json'
+CHUNK_SIZE = 64 * 1024
+
+# Preferred first.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class StaticFile:
+    """
+    A collected file and its precompressed copies.
+
+    Attributes:
+        path (str): The file's path on disk.
+        headers (list): Headers sent with any response for the file.
+        variants (dict): {encoding: (path, size, etag)} for the file itself
+        (encoding None) and each compressed copy.
+    """
+
+    def __init__(self, path, immutable, max_age):
+        self.path = path
+        stat = os.stat(path)
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type in ('application/javascript', 'application/json'):
+            content_type += '; charset=utf-8'
+        tag = f'{stat.st_size:x}-{int(stat.st_mtime):x}'
+        self.variants = {None: (path, stat.st_size, f'"{tag}"')}
+        for encoding, extension in ENCODINGS:
+            if os.path.isfile(path + extension):
+                self.variants[encoding] = (path + extension, os.path.getsize(path + extension), f'"{tag}-{encoding}"')
+        self.headers = [
+            ('Content-Type', content_type),
+            ('Last-Modified', formatdate(stat.st_mtime, usegmt=True)),
+            ('Cache-Control', f'public, max-age={FOREVER}, immutable' if immutable else f'public, max-age={max_age}'),
+            ('Accept-Ranges', 'bytes'),
+        ]
+        if len(self.variants) > 1:
+            self.headers.append(('Vary', 'Accept-Encoding'))
+
+    def choose(self, accept_encoding):
+        """
+        Returns the encoding to send for an Accept-Encoding header, or
+        None for the file itself.
+        """
+        accepted = set()
+        for item in accept_encoding.split(','):
+            coding, _, params = item.strip().partition(';')
+            quality = params.strip().partition('=')[2] if params.strip().startswith('q=') else '1'
+            try:
+                if float(quality) > 0:
+                    accepted.add(coding.strip().lower())
+            except ValueError:
+                pass
+        for encoding, extension in ENCODINGS:
+            if encoding in self.variants and (encoding in accepted or '*' in accepted):
+                return encoding
+        return None
+
+
+def parse_range(header, size):
+    """
+    Returns (start, end) of the bytes a Range header asks for, with end
+    exclusive, None if it should be ignored, or False if it cannot be
+    satisfied. Multiple ranges are ignored and the whole file is sent.
+    """
+    match = RANGE.match(header.replace(' ', ''))
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    first, last = match.groups()
+    if first == '':
+        start, end = max(size - int(last), 0), size
+    else:
+        start, end = int(first), min(int(last) + 1, size) if last else size
+    if start >= end:
+        return False
+    return start, end
+
+
+def read(path, start, end):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = file.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+class StaticFiles:
+    """
+    WSGI middleware that serves the files in STATIC_ROOT at STATIC_URL
+    and passes every other request to the wrapped application.
+
+    Attributes:
+        application: The WSGI application for everything else.
+        prefix (str): The URL path the static files are served under.
+        files (dict): {URL path: StaticFile}.
+    """
+
+    def __init__(self, application, root=None, prefix=None, max_age=None):
+        self.application = application
+        root = root or settings.STATIC_ROOT
+        self.prefix = '/' + (prefix or settings.STATIC_URL).strip('/') + '/'
+        if max_age is None:
+            max_age = getattr(settings, 'STATIC_MAX_AGE', 60)
+        self.files = self.index(root, max_age) if root and os.path.isdir(root) else {}
+
+    def index(self, root, max_age):
+        """
+        Returns {URL path: StaticFile} for every file under root, except
+        the manifest.
+        """
+        try:
+            with open(os.path.join(root, MANIFEST)) as manifest:
+                hashed = {name for original, name in json.load(manifest)['paths'].items() if name != original}
+        except (OSError, ValueError, KeyError):
+            hashed = set()
+        files = {}
+        for directory, _, names in os.walk(root):
+            for name in names:
+                if name.endswith(tuple(extension for _, extension in ENCODINGS)):
+                    continue
+                path = os.path.join(directory, name)
+                relative = os.path.relpath(path, root).replace(os.sep, '/')
+                if relative == MANIFEST:
+                    continue
+                files[self.prefix + relative] = StaticFile(path, relative in hashed, max_age)
+        return files
+
+    def __call__(self, environ, start_response):
+        static_file = self.files.get(environ.get('PATH_INFO', ''))
+        if static_file is None:
+            return self.application(environ, start_response)
+        return self.serve(static_file, environ, start_response)
+
+    def serve(self, static_file, environ, start_response):
+        method = environ['REQUEST_METHOD']
+        if method not in ('GET', 'HEAD'):
+            start_response('405 Method Not Allowed', [('Allow', 'GET, HEAD'), ('Content-Length', '0')])
+            return []
+        range_header = environ.get('HTTP_RANGE')
+        current = static_file.variants[None][2]
+        if range_header and environ.get('HTTP_IF_RANGE', current) != current:
+            range_header = None
+        # Ranges are of the file itself, so they are never compressed.
+        encoding = None if range_header else static_file.choose(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        path, size, etag = static_file.variants[encoding]
+        headers = [*static_file.headers, ('ETag', etag)]
+        # If-None-Match compares weakly, so W/ tags match too.
+        if_none_match = {
+            tag[2:] if tag.startswith('W/') else tag for tag in parse_etags(environ.get('HTTP_IF_NONE_MATCH', ''))
+        }
+        if etag in if_none_match or '*' in if_none_match:
+            start_response('304 Not Modified', headers)
+            return []
+        if encoding:
+            headers.append(('Content-Encoding', encoding))
+        status, start, end = '200 OK', 0, size
+        if range_header:
+            requested = parse_range(range_header, size)
+            if requested is False:
+                headers += [('Content-Range', f'bytes */{size}'), ('Content-Length', '0')]
+                start_response('416 Range Not Satisfiable', headers)
+                return []
+            if requested:
+                status, (start, end) = '206 Partial Content', requested
+                headers.append(('Content-Range', f'bytes {start}-{end - 1}/{size}'))
+        headers.append(('Content-Length', str(end - start)))
+        start_response(status, headers)
+        if method == 'HEAD':
+            return []
+        if (start, end) == (0, size) and 'wsgi.file_wrapper' in environ:
+            return environ['wsgi.file_wrapper'](open(path, 'rb'), CHUNK_SIZE)
+        return read(path, start, end)
@@ -0,0 +1,80 @@
+"""
+Static file storage for the self-hosted asset pipeline.
+
+collectstatic copies the static files into STATIC_ROOT under names that
+include a hash of their contents, lists them in staticfiles.json, and
+then writes a gzip and, if the brotli package is installed, a brotli
+copy of each compressible file next to it. website.static serves them.
+"""
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = {'.css', '.js', '.json', '.map', '.svg', '.txt', '.html', '.xml', '.ico', '.ttf', '.otf', '.eot'}
+
+# Compressed copies that save less than this share of the original are
+# not worth the CPU it takes to decode them.
+MIN_SAVING = 0.05
+
+
+def compressors():
+    """
+    Returns [(extension, compress)] for the encodings available here.
+    """
+    available = [('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        available.append(('.br', lambda data: brotli.compress(data, quality=11)))
+    return available
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage that also precompresses what it collects.
+
+    Until collectstatic has written a manifest, as in development and
+    tests, files keep their own names rather than raising an error.
+    """
+
+    def stored_name(self, name):
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        # A file and its hashed copy usually have the same contents.
+        compressed = {}
+        for name in sorted({*paths, *self.hashed_files.values()}):
+            if os.path.splitext(name)[1].lower() in COMPRESSIBLE:
+                for compressed_name in self.compress(name, compressed):
+                    yield name, compressed_name, True
+
+    def compress(self, name, compressed):
+        """
+        Writes the compressed copies of a collected file that are worth
+        keeping and returns their names. compressed is a dict of the
+        copies made so far, by extension and contents.
+        """
+        with self.open(name) as original:
+            data = original.read()
+        written = []
+        for extension, compress in compressors():
+            compressed_name = name + extension
+            if self.exists(compressed_name):
+                self.delete(compressed_name)
+            key = (extension, data)
+            if key not in compressed:
+                compressed[key] = compress(data)
+            if len(compressed[key]) <= len(data) * (1 - MIN_SAVING):
+                with open(self.path(compressed_name), 'wb') as output:
+                    output.write(compressed[key])
+                written.append(compressed_name)
+        return written
@@ -1,3 +1,1917 @@
-from django.test import TestCase
+import csv
+import gzip
+import json
+import os
+import re
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+from io import StringIO
+from datetime import date, datetime, time, timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth import SESSION_KEY
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import CommandError, call_command
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.db import IntegrityError, OperationalError, connection, connections, transaction
+from django.db.utils import ConnectionHandler
+from django.templatetags.static import static
+from django.test import AsyncClient, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import reverse
+
+from . import allocation, archive, availability, caching, occupancy, outbox, routers, series, sessions, startup, storage
+from .db import database_config, pool, write_transaction
+from .forms import BookingForm, SeriesBookingForm
+from .models import ArchivedBooking, Table, Booking, OutboxEvent, SlotOccupancy, SlotTaken
+from .slots import SLOT_TIMES, format_slot, parse_slot
+from .static import StaticFiles
+from .views import BookingListView, BookingUpdateView, BookingDeleteView
+
+try:
+    from . import analytics
+except ImportError:  # NumPy is not installed.
+    analytics = None
+
+FRIDAY = date(2030, 3, 1)
+SEVEN_PM = time(19, 0)
+
+
+class SlotTests(TestCase):
+
+    def test_labels_round_trip(self):
+        for value, label in BookingForm.TIME_CHOICES:
+            self.assertEqual(format_slot(parse_slot(value)), label)
+
+    def test_evening_slots_are_not_stored_as_morning(self):
+        self.assertEqual(parse_slot('7:00 PM'), SEVEN_PM)
+        self.assertEqual(len(set(SLOT_TIMES)), len(SLOT_TIMES))
+
+
+class OccupancyIndexTests(TestCase):
+
+    def setUp(self):
+        self.index = availability.OccupancyIndex({1: 2, 2: 4, 3: 8}.items())
+        self.index.load([FRIDAY], [(1, FRIDAY, SEVEN_PM), (3, FRIDAY, SEVEN_PM)])
+
+    def test_free_tables_respect_party_size(self):
+        self.assertEqual(self.index.free_tables(FRIDAY, SEVEN_PM), [2])
+        self.assertEqual(self.index.free_tables(FRIDAY, SEVEN_PM, party_size=6), [])
+        self.assertEqual(self.index.free_tables(FRIDAY, time(18, 0), party_size=6), [3])
+
+    def test_free_slots_and_capacity(self):
+        self.assertNotIn(SEVEN_PM, self.index.free_slots(FRIDAY, party_size=6))
+        self.assertIn(SEVEN_PM, self.index.free_slots(FRIDAY, party_size=4))
+        self.assertEqual(self.index.free_capacity(FRIDAY, SEVEN_PM), 4)
+        self.assertEqual(self.index.free_capacity(FRIDAY, time(18, 0)), 14)
+
+    def test_add_and_discard(self):
+        self.index.add(2, FRIDAY, SEVEN_PM)
+        self.assertEqual(self.index.free_tables(FRIDAY, SEVEN_PM), [])
+        self.index.discard(1, FRIDAY, SEVEN_PM)
+        self.assertEqual(self.index.free_tables(FRIDAY, SEVEN_PM), [1])
+
+    def test_expired_dates_are_missing(self):
+        self.assertEqual(self.index.missing_dates([FRIDAY]), [])
+        self.index.ttl = 0
+        self.assertEqual(self.index.missing_dates([FRIDAY]), [FRIDAY])
+
+
+class AvailabilityTests(TestCase):
+
+    def setUp(self):
+        availability.reset_index()
+        self.addCleanup(availability.reset_index)
+        self.user = User.objects.create_user('guest')
+        self.small = Table.objects.create(number=1, capacity=2)
+        self.large = Table.objects.create(number=2, capacity=6)
+
+    def book(self, table, when=FRIDAY, at=SEVEN_PM):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Booking.objects.create(
+                user=self.user, table=table, date=when, time=at, num_guests=2,
+            )
+
+    def test_lookups_cost_two_queries_then_none(self):
+        with self.assertNumQueries(2):
+            availability.availability(FRIDAY, date(2030, 3, 7))
+        with self.assertNumQueries(0):
+            availability.free_tables(FRIDAY, SEVEN_PM, party_size=4)
+
+    def test_index_follows_saves_and_deletes(self):
+        availability.load_dates(FRIDAY)
+        booking = self.book(self.large)
+        self.assertEqual(availability.free_tables(FRIDAY, SEVEN_PM), [self.small.pk])
+
+        booking.time = time(20, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.save()
+        self.assertEqual(availability.free_tables(FRIDAY, SEVEN_PM), [self.small.pk, self.large.pk])
+        self.assertEqual(availability.free_tables(FRIDAY, time(20, 0)), [self.small.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.delete()
+        self.assertEqual(availability.free_tables(FRIDAY, time(20, 0)), [self.small.pk, self.large.pk])
+
+    def test_form_rejects_booked_table(self):
+        self.book(self.large)
+        data = {
+            'user': self.user.pk, 'table': self.large.pk, 'date': FRIDAY,
+            'time': '7:00 PM', 'num_guests': 4,
+        }
+        self.assertFalse(BookingForm(data).is_valid())
+        self.assertTrue(BookingForm(dict(data, time='8:00 PM')).is_valid())
+
+    def test_form_keeps_own_slot_when_editing(self):
+        booking = self.book(self.large)
+        form = BookingForm({
+            'user': self.user.pk, 'table': self.large.pk, 'date': FRIDAY,
+            'time': '7:00 PM', 'num_guests': 5,
+        }, instance=booking)
+        self.assertEqual(form.initial['time'], '7:00 PM')
+        self.assertTrue(form.is_valid())
+
+
+class SlotClaimTests(TestCase):
+
+    def setUp(self):
+        availability.reset_index()
+        cache.clear()
+        self.user = User.objects.create_user('guest', password='pizza-pass-1')
+        self.table = Table.objects.create(number=1, capacity=4)
+        self.client.force_login(self.user)
+
+    def booking(self, **kwargs):
+        return Booking(user=self.user, table=self.table, date=FRIDAY, time=SEVEN_PM, num_guests=2, **kwargs)
+
+    def test_second_claim_raises_slot_taken(self):
+        self.booking().claim()
+        with self.assertRaises(SlotTaken):
+            self.booking().claim()
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_lost_race_is_a_form_error(self):
+        data = {
+            'user': self.user.pk, 'table': self.table.pk, 'date': FRIDAY,
+            'time': '7:00 PM', 'num_guests': 2,
+        }
+        # Simulate a concurrent claim that the form's availability check
+        # has not seen yet.
+        availability.load_dates(FRIDAY)
+        Booking.objects.bulk_create([self.booking()])
+        for url in (reverse('booking-create'), reverse('reservation')):
+            response = self.client.post(url, data)
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, 'already booked')
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_reservation_redirects_to_booking_list(self):
+        response = self.client.post(reverse('reservation'), {
+            'user': self.user.pk, 'table': self.table.pk, 'date': FRIDAY,
+            'time': '7:00 PM', 'num_guests': 2,
+        })
+        self.assertRedirects(response, reverse('booking-list'), fetch_redirect_response=False)
+
+
+class SlotContentionTests(TransactionTestCase):
+
+    clients = 8
+
+    def setUp(self):
+        self.user = User.objects.create_user('guest')
+        self.table = Table.objects.create(number=1, capacity=4)
+
+    def test_only_one_concurrent_claim_wins(self):
+        barrier = threading.Barrier(self.clients)
+        results = []
+
+        def claim():
+            barrier.wait()
+            try:
+                while True:
+                    try:
+                        Booking(user=self.user, table=self.table, date=FRIDAY, time=SEVEN_PM, num_guests=2).claim()
+                        results.append('claimed')
+                    except SlotTaken:
+                        results.append('taken')
+                    except OperationalError as error:
+                        # The shared-cache in-memory SQLite test database
+                        # reports a lock instead of waiting for it.
+                        if 'locked' not in str(error):
+                            raise
+                        continue
+                    break
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=claim) for _ in range(self.clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(results), ['claimed'] + ['taken'] * (self.clients - 1))
+        self.assertEqual(Booking.objects.count(), 1)
+
+
+class QueryPlanTests(TestCase):
+    """
+    Pins the query plans of the hot Booking queries to index lookups, so
+    that a model or query change cannot quietly fall back to a full scan.
+    Runs against whichever database the tests use (SQLite or PostgreSQL).
+    """
+
+    tables = 40
+    users = 200
+    days = 60
+
+    @classmethod
+    def setUpTestData(cls):
+        Table.objects.bulk_create(Table(number=n, capacity=4) for n in range(cls.tables))
+        User.objects.bulk_create(User(username=f'regular-{n}') for n in range(cls.users))
+        table_ids = list(Table.objects.values_list('pk', flat=True))
+        user_ids = list(User.objects.values_list('pk', flat=True))
+        Booking.objects.bulk_create(
+            Booking(
+                user_id=user_ids[(day * 7 + n) % len(user_ids)],
+                table_id=table_ids[n % len(table_ids)],
+                date=date(2029, 1, 1) + timedelta(days=day),
+                time=SLOT_TIMES[n // len(table_ids)],
+                num_guests=2,
+            )
+            for day in range(cls.days)
+            for n in range(len(table_ids) * len(SLOT_TIMES))
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        cls.user = User.objects.get(pk=user_ids[0])
+        cls.booking = Booking.objects.filter(user=cls.user).first()
+
+    def view(self, view_class, **kwargs):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        view = view_class()
+        view.setup(request, **kwargs)
+        return view
+
+    def assertIndexScan(self, queryset, index=None):
+        plan = queryset.explain()
+        if connection.vendor == 'postgresql':
+            self.assertNotIn('Seq Scan', plan)
+            self.assertIn('Index', plan)
+        else:
+            self.assertNotRegex(plan, r'\bSCAN (TABLE )?website_booking\b')
+            self.assertIn('SEARCH', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+        if index:
+            self.assertIn(index, plan)
+
+    def test_booking_list_uses_user_date_index(self):
+        view = self.view(BookingListView)
+        paginator = view.get_paginator(view.get_queryset(), view.paginate_by)
+        self.assertIndexScan(paginator.window(), 'booking_user_date_idx')
+        cursor = paginator.cursor(self.booking)
+        self.assertIndexScan(paginator.window(after=cursor), 'booking_user_date_idx')
+        self.assertIndexScan(paginator.window(before=cursor), 'booking_user_date_idx')
+
+    def test_ownership_lookups_use_an_index(self):
+        for view_class in (BookingUpdateView, BookingDeleteView):
+            queryset = self.view(view_class, pk=self.booking.pk).get_queryset()
+            self.assertIndexScan(queryset.filter(pk=self.booking.pk))
+
+    def test_slot_lookup_uses_an_index(self):
+        queryset = Booking.objects.filter(table=self.booking.table_id, date=self.booking.date, time=self.booking.time)
+        self.assertIndexScan(queryset)
+
+    def test_availability_load_uses_date_slot_index(self):
+        queryset = Booking.objects.filter(
+            date__range=(date(2029, 1, 10), date(2029, 1, 16)),
+        ).values_list('table_id', 'date', 'time')
+        self.assertIndexScan(queryset, 'booking_date_slot_idx')
+
+
+class BookingListTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('regular')
+        Table.objects.bulk_create(Table(number=n, capacity=4) for n in range(3))
+        tables = list(Table.objects.all())
+        today = timezone.localdate()
+        Booking.objects.bulk_create(
+            Booking(
+                user=cls.user, table=table, date=today + timedelta(days=day),
+                time=SLOT_TIMES[day % len(SLOT_TIMES)], num_guests=2,
+            )
+            for day in range(-30, 30)
+            for table in tables
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def walk(self, when, direction='after'):
+        """
+        Follows the pagination links and returns every booking shown.
+        """
+        seen = []
+        params = {'when': when}
+        while True:
+            response = self.client.get(reverse('booking-list'), params)
+            page = response.context['page_obj']
+            seen.extend(page.object_list if direction == 'after' else reversed(page.object_list))
+            cursor = page.next_cursor if direction == 'after' else page.previous_cursor
+            if cursor is None:
+                return seen
+            params = {'when': when, direction: cursor}
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        url = reverse('booking-list')
+        for page_size in (5, 50):
+            with self.subTest(page_size=page_size):
+                BookingListView.paginate_by = page_size
+                self.addCleanup(setattr, BookingListView, 'paginate_by', 20)
+                # Session, user, and one query for the page's bookings with
+                # their tables.
+                with self.assertNumQueries(3):
+                    response = self.client.get(url)
+                self.assertEqual(len(response.context['bookings']), page_size)
+
+    def test_pages_cover_upcoming_bookings_in_order(self):
+        seen = self.walk('upcoming')
+        keys = [(b.date, b.time, b.pk) for b in seen]
+        self.assertEqual(keys, sorted(keys))
+        self.assertEqual(len(seen), 90)
+        self.assertTrue(all(b.date >= timezone.localdate() for b in seen))
+
+    def test_past_bookings_run_most_recent_first(self):
+        seen = self.walk('past')
+        keys = [(b.date, b.time, b.pk) for b in seen]
+        self.assertEqual(keys, sorted(keys, reverse=True))
+        self.assertEqual(len(seen), 90)
+
+    def test_previous_link_returns_to_the_first_page(self):
+        url = reverse('booking-list')
+        first = self.client.get(url).context['page_obj']
+        second = self.client.get(url, {'after': first.next_cursor}).context['page_obj']
+        back = self.client.get(url, {'before': second.previous_cursor}).context['page_obj']
+        self.assertEqual(back.object_list, first.object_list)
+        self.assertFalse(back.has_previous)
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get(reverse('booking-list'), {'after': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class AvailabilityAPITests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        availability.reset_index()
+        self.addCleanup(availability.reset_index)
+        self.user = User.objects.create_user('guest')
+        self.small = Table.objects.create(number=1, capacity=2)
+        self.large = Table.objects.create(number=2, capacity=6)
+        self.url = reverse('availability-api')
+
+    def get(self, **params):
+        headers = {}
+        if 'etag' in params:
+            headers['HTTP_IF_NONE_MATCH'] = params.pop('etag')
+        return self.client.get(self.url, params, **headers)
+
+    def book(self, when=FRIDAY):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Booking.objects.create(user=self.user, table=self.large, date=when, time=SEVEN_PM, num_guests=4)
+
+    def slot(self, response, when=FRIDAY, label='7:00 PM'):
+        day = next(d for d in response.json()['dates'] if d['date'] == when.isoformat())
+        return next((s['tables'] for s in day['slots'] if s['label'] == label), [])
+
+    def test_lists_free_tables_for_party_size(self):
+        self.book()
+        response = self.get(date=FRIDAY, party_size=4)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.slot(response), [])
+        self.assertEqual(self.slot(response, label='8:00 PM'), [self.large.pk])
+        self.assertEqual(self.slot(self.get(date=FRIDAY)), [self.small.pk])
+
+    def test_unchanged_poll_is_not_modified_without_queries(self):
+        etag = self.get(start=FRIDAY, end=date(2030, 3, 7))['ETag']
+        with self.assertNumQueries(0):
+            response = self.get(start=FRIDAY, end=date(2030, 3, 7), etag=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_booking_invalidates_only_its_date(self):
+        saturday = date(2030, 3, 2)
+        friday_etag = self.get(date=FRIDAY)['ETag']
+        saturday_etag = self.get(date=saturday)['ETag']
+        self.book()
+        response = self.get(date=FRIDAY, etag=friday_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.slot(response), [self.small.pk])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get(date=saturday, etag=saturday_etag).status_code, 304)
+
+    def test_booking_during_a_load_is_not_cached_over(self):
+        load_dates = availability.load_dates
+
+        def load_then_book(*args, **kwargs):
+            index = load_dates(*args, **kwargs)
+            # Another process books once the load has read the bookings.
+            Booking.objects.bulk_create([
+                Booking(user=self.user, table=self.large, date=FRIDAY, time=SEVEN_PM, num_guests=4),
+            ])
+            caching.invalidate_dates(FRIDAY)
+            return index
+
+        with mock.patch('website.caching.availability.load_dates', load_then_book):
+            self.assertEqual(self.slot(self.get(date=FRIDAY)), [self.small.pk, self.large.pk])
+        self.assertEqual(self.slot(self.get(date=FRIDAY)), [self.small.pk])
+
+    def test_table_change_invalidates_every_date(self):
+        etag = self.get(date=FRIDAY)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Table.objects.create(number=3, capacity=4)
+        self.assertEqual(self.get(date=FRIDAY, etag=etag).status_code, 200)
+
+    def test_rejects_bad_parameters(self):
+        for params in ({}, {'date': 'friday'}, {'start': '2030-03-07', 'end': '2030-03-01'},
+                       {'start': '2030-01-01', 'end': '2030-12-31'}, {'date': '2030-03-01', 'party_size': 0}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+
+class RequestProfilingTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('guest')
+        self.client.force_login(self.user)
+
+    def server_timing(self, response):
+        return dict(
+            (part.split(';')[0], part)
+            for part in response['Server-Timing'].split(', ')
+        )
+
+    def test_reports_timings_and_query_count(self):
+        timing = self.server_timing(self.client.get(reverse('booking-list')))
+        self.assertEqual(set(timing), {'total', 'view', 'render', 'db'})
+        self.assertIn('desc="3 queries"', timing['db'])
+
+    @override_settings(REQUEST_PROFILING_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_profiled(self):
+        self.assertNotIn('Server-Timing', self.client.get(reverse('index')))
+
+    @override_settings(SLOW_REQUEST_THRESHOLD_MS=0)
+    def test_slow_requests_are_logged_with_their_sql(self):
+        with self.assertLogs('website.slow_requests', 'WARNING') as logs:
+            self.client.get(reverse('booking-list'))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['path'], reverse('booking-list'))
+        self.assertEqual(record['queries'], 3)
+        self.assertTrue(any('website_booking' in query['sql'] for query in record['sql']))
+
+
+class TableAllocatorTests(TestCase):
+
+    def setUp(self):
+        # Tables 3 and 4 adjoin and seat 8 together.
+        self.allocator = allocation.TableAllocator(
+            {1: 2, 2: 6, 3: 4, 4: 4, 5: 8}.items(), {3: {4}, 4: {3}},
+        )
+
+    def test_picks_the_smallest_table_that_fits(self):
+        self.assertEqual(self.allocator.assign(2, lambda table_id: True), (1,))
+        self.assertEqual(self.allocator.assign(3, lambda table_id: True), (3,))
+        self.assertEqual(self.allocator.assign(5, lambda table_id: True), (2,))
+
+    def test_prefers_a_single_table_to_a_combination_of_the_same_size(self):
+        self.assertEqual(self.allocator.assign(8, lambda table_id: True), (5,))
+        self.assertEqual(self.allocator.assign(8, lambda table_id: table_id != 5), (3, 4))
+
+    def test_returns_none_when_nothing_fits(self):
+        self.assertIsNone(self.allocator.assign(9, lambda table_id: True))
+        self.assertIsNone(self.allocator.assign(7, lambda table_id: table_id not in (4, 5)))
+
+    def test_groups_only_connected_tables(self):
+        groups = allocation.adjoining_groups({1: {2}, 2: {1, 3}, 3: {2}, 4: set()}, 3)
+        self.assertIn((1, 2, 3), groups)
+        self.assertNotIn((1, 3), groups)
+        self.assertNotIn((3, 4), groups)
+
+
+class TableAssignmentTests(TestCase):
+
+    def setUp(self):
+        availability.reset_index()
+        allocation.reset_allocator()
+        self.addCleanup(availability.reset_index)
+        self.addCleanup(allocation.reset_allocator)
+        self.user = User.objects.create_user('guest')
+        self.client.force_login(self.user)
+        self.two = Table.objects.create(number=1, capacity=2)
+        self.four = Table.objects.create(number=2, capacity=4)
+        self.four_b = Table.objects.create(number=3, capacity=4)
+        self.four.adjoining.add(self.four_b)
+
+    def post(self, guests, table=''):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('booking-create'), {
+                'user': self.user.pk, 'table': table, 'date': FRIDAY,
+                'time': '7:00 PM', 'num_guests': guests,
+            })
+
+    def test_assigns_best_fit_table_when_none_chosen(self):
+        self.post(2)
+        self.post(2)
+        self.assertEqual(
+            sorted(Booking.objects.values_list('table__capacity', flat=True)), [2, 4],
+        )
+
+    def test_large_party_gets_adjoining_tables(self):
+        self.post(7)
+        booking = Booking.objects.get(combined_with__isnull=True)
+        self.assertEqual(booking.num_guests, 7)
+        self.assertEqual(
+            {booking.table_id, *booking.extra_bookings.values_list('table_id', flat=True)},
+            {self.four.pk, self.four_b.pk},
+        )
+        self.assertEqual(availability.free_tables(FRIDAY, SEVEN_PM), [self.two.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.delete()
+        self.assertFalse(Booking.objects.exists())
+
+    def test_turns_away_party_nothing_can_seat(self):
+        response = self.post(9)
+        self.assertContains(response, 'no table can seat 9 guests')
+
+    def test_rejects_chosen_table_that_is_too_small(self):
+        response = self.post(4, table=self.two.pk)
+        self.assertContains(response, 'only seats 2')
+        self.assertFalse(Booking.objects.exists())
+
+    def test_editing_keeps_the_tables_already_held(self):
+        self.post(7)
+        booking = Booking.objects.get(combined_with__isnull=True)
+        form = BookingForm({
+            'user': self.user.pk, 'table': '', 'date': FRIDAY,
+            'time': '7:00 PM', 'num_guests': 8,
+        }, instance=booking)
+        self.assertTrue(form.is_valid(), form.errors)
+        with self.captureOnCommitCallbacks(execute=True):
+            form.instance.claim(form.extra_tables)
+        self.assertEqual(Booking.objects.count(), 2)
+
+
+class BookingFormTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('guest', password='pizza-pass-1')
+        self.client.force_login(self.user)
+        self.two = Table.objects.create(number=1, capacity=2)
+        self.four = Table.objects.create(number=2, capacity=4)
+        self.six = Table.objects.create(number=3, capacity=6)
+
+    def table_choices(self, form):
+        return [value for value, label in form.fields['table'].choices if value != '']
+
+    def test_form_has_no_user_field(self):
+        self.assertNotIn('user', BookingForm().fields)
+
+    def test_render_queries_do_not_grow_with_users(self):
+        url = reverse('booking-create')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+        few = len(few)
+        User.objects.bulk_create(User(username=f'diner-{n}') for n in range(200))
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(url)
+        self.assertEqual(len(many), few)
+        self.assertFalse([q for q in many if 'website_table' in q['sql']])
+
+    def test_offers_only_free_tables_that_seat_the_party(self):
+        Booking.objects.create(user=self.user, table=self.four, date=FRIDAY, time=SEVEN_PM, num_guests=2)
+        form = BookingForm({'date': FRIDAY, 'time': '7:00 PM', 'num_guests': 3})
+        self.assertEqual(self.table_choices(form), [self.six.pk])
+        form = BookingForm({'date': FRIDAY, 'time': '8:00 PM', 'num_guests': 3})
+        self.assertEqual(self.table_choices(form), [self.four.pk, self.six.pk])
+
+    def test_editing_offers_the_booking_its_own_table(self):
+        booking = Booking.objects.create(user=self.user, table=self.four, date=FRIDAY, time=SEVEN_PM, num_guests=2)
+        self.assertEqual(self.table_choices(BookingForm(instance=booking)), [self.two.pk, self.four.pk, self.six.pk])
+
+    def test_choices_follow_booking_changes(self):
+        data = {'date': FRIDAY, 'time': '7:00 PM', 'num_guests': 2}
+        self.assertIn(self.two.pk, self.table_choices(BookingForm(data)))
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.create(user=self.user, table=self.two, date=FRIDAY, time=SEVEN_PM, num_guests=2)
+        self.assertNotIn(self.two.pk, self.table_choices(BookingForm(data)))
+
+    def test_choices_follow_table_changes(self):
+        self.assertEqual(len(self.table_choices(BookingForm())), 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            Table.objects.create(number=4, capacity=8)
+        self.assertEqual(len(self.table_choices(BookingForm())), 4)
+
+
+class PageCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.table = Table.objects.create(number=7, capacity=4)
+
+    def test_anonymous_page_is_served_from_cache(self):
+        url = reverse('table-list')
+        self.assertContains(self.client.get(url), 'Table 7')
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertContains(response, 'Table 7')
+        self.assertIn('Cookie', response['Vary'])
+
+    def test_table_changes_invalidate_cached_pages(self):
+        url = reverse('table-list')
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Table.objects.create(number=8, capacity=2)
+        self.assertContains(self.client.get(url), 'Table 8')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.table.delete()
+        self.assertNotContains(self.client.get(url), 'Table 7')
+
+    def test_logged_in_and_anonymous_never_share_output(self):
+        url = reverse('index')
+        self.assertContains(self.client.get(url), 'Log In')
+        self.client.force_login(User.objects.create_user('guest'))
+        response = self.client.get(url)
+        self.assertContains(response, 'My Bookings')
+        self.assertNotContains(response, 'Log In')
+        self.client.logout()
+        response = self.client.get(url)
+        self.assertContains(response, 'Log In')
+        self.assertNotContains(response, 'My Bookings')
+
+
+class AsyncViewTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        availability.reset_index()
+        self.addCleanup(availability.reset_index)
+        self.user = User.objects.create_user('guest')
+        self.table = Table.objects.create(number=1, capacity=4)
+        today = timezone.localdate()
+        for day in range(3):
+            Booking.objects.create(
+                user=self.user, table=self.table, date=today + timedelta(days=day), time=SEVEN_PM, num_guests=2,
+            )
+
+    def test_availability_matches_the_sync_view(self):
+        params = {'date': FRIDAY.isoformat(), 'party_size': 2}
+        sync = self.client.get(reverse('availability-api'), params)
+        response = self.client.get(reverse('availability-api-async'), params)
+        self.assertEqual(response.json(), sync.json())
+        self.assertEqual(response['ETag'], sync['ETag'])
+        response = self.client.get(reverse('availability-api-async'), params, HTTP_IF_NONE_MATCH=sync['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    async def test_availability_under_the_async_client(self):
+        response = await AsyncClient().get(reverse('availability-api-async'), {'date': 'not-a-date'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_booking_list_matches_the_sync_view(self):
+        self.client.force_login(self.user)
+        sync = self.client.get(reverse('booking-list'))
+        response = self.client.get(reverse('booking-list-async'))
+        self.assertEqual(list(response.context['bookings']), list(sync.context['bookings']))
+        self.assertContains(response, 'Your Upcoming Bookings')
+
+    def test_booking_list_requires_login(self):
+        response = self.client.get(reverse('booking-list-async'))
+        self.assertRedirects(
+            response, f"{reverse('account_login')}?next={reverse('booking-list-async')}",
+            fetch_redirect_response=False,
+        )
+
+    def test_booking_list_rejects_invalid_cursor(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('booking-list-async'), {'after': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class ConnectionPoolTests(TestCase):
+
+    def connect(self):
+        return sqlite3.connect(':memory:', check_same_thread=False)
+
+    def test_reuses_released_connections(self):
+        connections = pool.ConnectionPool(max_size=2)
+        first = connections.acquire(self.connect)
+        connections.release(first)
+        self.assertIs(connections.acquire(self.connect), first)
+        self.assertEqual(connections.stats()['created'], 1)
+        self.assertEqual(connections.stats()['in_use'], 1)
+
+    def test_caps_open_connections(self):
+        connections = pool.ConnectionPool(max_size=1, timeout=0.05)
+        held = connections.acquire(self.connect)
+        with self.assertRaises(pool.PoolExhausted):
+            connections.acquire(self.connect)
+        threading.Timer(0.05, connections.release, [held]).start()
+        connections.timeout = 5
+        self.assertIs(connections.acquire(self.connect), held)
+        self.assertEqual(connections.stats()['waits'], 1)
+
+    def test_replaces_stale_connections(self):
+        connections = pool.ConnectionPool(max_size=1, check_after=0)
+        stale = connections.acquire(self.connect)
+        connections.release(stale)
+        stale.close()
+        fresh = connections.acquire(self.connect)
+        self.assertIsNot(fresh, stale)
+        self.assertEqual(connections.stats()['discarded'], 1)
+
+    def test_discards_broken_connections(self):
+        connections = pool.ConnectionPool(max_size=1)
+        broken = connections.acquire(self.connect)
+        connections.release(broken, broken=True)
+        self.assertEqual(connections.stats()['idle'], 0)
+        self.assertIsNot(connections.acquire(self.connect), broken)
+
+    def test_pooled_backend_returns_connections_to_the_pool(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.addCleanup(pool._pools.pop, 'default', None)
+        handler = ConnectionHandler({
+            'default': database_config(f'sqlite:///{directory}/pooled.sqlite3', pool_size=2),
+        })
+        pooled = handler['default']
+        for _ in range(3):
+            with pooled.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            pooled.close()
+        stats = pool.pool_stats()['default']
+        self.assertEqual((stats['created'], stats['checkouts'], stats['idle']), (1, 3, 1))
+        response = self.client.get(reverse('index'))
+        self.assertIn('pool-default;', response['Server-Timing'])
+        pooled.pool.close_all()
+
+    def test_database_config(self):
+        config = database_config('postgres://u:p@localhost/pizza', conn_max_age=60)
+        self.assertEqual(config['CONN_MAX_AGE'], 60)
+        self.assertNotIn('POOL', config)
+        config = database_config('postgres://u:p@localhost/pizza', conn_max_age=60, pool_size=5)
+        self.assertEqual(config['ENGINE'], 'website.db.backends.postgresql')
+        self.assertEqual(config['CONN_MAX_AGE'], 0)
+        self.assertEqual(config['POOL']['MAX_SIZE'], 5)
+        with self.assertRaises(ValueError):
+            database_config('mysql://u:p@localhost/pizza', pool_size=5)
+
+
+class SQLiteProfileTests(TestCase):
+    """
+    Runs against a file database of its own with the SQLite production
+    profile, outside the test's transaction.
+    """
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'profiled.sqlite3')
+        connections.settings['profiled'] = {
+            **database_config(f'sqlite:///{self.path}', sqlite=settings.SQLITE_PROFILE),
+            'TEST': {'NAME': self.path},
+        }
+        connections.ensure_defaults('profiled')
+        connections.prepare_test_settings('profiled')
+        self.addCleanup(connections.settings.pop, 'profiled')
+        self.addCleanup(connections.__delitem__, 'profiled')
+        self.addCleanup(connections['profiled'].close)
+        self.profiled = connections['profiled']
+        with self.profiled.cursor() as cursor:
+            cursor.execute('CREATE TABLE slot (id INTEGER PRIMARY KEY)')
+
+    def locked_for_others(self):
+        """
+        Returns whether another connection is kept from writing.
+        """
+        other = sqlite3.connect(self.path, timeout=0, isolation_level=None)
+        try:
+            other.execute('BEGIN IMMEDIATE')
+            other.execute('ROLLBACK')
+        except sqlite3.OperationalError:
+            return True
+        finally:
+            other.close()
+        return False
+
+    def test_database_config_applies_profile_to_sqlite_only(self):
+        config = database_config('sqlite:////tmp/pizza.sqlite3', sqlite=settings.SQLITE_PROFILE)
+        self.assertEqual(config['ENGINE'], 'website.db.backends.sqlite3')
+        self.assertEqual(config['OPTIONS']['timeout'], settings.SQLITE_PROFILE['busy_timeout'])
+        self.assertEqual(config['PRAGMAS']['journal_mode'], 'WAL')
+        self.assertNotIn('POOL', config)
+        config = database_config('postgres://u:p@localhost/pizza', sqlite=settings.SQLITE_PROFILE)
+        self.assertEqual(config['ENGINE'], 'django.db.backends.postgresql_psycopg2')
+        self.assertNotIn('PRAGMAS', config)
+
+    def test_new_connections_apply_the_pragmas(self):
+        with self.profiled.cursor() as cursor:
+            self.assertEqual(cursor.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+            self.assertEqual(cursor.execute('PRAGMA synchronous').fetchone()[0], 1)
+            self.assertEqual(cursor.execute('PRAGMA cache_size').fetchone()[0], -64000)
+
+    def test_write_transaction_takes_the_write_lock_up_front(self):
+        with transaction.atomic(using='profiled'):
+            self.profiled.cursor().execute('SELECT COUNT(*) FROM slot')
+            self.assertFalse(self.locked_for_others())
+        with write_transaction(using='profiled'):
+            self.assertTrue(self.locked_for_others())
+            with write_transaction(using='profiled'):
+                self.profiled.cursor().execute('INSERT INTO slot DEFAULT VALUES')
+        self.assertFalse(self.locked_for_others())
+        self.assertFalse(self.profiled.begin_immediate)
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Runs against a second SQLite database standing in for a replica,
+    which only sees the primary's rows when replicate() copies them, so
+    replication lag can be simulated.
+    """
+
+    replicated_models = (User, Session, Table, Booking)
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        connections.settings['replica'] = {
+            **settings.DATABASES['default'],
+            'NAME': os.path.join(directory, 'replica.sqlite3'),
+            'TEST': {'MIRROR': None},
+        }
+        connections.ensure_defaults('replica')
+        connections.prepare_test_settings('replica')
+        self.addCleanup(connections.settings.pop, 'replica')
+        self.addCleanup(connections.__delitem__, 'replica')
+        self.addCleanup(connections['replica'].close)
+        with override_settings(DATABASE_ROUTERS=[]):
+            call_command('migrate', database='replica', verbosity=0)
+        replicas = override_settings(DATABASE_REPLICAS=['replica'])
+        replicas.enable()
+        self.addCleanup(replicas.disable)
+        availability.reset_index()
+        self.addCleanup(availability.reset_index)
+        cache.clear()
+
+        self.user = User.objects.create_user('guest')
+        self.table = Table.objects.create(number=1, capacity=4)
+        self.client.force_login(self.user)
+        self.replicate()
+
+    def replicate(self):
+        for model in reversed(self.replicated_models):
+            model.objects.using('replica').all().delete()
+        for model in self.replicated_models:
+            model.objects.using('replica').bulk_create(model.objects.using('default').all())
+
+    def book(self, day):
+        return self.client.post(reverse('booking-create'), {
+            'table': self.table.pk, 'date': day, 'time': '7:00 PM', 'num_guests': 2,
+        })
+
+    def shown(self):
+        return len(self.client.get(reverse('booking-list')).context['bookings'])
+
+    def test_reads_go_to_the_replica(self):
+        Booking.objects.create(user=self.user, table=self.table, date=date(2099, 1, 1), time=SEVEN_PM, num_guests=2)
+        self.assertEqual(self.shown(), 0)
+        self.replicate()
+        self.assertEqual(self.shown(), 1)
+
+    def test_reads_stick_to_the_primary_after_a_booking(self):
+        response = self.book(date(2099, 1, 1))
+        self.assertRedirects(response, reverse('booking-list'), fetch_redirect_response=False)
+        self.assertFalse(Booking.objects.using('replica').exists())
+        self.assertEqual(self.shown(), 1)
+
+    @override_settings(READ_YOUR_WRITES_SECONDS=0)
+    def test_reads_return_to_the_replica_after_the_window(self):
+        self.book(date(2099, 1, 1))
+        self.assertEqual(self.shown(), 0)
+
+    def test_writes_and_transactions_use_the_primary(self):
+        router = routers.PrimaryReplicaRouter()
+        self.assertEqual(router.db_for_write(Booking), 'default')
+        self.assertEqual(router.db_for_read(Booking), 'replica')
+        with transaction.atomic():
+            self.assertEqual(router.db_for_read(Booking), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'website'))
+
+
+def failing_handler(event):
+    raise RuntimeError("Mail server is down")
+
+
+handled_events = []
+
+
+def recording_handler(event):
+    handled_events.append(event.pk)
+
+
+class OutboxTests(TestCase):
+
+    def setUp(self):
+        availability.reset_index()
+        self.addCleanup(availability.reset_index)
+        self.user = User.objects.create_user('guest', email='guest@example.com')
+        self.table = Table.objects.create(number=1, capacity=4)
+        self.client.force_login(self.user)
+
+    def book(self):
+        return self.client.post(reverse('booking-create'), {
+            'table': self.table.pk, 'date': FRIDAY, 'time': '7:00 PM', 'num_guests': 2,
+        })
+
+    def test_booking_and_event_commit_together(self):
+        self.book()
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.topic, 'booking.created')
+        self.assertEqual(event.payload['booking'], Booking.objects.get().pk)
+        self.assertEqual(len(mail.outbox), 0)
+
+        # A lost claim rolls its event back with it.
+        availability.reset_index()
+        availability.load_dates(FRIDAY)
+        Booking.objects.bulk_create([Booking(user=self.user, table=self.table, date=FRIDAY, time=time(20, 0), num_guests=2)])
+        response = self.client.post(reverse('booking-create'), {
+            'table': self.table.pk, 'date': FRIDAY, 'time': '8:00 PM', 'num_guests': 2,
+        })
+        self.assertContains(response, 'already booked')
+        self.assertEqual(OutboxEvent.objects.count(), 1)
+
+    def test_worker_sends_confirmation_and_calendar_invite(self):
+        self.book()
+        call_command('process_outbox', once=True, stdout=StringIO())
+        self.assertEqual(OutboxEvent.objects.get().status, OutboxEvent.DONE)
+        self.assertEqual([message.to for message in mail.outbox], [['guest@example.com']] * 2)
+        self.assertIn('Table 1 for 2', mail.outbox[0].body)
+        name, invite, mimetype = mail.outbox[1].attachments[0]
+        self.assertEqual(mimetype, 'text/calendar')
+        self.assertIn('METHOD:REQUEST', invite)
+
+    def test_cancellation_publishes_an_event(self):
+        self.book()
+        self.client.post(reverse('booking-delete', args=[Booking.objects.get().pk]))
+        self.assertEqual(
+            list(OutboxEvent.objects.values_list('topic', flat=True)), ['booking.created', 'booking.cancelled'],
+        )
+
+    @override_settings(
+        OUTBOX_HANDLERS={'booking.created': ['website.tests.failing_handler']},
+        OUTBOX_MAX_ATTEMPTS=2, OUTBOX_RETRY_DELAY=30,
+    )
+    def test_failed_events_are_retried_with_backoff(self):
+        self.book()
+        with self.assertLogs('website.outbox', 'ERROR'):
+            self.assertEqual(outbox.process_batch(), (0, 1))
+        event = OutboxEvent.objects.get()
+        self.assertEqual((event.status, event.attempts), (OutboxEvent.PENDING, 1))
+        self.assertIn('Mail server is down', event.last_error)
+        self.assertGreater(event.available_at, timezone.now() + timedelta(seconds=25))
+        self.assertEqual(outbox.process_batch(), (0, 0))
+
+        OutboxEvent.objects.update(available_at=timezone.now())
+        with self.assertLogs('website.outbox', 'ERROR'):
+            outbox.process_batch()
+        self.assertEqual(OutboxEvent.objects.get().status, OutboxEvent.FAILED)
+
+    @override_settings(OUTBOX_HANDLERS={
+        'booking.created': ['website.tests.recording_handler', 'website.tests.failing_handler'],
+    })
+    def test_retries_skip_handlers_that_succeeded(self):
+        self.addCleanup(handled_events.clear)
+        self.book()
+        for attempt in range(2):
+            OutboxEvent.objects.update(available_at=timezone.now())
+            with self.assertLogs('website.outbox', 'ERROR'):
+                self.assertEqual(outbox.process_batch(), (0, 1))
+        event = OutboxEvent.objects.get()
+        self.assertEqual(handled_events, [event.pk])
+        self.assertEqual(event.completed_handlers, ['website.tests.recording_handler'])
+
+    def test_claimed_events_are_leased(self):
+        self.book()
+        self.assertEqual(len(outbox.claim_batch(10)), 1)
+        self.assertEqual(outbox.claim_batch(10), [])
+        self.assertEqual(outbox.retry_delay(3), timedelta(seconds=120))
+
+
+class BookingImportExportTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('regular')
+        self.table = Table.objects.create(number=7, capacity=4)
+        Booking.objects.bulk_create(
+            Booking(user=self.user, table=self.table, date=FRIDAY + timedelta(days=day), time=SEVEN_PM, num_guests=2)
+            for day in range(25)
+        )
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def path(self, name):
+        return os.path.join(self.dir, name)
+
+    def export(self, name, **options):
+        call_command('export_bookings', self.path(name), chunk_size=10, stderr=StringIO(), **options)
+        return self.path(name)
+
+    def load(self, name, **options):
+        call_command('import_bookings', self.path(name), batch_size=10, stdout=StringIO(), stderr=StringIO(), **options)
+
+    def snapshot(self):
+        return sorted(Booking.objects.values_list('user__username', 'table__number', 'date', 'time', 'num_guests', 'created_at'))
+
+    def test_round_trip(self):
+        for name in ('bookings.csv', 'bookings.jsonl'):
+            with self.subTest(name=name):
+                before = self.snapshot()
+                self.export(name)
+                Booking.objects.all().delete()
+                self.load(name)
+                self.assertEqual(self.snapshot(), before)
+
+    def test_export_resumes_from_checkpoint(self):
+        checkpoint = self.path('export.json')
+        with open(checkpoint, 'w') as f:
+            json.dump({'last_id': Booking.objects.order_by('pk')[9].pk, 'rows': 10}, f)
+        with open(self.path('bookings.csv'), 'w') as f:
+            f.write('header\n' + 'row\n' * 10)
+        self.export('bookings.csv', checkpoint=checkpoint)
+        with open(self.path('bookings.csv')) as f:
+            self.assertEqual(len(f.readlines()), 1 + 25)
+        with open(checkpoint) as f:
+            self.assertEqual(json.load(f)['rows'], 25)
+
+    def test_import_resumes_from_checkpoint(self):
+        self.export('bookings.jsonl')
+        Booking.objects.all().delete()
+        checkpoint = self.path('import.json')
+        with open(checkpoint, 'w') as f:
+            json.dump({'rows': 20}, f)
+        self.load('bookings.jsonl', checkpoint=checkpoint)
+        self.assertEqual(Booking.objects.count(), 5)
+
+    def test_import_resolves_names_without_a_query_per_row(self):
+        self.export('bookings.csv')
+        Booking.objects.all().delete()
+        with CaptureQueriesContext(connection) as queries:
+            self.load('bookings.csv')
+        statements = [q['sql'].split()[0] for q in queries if 'SAVEPOINT' not in q['sql']]
+        # Users, tables, three batches of inserts, then the occupancy
+        # summary rebuild.
+        self.assertEqual(statements[:5], ['SELECT', 'SELECT', 'INSERT', 'INSERT', 'INSERT'])
+        self.assertEqual(len(statements), 5 + 3)
+
+    def test_round_trip_keeps_parties_on_several_tables(self):
+        other = Table.objects.create(number=8, capacity=4)
+        party = Booking.objects.order_by('pk').first()
+        Booking.objects.create(
+            user=self.user, table=other, date=party.date, time=party.time, num_guests=0, combined_with=party,
+        )
+        self.export('bookings.csv')
+        Booking.objects.all().delete()
+        self.load('bookings.csv')
+        extra = Booking.objects.get(table=other)
+        self.assertEqual(extra.num_guests, 0)
+        self.assertEqual((extra.combined_with.table, extra.combined_with.date), (self.table, party.date))
+        self.assertEqual(Booking.objects.filter(combined_with__isnull=True).count(), 25)
+
+    def test_duplicate_table_numbers_stop_the_import(self):
+        self.export('bookings.csv')
+        Table.objects.create(number=7, capacity=2)
+        with self.assertRaisesMessage(CommandError, 'Tables 7 are numbered more than once'):
+            self.load('bookings.csv')
+
+    def test_unknown_table_stops_unless_skipped(self):
+        with open(self.path('bad.csv'), 'w') as f:
+            f.write('user,table,date,time,num_guests\nregular,99,2030-03-01,19:00:00,2\n')
+        with self.assertRaises(CommandError):
+            self.load('bad.csv')
+        self.load('bad.csv', skip_invalid=True)
+
+
+class OccupancySummaryTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('guest')
+        self.two = Table.objects.create(number=1, capacity=2)
+        self.six = Table.objects.create(number=2, capacity=6)
+
+    def summary(self, when=FRIDAY, at=SEVEN_PM):
+        row = SlotOccupancy.objects.filter(date=when, time=at).first()
+        return row and (row.booked_tables, row.booked_covers, row.booked_seats)
+
+    def test_follows_creates_changes_and_deletes(self):
+        first = Booking.objects.create(user=self.user, table=self.two, date=FRIDAY, time=SEVEN_PM, num_guests=2)
+        second = Booking.objects.create(user=self.user, table=self.six, date=FRIDAY, time=SEVEN_PM, num_guests=5)
+        self.assertEqual(self.summary(), (2, 7, 8))
+
+        second.num_guests = 6
+        second.save()
+        self.assertEqual(self.summary(), (2, 8, 8))
+
+        first.time = time(20, 0)
+        first.save()
+        self.assertEqual(self.summary(), (1, 6, 6))
+        self.assertEqual(self.summary(at=time(20, 0)), (1, 2, 2))
+
+        Booking.objects.get(pk=second.pk).delete()
+        self.assertEqual(self.summary(), (0, 0, 0))
+        self.assertEqual(occupancy.check(), [])
+
+    def test_table_deletion_cascades_into_summary(self):
+        Booking.objects.create(user=self.user, table=self.six, date=FRIDAY, time=SEVEN_PM, num_guests=5)
+        self.six.delete()
+        self.assertEqual(self.summary(), (0, 0, 0))
+
+    def test_capacity_edits_reach_the_summary(self):
+        first = Booking.objects.create(user=self.user, table=self.six, date=FRIDAY, time=SEVEN_PM, num_guests=5)
+        Booking.objects.create(user=self.user, table=self.two, date=FRIDAY, time=SEVEN_PM, num_guests=2)
+        Booking.objects.create(user=self.user, table=self.six, date=FRIDAY + timedelta(days=1), time=SEVEN_PM, num_guests=4)
+        self.six.capacity = 8
+        self.six.save()
+        self.assertEqual(occupancy.check(), [])
+        self.assertEqual(self.summary(), (2, 7, 10))
+        # Later changes take the new capacity off again.
+        Booking.objects.get(pk=first.pk).delete()
+        self.assertEqual(self.summary(), (1, 2, 2))
+        self.assertEqual(occupancy.check(), [])
+
+    def test_check_finds_drift_and_rebuild_repairs_it(self):
+        Booking.objects.bulk_create([
+            Booking(user=self.user, table=self.six, date=FRIDAY, time=SEVEN_PM, num_guests=4),
+        ])
+        self.assertEqual(occupancy.check(), [(FRIDAY, SEVEN_PM, None, (1, 4, 6))])
+        with self.assertRaises(CommandError):
+            call_command('check_occupancy', stdout=StringIO())
+        call_command('rebuild_occupancy', since='2030-03-01', until='2030-03-01', stdout=StringIO())
+        self.assertEqual(occupancy.check(), [])
+        self.assertEqual(self.summary(), (1, 4, 6))
+
+    def test_range_reports_remaining_capacity(self):
+        Booking.objects.create(user=self.user, table=self.six, date=FRIDAY, time=SEVEN_PM, num_guests=5)
+        with self.assertNumQueries(2):
+            rows = list(occupancy.for_range(FRIDAY, date(2030, 3, 31)))
+        self.assertEqual([row.remaining_capacity for row in rows], [2])
+
+
+class BookingAdminTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('staff', 'staff@example.com', 'pizza-pass-1')
+        self.client.force_login(self.admin)
+        self.tables = [Table.objects.create(number=n, capacity=4) for n in range(1, 4)]
+        self.url = reverse('admin:website_booking_changelist')
+
+    def book(self, count, table=None, start=FRIDAY):
+        users = User.objects.bulk_create(User(username=f'guest-{start}-{n}') for n in range(count))
+        users = User.objects.filter(username__startswith=f'guest-{start}-')
+        Booking.objects.bulk_create(
+            Booking(user=user, table=table or self.tables[0], date=start + timedelta(days=n), time=SEVEN_PM, num_guests=2)
+            for n, user in enumerate(users)
+        )
+        occupancy.rebuild()
+
+    def count_queries(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return queries
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        self.book(5)
+        self.count_queries()
+        few = len(self.count_queries())
+        self.book(60, start=date(2031, 1, 1))
+        self.assertEqual(len(self.count_queries()), few)
+
+    def test_changelist_never_counts_the_whole_table(self):
+        self.book(5)
+        for query in self.count_queries():
+            if 'COUNT(' in query['sql'] and 'website_booking' in query['sql']:
+                self.assertIn('LIMIT', query['sql'])
+
+    def test_change_form_does_not_list_every_user(self):
+        self.book(30)
+        booking = Booking.objects.first()
+        response = self.client.get(reverse('admin:website_booking_change', args=[booking.pk]))
+        self.assertNotContains(response, 'guest-2030-03-01-29')
+
+    def test_date_hierarchy_drills_into_a_day(self):
+        self.book(3)
+        response = self.client.get(self.url, {'date__year': 2030, 'date__month': 3, 'date__day': 2})
+        self.assertEqual(len(response.context['cl'].result_list), 1)
+
+    def test_move_to_table_is_one_update(self):
+        self.book(3)
+        ids = list(Booking.objects.values_list('pk', flat=True))
+        data = {'action': 'move_to_table', '_selected_action': ids, 'apply': 'Move', 'table': self.tables[1].pk}
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(self.url, data)
+        updates = [q for q in queries if q['sql'].startswith('UPDATE "website_booking"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(set(Booking.objects.values_list('table', flat=True)), {self.tables[1].pk})
+        self.assertEqual(occupancy.check(), [])
+
+    def test_move_to_table_publishes_updates(self):
+        self.book(2)
+        ids = list(Booking.objects.values_list('pk', flat=True))
+        data = {'action': 'move_to_table', '_selected_action': ids, 'apply': 'Move', 'table': self.tables[1].pk}
+        self.client.post(self.url, data)
+        events = OutboxEvent.objects.filter(topic='booking.updated')
+        self.assertEqual(sorted(event.payload['booking'] for event in events), sorted(ids))
+        self.assertEqual({event.payload['table'] for event in events}, {self.tables[1].pk})
+
+    def test_move_to_table_refuses_taken_slots(self):
+        self.book(2)
+        clash = Booking.objects.create(user=self.admin, table=self.tables[1], date=FRIDAY, time=SEVEN_PM, num_guests=2)
+        ids = list(Booking.objects.exclude(pk=clash.pk).values_list('pk', flat=True))
+        data = {'action': 'move_to_table', '_selected_action': ids, 'apply': 'Move', 'table': self.tables[1].pk}
+        self.client.post(self.url, data)
+        self.assertEqual(Booking.objects.filter(table=self.tables[1]).count(), 1)
+
+    def move(self, ids, table):
+        data = {'action': 'move_to_table', '_selected_action': ids, 'apply': 'Move', 'table': table.pk}
+        return self.client.post(self.url, data, follow=True)
+
+    def test_move_to_table_refuses_tables_too_small(self):
+        self.book(2)
+        Booking.objects.filter(date=FRIDAY).update(num_guests=6)
+        small = Table.objects.create(number=9, capacity=4)
+        response = self.move(list(Booking.objects.values_list('pk', flat=True)), small)
+        self.assertContains(response, 'only seats 4')
+        self.assertFalse(Booking.objects.filter(table=small).exists())
+
+    def test_move_to_table_refuses_parties_on_several_tables(self):
+        self.book(1)
+        party = Booking.objects.get()
+        Booking.objects.create(
+            user=party.user, table=self.tables[1], date=party.date, time=party.time,
+            num_guests=0, combined_with=party,
+        )
+        response = self.move([party.pk], self.tables[2])
+        self.assertContains(response, 'hold more than one table')
+        self.assertFalse(Booking.objects.filter(table=self.tables[2]).exists())
+
+    def test_move_to_table_reports_a_concurrent_booking(self):
+        self.book(1)
+        ids = list(Booking.objects.values_list('pk', flat=True))
+        with mock.patch('django.db.models.query.QuerySet.update', side_effect=IntegrityError):
+            response = self.move(ids, self.tables[1])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'has just been booked')
+        self.assertFalse(OutboxEvent.objects.filter(topic='booking.updated').exists())
+
+    def test_move_to_table_asks_for_the_table_first(self):
+        self.book(1)
+        response = self.client.post(self.url, {
+            'action': 'move_to_table', '_selected_action': list(Booking.objects.values_list('pk', flat=True)),
+        })
+        self.assertContains(response, 'Move these bookings to')
+
+    def test_cancel_is_one_delete_including_extra_tables(self):
+        self.book(3)
+        party = Booking.objects.first()
+        Booking.objects.create(
+            user=party.user, table=self.tables[1], date=party.date, time=party.time,
+            num_guests=0, combined_with=party,
+        )
+        data = {'action': 'cancel_bookings', '_selected_action': [party.pk]}
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(self.url, data)
+        deletes = [q for q in queries if q['sql'].startswith('DELETE FROM "website_booking"')]
+        self.assertEqual(len(deletes), 1)
+        self.assertEqual(Booking.objects.count(), 2)
+        self.assertEqual(occupancy.check(), [])
+        # One event for the party, with its details, and none for its
+        # extra table.
+        event = OutboxEvent.objects.get(topic='booking.cancelled')
+        self.assertEqual(event.payload['booking'], party.pk)
+        self.assertEqual(event.payload['table'], self.tables[0].pk)
+
+
+    def test_cancel_reads_the_bookings_in_its_write_transaction(self):
+        self.book(2)
+        entered = []
+
+        def recording_transaction(using=None):
+            entered.append(len(queries))
+            return write_transaction(using)
+
+        data = {'action': 'cancel_bookings', '_selected_action': [Booking.objects.first().pk]}
+        with CaptureQueriesContext(connection) as queries, mock.patch(
+            'website.admin.write_transaction', recording_transaction,
+        ):
+            self.client.post(self.url, data)
+        self.assertEqual(len(entered), 1)
+        # The admin counts the changelist first; the selected bookings
+        # are only read once the write lock is held.
+        selected = [n for n, q in enumerate(queries) if '"website_booking"."id" IN (' in q['sql']]
+        self.assertGreaterEqual(selected[0], entered[0])
+        self.assertEqual(Booking.objects.count(), 1)
+
+class OccupancyCalendarTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        availability.reset_index()
+        self.staff = User.objects.create_user('staff', is_staff=True)
+        self.client.force_login(self.staff)
+        self.table = Table.objects.create(number=1, capacity=4)
+        Table.objects.create(number=2, capacity=4)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.booking = Booking.objects.create(
+                user=self.staff, table=self.table, date=FRIDAY, time=SEVEN_PM, num_guests=3,
+            )
+        self.url = reverse('occupancy-calendar-month', args=[FRIDAY.year, FRIDAY.month])
+
+    def grid_queries(self, **headers):
+        """
+        Returns the response and the number of queries that read the
+        bookings or their summary.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, **headers)
+        return response, len([q for q in queries if 'website_' in q['sql']])
+
+    def test_month_is_read_in_one_query(self):
+        caching.get_tables()
+        response, count = self.grid_queries()
+        self.assertEqual(count, 1)
+        self.assertContains(response, 'Occupancy for March 2030')
+        self.assertContains(response, '50%')
+        self.assertContains(response, '1 table, 3 guests')
+
+    def test_cached_fragment_needs_no_query(self):
+        self.client.get(self.url)
+        response, count = self.grid_queries()
+        self.assertEqual(count, 0)
+        self.assertContains(response, '1 table, 3 guests')
+
+    def test_matching_etag_gets_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response, count = self.grid_queries(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(count, 0)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_booking_changes_invalidate_the_month(self):
+        etag = self.client.get(self.url)['ETag']
+        other = self.client.get(reverse('occupancy-calendar-month', args=[2030, 4]))['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.booking.num_guests = 4
+            self.booking.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '1 table, 4 guests')
+        response = self.client.get(reverse('occupancy-calendar-month', args=[2030, 4]), HTTP_IF_NONE_MATCH=other)
+        self.assertEqual(response.status_code, 304)
+
+    def test_links_to_neighbouring_months(self):
+        response = self.client.get(reverse('occupancy-calendar-month', args=[2030, 1]))
+        self.assertContains(response, reverse('occupancy-calendar-month', args=[2029, 12]))
+        self.assertContains(response, reverse('occupancy-calendar-month', args=[2030, 2]))
+        self.assertEqual(self.client.get(reverse('occupancy-calendar-month', args=[2030, 13])).status_code, 404)
+
+    def test_staff_only(self):
+        self.client.force_login(User.objects.create_user('guest'))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.client.logout()
+        self.assertRedirects(self.client.get(self.url), f"{reverse('account_login')}?next={self.url}", fetch_redirect_response=False)
+
+
+class ArchiveTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('guest')
+        self.tables = [Table.objects.create(number=n, capacity=4) for n in range(1, 4)]
+        self.old = timezone.localdate() - timedelta(days=800)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.party = Booking(user=self.user, table=self.tables[0], date=self.old, time=SEVEN_PM, num_guests=7)
+            self.party.claim(extra_tables=[self.tables[1].pk])
+            Booking.objects.create(
+                user=self.user, table=self.tables[2], date=self.old + timedelta(days=1), time=time(12, 0), num_guests=2,
+            )
+            self.live = Booking.objects.create(user=self.user, table=self.tables[0], date=FRIDAY, time=SEVEN_PM, num_guests=2)
+        self.events = OutboxEvent.objects.count()
+
+    def archive(self, **options):
+        call_command('archive_bookings', stdout=StringIO(), **options)
+
+    def test_moves_old_bookings_in_batches_of_days(self):
+        self.archive(batch_size=1)
+        self.assertEqual(list(Booking.objects.all()), [self.live])
+        self.assertEqual(ArchivedBooking.objects.count(), 3)
+        extra = ArchivedBooking.objects.get(combined_with=self.party.pk)
+        self.assertEqual((extra.table_number, extra.seats, extra.date), (2, 4, self.old))
+        self.assertEqual(ArchivedBooking.objects.get(pk=self.party.pk).num_guests, 7)
+
+    def test_archiving_is_not_cancelling(self):
+        self.archive()
+        self.assertEqual(OutboxEvent.objects.count(), self.events)
+        self.assertEqual(occupancy.summary_rows(self.old, self.old).get(time=SEVEN_PM).booked_tables, 2)
+        self.assertEqual(occupancy.check(), [])
+        occupancy.rebuild()
+        self.assertEqual(occupancy.summary_rows(self.old, self.old + timedelta(days=1)).count(), 2)
+
+    def test_rerun_carries_on(self):
+        self.assertEqual(archive.archive_batch(archive.horizon(), size=1), 2)
+        self.assertEqual(archive.archive_batch(archive.horizon(), size=5), 1)
+        self.assertEqual(archive.archive_batch(archive.horizon(), size=5), 0)
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_nothing_inside_the_horizon_moves(self):
+        self.archive(days=1000)
+        self.assertEqual(Booking.objects.count(), 4)
+        self.assertFalse(ArchivedBooking.objects.exists())
+
+    def test_history_lists_own_archived_parties(self):
+        self.archive()
+        other = User.objects.create_user('other')
+        ArchivedBooking.objects.create(
+            id=999, user=other, table_number=9, seats=2, date=self.old, time=SEVEN_PM,
+            num_guests=2, created_at=timezone.now(),
+        )
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('booking-history'))
+        self.assertEqual([booking.pk for booking in response.context['bookings']], [self.party.pk + 2, self.party.pk])
+        self.assertContains(response, 'Table 1')
+        self.assertNotContains(response, 'Table 9')
+        past = self.client.get(reverse('booking-list'), {'when': 'past'})
+        self.assertFalse(past.context['bookings'])
+
+
+class SeriesBookingTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        availability.reset_index()
+        self.addCleanup(availability.reset_index)
+        self.user = User.objects.create_user('client')
+        self.table = Table.objects.create(number=1, capacity=8)
+        self.fridays = series.occurrences(FRIDAY, 'weekly', count=13)
+
+    def test_occurrences(self):
+        self.assertEqual(len(self.fridays), 13)
+        self.assertEqual({day.weekday() for day in self.fridays}, {FRIDAY.weekday()})
+        self.assertEqual(series.occurrences(FRIDAY, 'fortnightly', until=date(2030, 3, 29)), [FRIDAY, date(2030, 3, 15), date(2030, 3, 29)])
+        with self.assertRaises(ValueError):
+            series.occurrences(FRIDAY, 'daily', count=series.MAX_OCCURRENCES + 1)
+
+    def test_series_is_booked_in_constant_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            series.create_series(self.user, self.table, SEVEN_PM, 6, self.fridays[:3])
+        few = len(queries)
+        with self.assertNumQueries(few):
+            series.create_series(self.user, self.table, SEVEN_PM, 6, self.fridays[3:])
+        self.assertEqual(Booking.objects.count(), 13)
+
+    def test_side_effects_match_single_bookings(self):
+        availability.load_dates(FRIDAY, self.fridays[-1])
+        with self.captureOnCommitCallbacks(execute=True):
+            bookings = series.create_series(self.user, self.table, SEVEN_PM, 6, self.fridays)
+        self.assertEqual(occupancy.check(), [])
+        self.assertEqual(
+            sorted(event.payload['booking'] for event in OutboxEvent.objects.filter(topic='booking.created')),
+            [booking.pk for booking in bookings],
+        )
+        self.assertFalse(availability.is_free(self.table.pk, self.fridays[5], SEVEN_PM))
+
+    def test_conflicts_book_nothing_and_list_the_dates(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for day in (self.fridays[2], self.fridays[7]):
+                Booking.objects.create(user=self.user, table=self.table, date=day, time=SEVEN_PM, num_guests=2)
+        events = OutboxEvent.objects.count()
+        with self.assertRaises(series.SeriesConflict) as raised:
+            series.create_series(self.user, self.table, SEVEN_PM, 6, self.fridays)
+        self.assertEqual(raised.exception.dates, [self.fridays[2], self.fridays[7]])
+        self.assertEqual(Booking.objects.count(), 2)
+        self.assertEqual(OutboxEvent.objects.count(), events)
+        self.assertEqual(occupancy.check(), [])
+
+    def test_view_books_series_or_reports_conflicts(self):
+        self.client.force_login(self.user)
+        data = {
+            'table': self.table.pk, 'start': FRIDAY.isoformat(), 'time': '7:00 PM',
+            'num_guests': 6, 'frequency': 'weekly', 'occurrences': 13,
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('booking-series'), data)
+        self.assertRedirects(response, reverse('booking-list'), fetch_redirect_response=False)
+        self.assertEqual(Booking.objects.filter(user=self.user).count(), 13)
+        response = self.client.post(reverse('booking-series'), {**data, 'occurrences': 2})
+        self.assertContains(response, f'on {FRIDAY}, {self.fridays[1]}.')
+        response = self.client.post(reverse('booking-series'), {**data, 'num_guests': 9})
+        self.assertContains(response, 'only seats 8')
+
+    def test_invalid_frequency_is_a_form_error(self):
+        form = SeriesBookingForm(data={
+            'table': self.table.pk, 'start': FRIDAY.isoformat(), 'time': '7:00 PM',
+            'num_guests': 6, 'frequency': 'hourly', 'occurrences': 13,
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn('frequency', form.errors)
+        self.assertNotIn('dates', form.cleaned_data)
+
+
+@skipUnless(analytics, "NumPy is not installed.")
+class AnalyticsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('guest')
+        self.tables = [Table.objects.create(number=n, capacity=4) for n in (1, 2)]
+        self.tables[0].adjoining.add(self.tables[1])
+        self.next_friday = FRIDAY + timedelta(days=7)
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.create(user=self.user, table=self.tables[0], date=FRIDAY, time=SEVEN_PM, num_guests=2)
+            Booking.objects.create(user=self.user, table=self.tables[0], date=self.next_friday, time=SEVEN_PM, num_guests=4)
+            Booking(user=self.user, table=self.tables[0], date=FRIDAY + timedelta(days=1), time=time(12, 0), num_guests=7).claim(
+                extra_tables=[self.tables[1].pk],
+            )
+        Booking.objects.filter(date=FRIDAY).update(
+            created_at=timezone.make_aware(datetime.combine(FRIDAY - timedelta(days=3), SEVEN_PM)),
+        )
+        ArchivedBooking.objects.create(
+            id=999, user=self.user, table_number=2, seats=4, date=FRIDAY - timedelta(days=7), time=SEVEN_PM,
+            num_guests=3, created_at=timezone.make_aware(datetime(2030, 1, 1)),
+        )
+
+    def test_utilization_by_weekday_slot_and_table(self):
+        columns = analytics.load(FRIDAY, FRIDAY + timedelta(days=13))
+        self.assertEqual(len(columns), 4)
+        numbers, bookings, share = analytics.utilization(columns)
+        self.assertEqual(list(numbers), [1, 2])
+        friday, saturday = FRIDAY.weekday(), FRIDAY.weekday() + 1
+        seven, noon = SLOT_TIMES.index(SEVEN_PM), SLOT_TIMES.index(time(12, 0))
+        self.assertEqual(bookings[friday, seven].tolist(), [2, 0])
+        self.assertEqual(bookings[saturday, noon].tolist(), [1, 1])
+        self.assertEqual(share[friday, seven, 0], 1.0)
+        self.assertEqual(share[saturday, noon, 1], 0.5)
+        self.assertEqual(bookings.sum(), 4)
+
+    def test_filters_and_archive(self):
+        self.assertEqual(len(analytics.load()), 5)
+        self.assertEqual(len(analytics.load(archived=False)), 4)
+        self.assertEqual(len(analytics.load(tables=[2])), 2)
+        self.assertEqual(len(analytics.load(end=FRIDAY)), 2)
+
+    def test_lead_times_and_party_sizes(self):
+        columns = analytics.load(FRIDAY, FRIDAY)
+        self.assertEqual(analytics.lead_times(columns)['buckets']['2-3 days'], 1)
+        self.assertEqual(analytics.lead_times(columns)['percentiles']['p50'], 3.0)
+        self.assertEqual(analytics.party_sizes(analytics.load()), {2: 1, 3: 1, 4: 1, 7: 1})
+
+    @override_settings(TIME_ZONE='Europe/London')
+    def test_lead_times_follow_daylight_saving_time(self):
+        winter, summer = date(2031, 1, 10), date(2031, 7, 11)
+        for day in (winter, summer):
+            booking = Booking.objects.create(user=self.user, table=self.tables[1], date=day, time=SEVEN_PM, num_guests=2)
+            # Made exactly two days ahead, local time.
+            made = timezone.make_aware(datetime.combine(day - timedelta(days=2), SEVEN_PM))
+            Booking.objects.filter(pk=booking.pk).update(created_at=made)
+        columns = analytics.load(winter, summer)
+        self.assertEqual(analytics.lead_times(columns)['percentiles'], {'p50': 2.0, 'p90': 2.0, 'p99': 2.0})
+
+    def test_report_command_writes_json_and_csv(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        call_command('analytics_report', directory, since=str(FRIDAY), until=str(self.next_friday), stdout=StringIO())
+        with open(os.path.join(directory, 'report.json')) as report:
+            report = json.load(report)
+        self.assertEqual((report['start'], report['bookings'], report['parties']), (str(FRIDAY), 4, 3))
+        with open(os.path.join(directory, 'utilization.csv')) as rows:
+            rows = list(csv.DictReader(rows))
+        self.assertEqual(len(rows), 7 * len(SLOT_TIMES) * 2)
+        self.assertIn(
+            {'weekday': 'Friday', 'slot': '7:00 PM', 'table': '1', 'bookings': '2', 'utilization': '1.0'}, rows,
+        )
+
+
+class StaticAssetTests(TestCase):
+
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source)
+        self.addCleanup(shutil.rmtree, self.root)
+        os.mkdir(os.path.join(self.source, 'css'))
+        self.css = b'.booking { color: red; }\n' * 200
+        with open(os.path.join(self.source, 'css', 'site.css'), 'wb') as output:
+            output.write(self.css)
+        with open(os.path.join(self.source, 'tiny.js'), 'wb') as output:
+            output.write(b'x=1')
+        overrides = override_settings(
+            STATIC_ROOT=self.root,
+            STATICFILES_DIRS=[self.source],
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+            STATICFILES_STORAGE='website.storage.CompressedManifestStaticFilesStorage',
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def collect(self):
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(self.root, 'staticfiles.json')) as manifest:
+            return json.load(manifest)['paths']
+
+    def get(self, application, path, method='GET', **environ):
+        environ = {'REQUEST_METHOD': method, 'PATH_INFO': path, **environ}
+        response = {}
+
+        def start_response(status, headers):
+            response.update(status=status, headers=dict(headers))
+
+        body = b''.join(application(environ, start_response))
+        return response['status'], response['headers'], body
+
+    def test_collectstatic_hashes_and_precompresses(self):
+        hashed = self.collect()['css/site.css']
+        self.assertRegex(hashed, r'^css/site\.[0-9a-f]{12}\.css$')
+        with open(os.path.join(self.root, hashed + '.gz'), 'rb') as compressed:
+            self.assertEqual(gzip.decompress(compressed.read()), self.css)
+        self.assertEqual(os.path.exists(os.path.join(self.root, hashed + '.br')), storage.brotli is not None)
+        # Compressing three bytes would only make them bigger.
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'tiny.js.gz')))
+
+    def test_static_urls_before_and_after_collectstatic(self):
+        self.assertEqual(static('css/site.css'), '/static/css/site.css')
+        hashed = self.collect()['css/site.css']
+        # Changing the setting makes the storage load the new manifest.
+        with self.settings(STATIC_ROOT=self.root):
+            self.assertEqual(static('css/site.css'), '/static/' + hashed)
+
+    def test_serves_compressed_copies_with_far_future_caching(self):
+        hashed = self.collect()['css/site.css']
+        application = StaticFiles(lambda environ, start_response: [])
+        status, headers, body = self.get(application, '/static/' + hashed, HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers['Content-Encoding'], 'br' if storage.brotli else 'gzip')
+        self.assertEqual(headers['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(int(headers['Content-Length']), len(body))
+        self.assertLess(len(body), len(self.css) / 10)
+        status, headers, body = self.get(application, '/static/' + hashed, HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        status, headers, body = self.get(application, '/static/css/site.css')
+        self.assertNotIn('Content-Encoding', headers)
+        self.assertEqual(body, self.css)
+        self.assertEqual(headers['Cache-Control'], 'public, max-age=60')
+        self.assertEqual(headers['Content-Type'], 'text/css; charset=utf-8')
+
+    def test_pages_link_hashed_files_with_far_future_caching(self):
+        with self.settings(STATICFILES_DIRS=[os.path.join(settings.BASE_DIR, 'static')]):
+            self.collect()
+        cache.clear()
+        with self.settings(STATIC_ROOT=self.root, DEBUG=False):
+            page = self.client.get(reverse('index')).content.decode()
+        url = re.search(r'/static/css/style\.[0-9a-f]{12}\.css', page).group()
+        status, headers, body = self.get(StaticFiles(None), url)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers['Cache-Control'], 'public, max-age=31536000, immutable')
+
+    def test_conditional_and_range_requests(self):
+        self.collect()
+        application = StaticFiles(None)
+        path = '/static/css/site.css'
+        etag = self.get(application, path, HTTP_ACCEPT_ENCODING='gzip')[1]['ETag']
+        status, headers, body = self.get(application, path, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((status, body), ('304 Not Modified', b''))
+        for if_none_match, expected in (
+            (f'"other", W/{etag}', '304 Not Modified'),
+            ('*', '304 Not Modified'),
+            (f'"old-{etag[1:]}', '200 OK'),
+            (f'"x{etag}x"', '200 OK'),
+        ):
+            with self.subTest(if_none_match=if_none_match):
+                status = self.get(application, path, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=if_none_match)[0]
+                self.assertEqual(status, expected)
+        status, headers, body = self.get(application, path, HTTP_ACCEPT_ENCODING='gzip', HTTP_RANGE='bytes=0-9')
+        self.assertEqual((status, body), ('206 Partial Content', self.css[:10]))
+        self.assertEqual(headers['Content-Range'], f'bytes 0-9/{len(self.css)}')
+        self.assertNotIn('Content-Encoding', headers)
+        self.assertEqual(self.get(application, path, HTTP_RANGE='bytes=-5')[2], self.css[-5:])
+        status, headers, body = self.get(application, path, HTTP_RANGE=f'bytes={len(self.css)}-')
+        self.assertEqual((status, headers['Content-Range']), ('416 Range Not Satisfiable', f'bytes */{len(self.css)}'))
+        status, headers, body = self.get(application, path, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual((status, body), ('200 OK', self.css))
+        self.assertEqual(self.get(application, path, method='HEAD')[2], b'')
+
+    def test_other_requests_reach_the_application(self):
+        self.collect()
+
+        def django_application(environ, start_response):
+            start_response('404 Not Found', [])
+            return [b'django']
+
+        application = StaticFiles(django_application)
+        self.assertEqual(self.get(application, '/static/missing.css')[2], b'django')
+        self.assertEqual(self.get(application, '/static/staticfiles.json')[2], b'django')
+        self.assertEqual(self.get(application, '/bookings/')[2], b'django')
+        self.assertEqual(self.get(application, '/static/tiny.js', method='POST')[0], '405 Method Not Allowed')
+
+
+SHARED_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'tonyspizza-test-cache'),
+    },
+}
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class SessionCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('guest', password='pizza-pass-1')
+        self.client.force_login(self.user)
+
+    def auth_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in queries if 'django_session' in query['sql'] or 'auth_user' in query['sql']]
+
+    def test_hot_authenticated_pages_run_no_auth_queries(self):
+        self.assertEqual(len(self.auth_queries(reverse('booking-list'))), 1)
+        for name in ('booking-list', 'reservation', 'booking-create', 'index'):
+            with self.subTest(name=name):
+                self.assertEqual(self.auth_queries(reverse(name)), [])
+        with self.assertNumQueries(1):
+            self.client.get(reverse('booking-list'))
+
+    def test_password_change_logs_out_other_sessions(self):
+        other = self.client_class()
+        other.force_login(self.user)
+        other.get(reverse('booking-list'))
+        self.user.set_password('pizza-pass-2')
+        self.user.save()
+        self.assertRedirects(other.get(reverse('booking-list')), '/accounts/login/?next=/bookings/', fetch_redirect_response=False)
+
+    def test_user_edits_reach_cached_sessions(self):
+        self.assertEqual(self.client.get(reverse('occupancy-calendar')).status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('occupancy-calendar')).status_code, 200)
+
+    def test_logged_out_session_stays_logged_out(self):
+        self.client.get(reverse('booking-list'))
+        session_key = self.client.session.session_key
+        self.client.logout()
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = session_key
+        self.assertEqual(self.client.get(reverse('booking-list')).status_code, 302)
+
+    def test_changes_are_written_behind(self):
+        store = sessions.SessionStore()
+        store.create()
+        store = sessions.SessionStore(store.session_key)
+        store['seen'] = 1
+        store.save()
+        stored = Session.objects.get(pk=store.session_key)
+        self.assertNotIn('seen', stored.get_decoded())
+        self.assertEqual(sessions.SessionStore(store.session_key)['seen'], 1)
+        # Logging in is written through, along with the pending change.
+        store[SESSION_KEY] = str(self.user.pk)
+        store.save()
+        self.assertEqual(Session.objects.get(pk=store.session_key).get_decoded()['seen'], 1)
+        store['seen'] = 2
+        store.save()
+        self.assertEqual(Session.objects.get(pk=store.session_key).get_decoded()['seen'], 1)
+        # Once the delay is over, the next save reaches the database.
+        cache.delete(store.persisted_key(store.session_key))
+        store.save()
+        self.assertEqual(Session.objects.get(pk=store.session_key).get_decoded()['seen'], 2)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_logout_reaches_processes_with_their_own_cache(self):
+        store = sessions.SessionStore()
+        store[SESSION_KEY] = str(self.user.pk)
+        store.create()
+        other_worker = LocMemCache('other-worker', {})
+        other = sessions.SessionStore(store.session_key)
+        other._cache = other_worker
+        self.assertEqual(other.load()[SESSION_KEY], str(self.user.pk))
+        store.delete()
+        other = sessions.SessionStore(store.session_key)
+        other._cache = other_worker
+        self.assertEqual(other.load(), {})
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_users_are_not_cached_in_a_cache_of_their_own(self):
+        self.assertEqual(self.client.get(reverse('booking-list')).status_code, 200)
+        # As another worker would, without reaching this process's cache.
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.client.get(reverse('booking-list')).status_code, 302)
+
+    @override_settings(SESSION_WRITE_BEHIND=0)
+    def test_write_behind_can_be_turned_off(self):
+        store = sessions.SessionStore()
+        store.create()
+        store['seen'] = 1
+        store.save()
+        self.assertEqual(Session.objects.get(pk=store.session_key).get_decoded()['seen'], 1)
+
+
+class LoginTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('guest', password='pizza-pass-1')
+
+    def test_login_page_renders(self):
+        response = self.client.get(reverse('account_login'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+
+    def test_logging_in_reaches_bookings(self):
+        response = self.client.post(reverse('account_login'), {'login': 'guest', 'password': 'pizza-pass-1'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.client.get(reverse('booking-list')).status_code, 200)
+
+
+class StartupTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # The probe runs in another interpreter, which cannot see the
+        # test database; it gets a migrated database of its own rather
+        # than the one DATABASE_URL names.
+        directory = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, directory)
+        cls.database_url = 'sqlite:///' + os.path.join(directory, 'startup.sqlite3')
+        env = dict(os.environ, DATABASE_URL=cls.database_url)
+        subprocess.run(
+            [sys.executable, 'manage.py', 'migrate', '--verbosity', '0'],
+            cwd=settings.BASE_DIR, env=env, check=True,
+        )
+        cls.result = startup.measure(reverse('booking-list'), database_url=cls.database_url)
+
+    def test_cold_start_is_within_budget(self):
+        self.assertEqual(self.result['status'], '302 Found')
+        self.assertLessEqual(self.result['total_ms'], settings.COLD_START_BUDGET_MS)
+        self.assertTrue(self.result['imports'])
+
+    def test_web_process_skips_optional_apps(self):
+        modules = set(self.result['modules'])
+        self.assertIn('website.views', modules)
+        for module in ('cloudinary.templatetags', 'crispy_forms'):
+            with self.subTest(module=module):
+                self.assertNotIn(module, modules)
+
+    def test_login_page_renders_in_web_process(self):
+        result = startup.measure(reverse('account_login'), database_url=self.database_url)
+        self.assertEqual(result['status'], '200 OK')
+
+    def test_parse_import_times(self):
+        lines = [
+            'import time: self [us] | cumulative | imported package',
+            'import time:       120 |        120 |   website.slots',
+            'import time:      2000 |       2500 | website',
+        ]
+        timings = startup.parse_import_times(lines)
+        self.assertEqual(timings, [('website.slots', 0.12, 0.12), ('website', 2.0, 2.5)])
+        self.assertEqual(startup.by_package(timings), {'website': 2.1})
+
+    def test_first_response_is_streamed_and_logged_once(self):
+        def application(environ, start_response):
+            start_response('200 OK', [])
+            yield b'first'
+            yield b'second'
+
+        timed = startup.FirstResponseTimer(application, started=0)
+        environ = {'PATH_INFO': '/'}
+        with self.assertLogs('website.startup', 'INFO') as logs:
+            response = timed(environ, lambda *args: None)
+            chunks = iter(response)
+            self.assertEqual(next(chunks), b'first')
+            self.assertEqual(logs.records, [])
+            self.assertEqual(list(chunks), [b'second'])
+            response.close()
+        self.assertEqual(len(logs.records), 1)
+        with self.assertRaises(AssertionError), self.assertLogs('website.startup'):
+            timed(environ, lambda *args: None)
@@ -1,20 +1,38 @@
-from django.contrib.auth.mixins import LoginRequiredMixin
+from datetime import date, timedelta
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404, HttpResponseNotModified, HttpResponseRedirect, JsonResponse
+from django.shortcuts import redirect, render
+from django.template.defaultfilters import pluralize
 from django.urls import reverse_lazy
-from django.views.generic import ListView, TemplateView, CreateView, UpdateView, DeleteView
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.utils.http import parse_etags
+from django.views import View
+from django.views.generic import ListView, TemplateView, CreateView, UpdateView, DeleteView, FormView
 from allauth.account.views import LoginView  # Import LoginView from allauth
-from .forms import BookingForm
-from .models import Table, Booking
+from . import caching, occupancy, series
+from .db import write_transaction
+from .forms import BookingForm, SeriesBookingForm
+from .models import ArchivedBooking, Table, Booking, SlotTaken
+from .pagination import KeysetPaginator
+from .slots import TIME_CHOICES
 
 
+@method_decorator(caching.cache_anonymous_page, name='dispatch')
 class TableListView(ListView):
     """
     A view that lists all the tables.
 
     Inherits from Django's ListView class to provide
     a list view for the tables.
+    Anonymous visitors get a cached copy until the tables change.
     """
 
     model = Table
+    queryset = Table.objects.order_by('number')
     template_name = 'table_list.html'
     context_object_name = 'tables'
 
@@ -26,31 +44,94 @@ class BookingListView(LoginRequiredMixin, ListView):
     Inherits from Django's ListView class to provide a list view for the
     bookings.
     Requires the user to be logged in.
+    Shows upcoming bookings soonest first, or past bookings (?when=past)
+    most recent first, one keyset page at a time.
 
     Attributes:
         model (Model): The model to use for the list view (Booking).
         template_name (str): The name of the template used to render the view.
         context_object_name (str): The name of the variable to use in the
         template for the bookings.
+        paginate_by (int): The number of bookings on each page.
     """
 
     model = Booking
     template_name = 'booking_list.html'
     context_object_name = 'bookings'
+    paginate_by = 20
+    page_keys = ('date', 'time', 'pk')
 
     def get_queryset(self):
         """
-        Returns the queryset of bookings for the authenticated user.
+        Returns the queryset of bookings for the authenticated user,
+        with their tables, leaving out the extra tables held for large
+        parties.
+        """
+        return Booking.objects.filter(
+            user=self.request.user, combined_with__isnull=True,
+        ).select_related('table')
+
+    def showing_past(self):
+        return self.request.GET.get('when') == 'past'
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        """
+        Returns a keyset paginator over the upcoming or past bookings.
         """
-        return Booking.objects.filter(user=self.request.user)
+        today = timezone.localdate()
+        if self.showing_past():
+            return KeysetPaginator(queryset.filter(date__lt=today), self.page_keys, per_page, descending=True)
+        return KeysetPaginator(queryset.filter(date__gte=today), self.page_keys, per_page)
+
+    def paginate_queryset(self, queryset, page_size):
+        """
+        Returns the page after or before the cursor in the query string.
+        """
+        paginator = self.get_paginator(queryset, page_size)
+        try:
+            page = paginator.page(after=self.request.GET.get('after'), before=self.request.GET.get('before'))
+        except ValueError:
+            raise Http404("Invalid page.")
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['when'] = 'past' if self.showing_past() else 'upcoming'
+        return context
+
+
+class BookingHistoryView(BookingListView):
+    """
+    A view that lists the authenticated user's archived bookings, most
+    recent first, one keyset page at a time.
+
+    Archived bookings are read from their own table (see archive.py), so
+    the live booking list never pays for them.
+    """
+
+    model = ArchivedBooking
+    template_name = 'booking_history.html'
+
+    def get_queryset(self):
+        return ArchivedBooking.objects.filter(user=self.request.user, combined_with__isnull=True)
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        return KeysetPaginator(queryset, self.page_keys, per_page, descending=True)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['when'] = 'archived'
+        return context
 
 
+@method_decorator(caching.cache_anonymous_page, name='dispatch')
 class IndexView(TemplateView):
     """
     A view that renders the index page.
 
     Inherits from Django's TemplateView class to provide a simple
     template view for the index page.
+    Anonymous visitors get a cached copy.
 
     Attributes:
         template_name (str): The name of the template used to render the view.
@@ -67,13 +148,34 @@ class CustomLoginView(LoginView):
 
     Attributes:
         template_name (str): The name of the
-        template used to render the view login.html').
+        template used to render the view ('accounts/login.html').
     """
 
-    template_name = 'login.html'
+    template_name = 'accounts/login.html'
+
+
+class SlotClaimMixin:
+    """
+    A mixin for booking form views that saves the booking by claiming
+    its slot, so that a table already taken by a concurrent booking
+    shows up as a form error rather than a server error.
+    """
+
+    def form_valid(self, form):
+        """
+        Claims the slot and redirects, or re-renders the form if the
+        slot has been taken in the meantime.
+        """
+        try:
+            form.instance.claim(form.extra_tables)
+        except SlotTaken as error:
+            form.add_error(None, error)
+            return self.form_invalid(form)
+        self.object = form.instance
+        return HttpResponseRedirect(self.get_success_url())
 
 
-class BookingCreateView(LoginRequiredMixin, CreateView):
+class BookingCreateView(LoginRequiredMixin, SlotClaimMixin, CreateView):
     """
     A view that handles the creation of new bookings.
 
@@ -102,7 +204,37 @@ class BookingCreateView(LoginRequiredMixin, CreateView):
         return super().form_valid(form)
 
 
-class BookingUpdateView(LoginRequiredMixin, UpdateView):
+class SeriesBookingCreateView(LoginRequiredMixin, FormView):
+    """
+    A view that books a table at the same time on a run of dates, all or
+    nothing, in one transaction (see series.py).
+
+    Attributes:
+        form_class (Form): The form used for the series (SeriesBookingForm).
+        template_name (str): The name of the template used to render the view.
+        success_url (str): The URL to redirect to after the series is
+        booked ('booking-list').
+    """
+
+    form_class = SeriesBookingForm
+    template_name = 'booking_series.html'
+    success_url = reverse_lazy('booking-list')
+
+    def form_valid(self, form):
+        """
+        Books the series and redirects, or re-renders the form listing
+        the dates on which the table is taken.
+        """
+        data = form.cleaned_data
+        try:
+            series.create_series(self.request.user, data['table'], data['time'], data['num_guests'], data['dates'])
+        except series.SeriesConflict as error:
+            form.add_error(None, error)
+            return self.form_invalid(form)
+        return super().form_valid(form)
+
+
+class BookingUpdateView(LoginRequiredMixin, SlotClaimMixin, UpdateView):
     """
     A view that handles the updating of bookings.
 
@@ -154,6 +286,14 @@ class BookingDeleteView(LoginRequiredMixin, DeleteView):
         """
         return super().get_queryset().filter(user=self.request.user)
 
+    def delete(self, request, *args, **kwargs):
+        """
+        Deletes the booking, with its extra tables, in one write
+        transaction.
+        """
+        with write_transaction():
+            return super().delete(request, *args, **kwargs)
+
 
 class ReservationView(LoginRequiredMixin, TemplateView):
     template_name = 'reservations.html'
@@ -168,6 +308,193 @@ class ReservationView(LoginRequiredMixin, TemplateView):
         if form.is_valid():
             booking = form.save(commit=False)
             booking.user = request.user
-            booking.save()
-            return redirect('booking-list')
+            try:
+                booking.claim(form.extra_tables)
+            except SlotTaken as error:
+                form.add_error(None, error)
+            else:
+                return redirect('booking-list')
         return self.render_to_response({'form': form})
+
+
+class AvailabilityAPIView(View):
+    """
+    A read-only JSON view of the free tables in each slot.
+
+    Query parameters:
+        date (YYYY-MM-DD): The date to report, or
+        start and end (YYYY-MM-DD): an inclusive range of up to max_days.
+        party_size (int): Only list tables that seat this many guests.
+
+    Every response carries a strong ETag. A poll whose If-None-Match
+    still matches gets a 304 built from the cache alone, without
+    touching the database.
+    """
+
+    max_days = 31
+
+    def parse(self, params):
+        """
+        Returns (start, end, party_size) from the query parameters.
+        Raises ValueError if they are missing or invalid.
+        """
+        if 'date' in params:
+            start = end = date.fromisoformat(params['date'])
+        elif 'start' in params:
+            start = date.fromisoformat(params['start'])
+            end = date.fromisoformat(params.get('end', params['start']))
+        else:
+            raise ValueError("Give a date, or a start and end date.")
+        if end < start:
+            raise ValueError("end is before start.")
+        if end - start >= timedelta(days=self.max_days):
+            raise ValueError(f"Ask for at most {self.max_days} days at a time.")
+        party_size = int(params.get('party_size', 1))
+        if party_size < 1:
+            raise ValueError("party_size must be at least 1.")
+        return start, end, party_size
+
+    def get(self, request, *args, **kwargs):
+        try:
+            start, end, party_size = self.parse(request.GET)
+        except ValueError as error:
+            return JsonResponse({'error': str(error)}, status=400)
+        return self.respond(request, caching.get_days(start, end), party_size)
+
+    def respond(self, request, days, party_size):
+        """
+        Returns the response for the cached days: a 304 if the client's
+        ETag still matches, or the JSON body.
+        """
+        etag = caching.days_etag(days, party_size)
+        if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            response = HttpResponseNotModified()
+        else:
+            response = JsonResponse(caching.days_payload(days, party_size))
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+
+def calendar_rows(year, month, seats):
+    """
+    Returns the occupancy calendar's rows for a month, with each cell
+    already formatted as (class, title, text): the template renders
+    hundreds of cells, and spends far less time on them this way.
+    """
+    rows = []
+    for day in occupancy.month_grid(year, month, seats):
+        cells = []
+        for cell in day['slots']:
+            if cell is None:
+                cells.append(('empty', '', ''))
+                continue
+            tables, covers, percent = cell
+            level = 'full' if percent >= 90 else 'busy' if percent >= 50 else 'open'
+            title = f"{tables} table{pluralize(tables)}, {covers} guest{pluralize(covers)}"
+            cells.append((level, title, f'{percent}%'))
+        rows.append({'date': day['date'], 'cells': cells, 'covers': day['covers']})
+    return rows
+
+
+class OccupancyCalendarView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
+    """
+    A month grid, for staff, of how full each slot of each day is.
+
+    The grid is read from the occupancy summary in one query and
+    rendered into a cached fragment. Both are keyed on the month's ETag
+    (see caching.month_etag), which changes when a booking in the month
+    or a table does: a request whose If-None-Match still matches gets a
+    304, and one whose fragment is cached runs no query for the grid.
+    """
+
+    template_name = 'calendar.html'
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get_month(self):
+        """
+        Returns the first day of the requested month, or of this one.
+        """
+        if 'year' not in self.kwargs:
+            return timezone.localdate().replace(day=1)
+        try:
+            return date(self.kwargs['year'], self.kwargs['month'], 1)
+        except ValueError:
+            raise Http404("No such month.")
+
+    def get(self, request, *args, **kwargs):
+        self.month = self.get_month()
+        self.etag = caching.month_etag(self.month.year, self.month.month)
+        if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if self.etag is not None and self.etag in if_none_match:
+            response = HttpResponseNotModified()
+        else:
+            response = super().get(request, *args, **kwargs)
+        if self.etag is not None:
+            response['ETag'] = self.etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        month = self.month
+        previous = (month - timedelta(days=1)).replace(day=1)
+        following = (month + timedelta(days=31)).replace(day=1)
+        seats = sum(capacity for pk, label, capacity in caching.get_tables())
+        context.update({
+            'month': month,
+            'previous': previous,
+            'next': following,
+            'etag': self.etag,
+            'slots': [label for value, label in TIME_CHOICES],
+            'seats': seats,
+            # Called by the template only when its fragment is not cached.
+            'days': lambda: calendar_rows(month.year, month.month, seats),
+        })
+        return context
+
+
+# Async versions of the read-heavy views, for running under an ASGI
+# server (see gunicorn_asgi.conf.py). Django 3.2 has no async ORM, so
+# every database and cache call crosses into a thread through
+# sync_to_async; the event loop is free to serve other connections while
+# it waits.
+
+
+async def availability_api_async(request):
+    """
+    The JSON availability API (see AvailabilityAPIView) as an async view.
+    """
+    view = AvailabilityAPIView()
+    try:
+        start, end, party_size = view.parse(request.GET)
+    except ValueError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+    days = await sync_to_async(caching.get_days)(start, end)
+    return view.respond(request, days, party_size)
+
+
+async def booking_list_async(request):
+    """
+    The booking list (see BookingListView) as an async view.
+
+    The session, user and page of bookings are loaded in one
+    sync_to_async call; the template is then rendered from the loaded
+    rows without touching the database.
+    """
+    view = BookingListView()
+    view.setup(request)
+
+    def load():
+        if not request.user.is_authenticated:
+            return None
+        view.object_list = view.get_queryset()
+        return view.get_context_data()
+
+    context = await sync_to_async(load)()
+    if context is None:
+        return redirect_to_login(request.get_full_path())
+    return render(request, view.template_name, context)